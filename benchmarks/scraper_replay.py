@@ -0,0 +1,547 @@
+import os
+import sys
+import json
+import time
+import random
+import base64
+import argparse
+import datetime
+import resource
+import tracemalloc
+import multiprocessing
+from contextlib import ExitStack
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from logging import getLogger, basicConfig
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+
+# creds reads these at import time. The benchmark never contacts the database or any external API, so placeholders are enough when they are not set.
+for _name, _value in {
+    "DB_USER": "benchmark",
+    "DB_PORT": "3306",
+    "DB_HOST": "127.0.0.1",
+    "DB_NAME": "benchmark",
+    "PAYLOAD": "{}",
+    "DATA_REFRESH_AGE": "60",
+    "SCRAPING_ANT_API_KEY": "benchmark",
+    "REFERER": "http://127.0.0.1/",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper  # noqa: E402
+import movie  # noqa: E402
+from movie import MovieManager  # noqa: E402
+from showing import ShowingsManager  # noqa: E402
+from scheduler import ScrapeScheduler  # noqa: E402
+from tmdb_cache import TMDBCache  # noqa: E402
+from tmdb_index import TMDBIdIndex  # noqa: E402
+from tmdb import TMDBEnricher  # noqa: E402
+from enrichment import EnrichmentQueue  # noqa: E402
+from raw_archive import find_raw_archives, read_raw_archive  # noqa: E402
+
+
+# Offline replay benchmark for the scraper. A local HTTP server stands in for the cinema site and ScrapingAnt, replaying pages recorded in raw data archives (or synthetic pages), with configurable latency and failure injection. ScraperManager runs end to end against it with in-memory movie and showing managers, and the run's throughput, CPU time and peak memory are reported.
+#
+# Run from the repository root:
+#   python -m benchmarks.scraper_replay --cinemas 20 --days 14 --latency 0.05
+#   python -m benchmarks.scraper_replay --archive "raw_data/raw_data_2026-09-*" --save baseline.json
+#   python -m benchmarks.scraper_replay --archive "raw_data/raw_data_2026-09-*" --baseline baseline.json
+
+
+def synthetic_pages(
+    cinema_count: int, days: int, movies_per_page: int, cast_size: int = 8
+) -> dict[str, list[list[dict]]]:
+    """
+    Generate pages shaped like the upstream responses, for benchmarking without recorded data.
+
+    Args:
+        cinema_count (int): Number of cinemas.
+        days (int): Pages generated per cinema.
+        movies_per_page (int): English showings listed on each page.
+        cast_size (int): Cast members listed for each movie.
+
+    Returns:
+        dict[str, list[list[dict]]]: Raw showings of each page, by cinema.
+    """
+    rng = random.Random(0)
+    today = datetime.date.today()
+    pages = {}
+    for c in range(cinema_count):
+        cinema_id = f"B{c:04d}"
+        pages[cinema_id] = []
+        for day in range(days):
+            page = []
+            for _ in range(movies_per_page):
+                movie_number = rng.randrange(movies_per_page * 4)
+                hour = rng.randrange(10, 23)
+                page.append(
+                    {
+                        "movie": {
+                            "id": base64.b64encode(
+                                f"Movie:{movie_number:06d}".encode()
+                            ).decode(),
+                            "title": f"Film {movie_number}",
+                            "originalTitle": f"Movie {movie_number}",
+                            "languages": ["ENGLISH"],
+                            "genres": [{"tag": "DRAMA"}],
+                            "data": {"productionYear": 2020 + movie_number % 6},
+                            "cast": {
+                                "edges": [
+                                    {
+                                        "node": {
+                                            "actor": {
+                                                "firstName": f"First{i}",
+                                                "lastName": f"Last{i}",
+                                            }
+                                        }
+                                    }
+                                    for i in range(cast_size)
+                                ]
+                            },
+                        },
+                        "showtimes": {
+                            "original": [
+                                {
+                                    "startsAt": f"{today + datetime.timedelta(days=day)}T{hour:02d}:00:00"
+                                }
+                            ],
+                            "dubbed": [],
+                        },
+                    }
+                )
+            pages[cinema_id].append(page)
+    return pages
+
+
+def recorded_pages(pattern: str) -> dict[str, list[list[dict]]]:
+    """
+    Load the pages of raw data archives matching `pattern`, in the order they were recorded.
+
+    Args:
+        pattern (str): Glob pattern of the archives.
+
+    Returns:
+        dict[str, list[list[dict]]]: Raw showings of each page, by cinema.
+    """
+    pages = {}
+    for path in find_raw_archives(pattern):
+        for page in read_raw_archive(path):
+            pages.setdefault(page["cinema_id"], []).append(page["showings"])
+    return pages
+
+
+class ReplayUpstream:
+    """Local stand-in for the cinema site and ScrapingAnt, run in a separate process so it does not count towards the scraper's CPU time and memory."""
+
+    def __init__(
+        self,
+        archive: str | None = None,
+        cinema_count: int = 10,
+        days: int = 14,
+        movies_per_page: int = 15,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        ant_failure_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """
+        Initialize a ReplayUpstream object.
+
+        Args:
+            archive (str, optional): Glob pattern of raw data archives to replay. Synthetic pages are served if None.
+            cinema_count (int): Number of cinemas when serving synthetic pages.
+            days (int): Pages per cinema when serving synthetic pages.
+            movies_per_page (int): English showings per synthetic page.
+            latency (float): Seconds added to every response.
+            jitter (float): Maximum random seconds added on top of latency.
+            failure_rate (float): Share of direct requests answered with 403.
+            ant_failure_rate (float): Share of ScrapingAnt requests answered with 500.
+            seed (int): Seed for latency jitter and failure injection.
+        """
+        self.options = dict(
+            archive=archive,
+            cinema_count=cinema_count,
+            days=days,
+            movies_per_page=movies_per_page,
+            latency=latency,
+            jitter=jitter,
+            failure_rate=failure_rate,
+            ant_failure_rate=ant_failure_rate,
+            seed=seed,
+        )
+        self.direct_requests = multiprocessing.Value("i", 0)
+        self.ant_requests = multiprocessing.Value("i", 0)
+        self.cinema_ids: list[str] = []
+        self.port: int | None = None
+        self._process: multiprocessing.Process | None = None
+
+    def __enter__(self) -> "ReplayUpstream":
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=self._serve,
+            args=(child, self.options, self.direct_requests, self.ant_requests),
+            daemon=True,
+        )
+        self._process.start()
+        self.port, self.cinema_ids = parent.recv()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._process.terminate()
+        self._process.join()
+
+    @property
+    def base_prefix(self) -> str:
+        return f"http://127.0.0.1:{self.port}/cinema/"
+
+    @property
+    def scrapingant_url(self) -> str:
+        # A different host name to the cinema site, so the scheduler limits it separately
+        return f"http://localhost:{self.port}/scrapingant"
+
+    @staticmethod
+    def _serve(conn, options: dict, direct_requests, ant_requests) -> None:
+        """Load the pages and serve them until terminated. Runs in the server process."""
+        if options["archive"]:
+            pages = recorded_pages(options["archive"])
+        else:
+            pages = synthetic_pages(
+                options["cinema_count"], options["days"], options["movies_per_page"]
+            )
+        rng = random.Random(options["seed"])
+        today = datetime.date.today()
+
+        def page_body(url: str) -> bytes | None:
+            # URLs are {BASE_PREFIX}{cinema_id}/d-{date}/, recorded pages are served by day offset
+            parts = urlsplit(url).path.strip("/").split("/")
+            cinema_pages = pages.get(parts[-2]) if len(parts) >= 2 else None
+            if not cinema_pages:
+                return None
+            try:
+                offset = (datetime.date.fromisoformat(parts[-1][2:]) - today).days
+            except ValueError:
+                return None
+            showings = cinema_pages[offset % len(cinema_pages)]
+            return json.dumps({"results": showings}).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                delay = options["latency"] + rng.random() * options["jitter"]
+                if delay:
+                    time.sleep(delay)
+
+                if self.path.startswith("/scrapingant"):
+                    with ant_requests.get_lock():
+                        ant_requests.value += 1
+                    target = parse_qs(urlsplit(self.path).query).get("url", [""])[0]
+                    failed = rng.random() < options["ant_failure_rate"]
+                    status = 500
+                else:
+                    with direct_requests.get_lock():
+                        direct_requests.value += 1
+                    target = self.path
+                    failed = rng.random() < options["failure_rate"]
+                    status = 403
+
+                body = None if failed else page_body(target)
+                if body is None:
+                    body = b"{}"
+                    self.send_response(status if failed else 404)
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        conn.send((server.server_address[1], sorted(pages)))
+        server.serve_forever()
+
+
+class InMemoryMovieManager(MovieManager):
+    """MovieManager that starts with an empty database and keeps new movies in memory."""
+
+    def retrieve_movies(self) -> list[str]:
+        return []
+
+    def add_new_movies_to_database(self) -> None:
+        self.saved_movie_count = len(self.new_movies)
+
+
+class InMemoryShowingsManager(ShowingsManager):
+    """ShowingsManager that starts with an empty database and keeps new showings in memory."""
+
+    @staticmethod
+    def retrieve_showings(window_start=None) -> list[str]:
+        return []
+
+    def add_new_showings_to_database(
+        self, end: int | None = None, cinema_id: str | None = None
+    ) -> None:
+        self.saved_showing_count = len(self.new_showings[:end])
+        self.pending_diffs.pop(cinema_id, None)
+
+
+def offline_environment(upstream: ReplayUpstream) -> ExitStack:
+    """
+    Point the scraper at the local upstream, and replace everything that would use the database or an external API with an in-memory or no-op version.
+
+    Args:
+        upstream (ReplayUpstream): The running upstream.
+
+    Returns:
+        ExitStack: Undoes the replacements when closed.
+    """
+    stack = ExitStack()
+    patches = [
+        mock.patch.object(scraper, "BASE_PREFIX", upstream.base_prefix),
+        mock.patch.object(scraper, "SCRAPING_ANT_URL", upstream.scrapingant_url),
+        mock.patch.object(
+            scraper,
+            "CinemaManager",
+            lambda logger: SimpleNamespace(cinema_ids=set(upstream.cinema_ids)),
+        ),
+        mock.patch.object(scraper, "MovieManager", InMemoryMovieManager),
+        mock.patch.object(scraper, "ShowingsManager", InMemoryShowingsManager),
+        # TMDB is not part of the scraper, so movie details are left empty
+        mock.patch.object(
+            movie.Movie,
+            "get_additional_details",
+            lambda self, enricher: {"original_title": self.original_title},
+        ),
+        mock.patch.object(scraper.ScraperManager, "update_ratings", lambda self: None),
+        mock.patch.object(
+            scraper.ScraperManager, "_create_job_queue", lambda self: None
+        ),
+        mock.patch.object(
+            scraper.CircuitBreakerManager, "retrieve_breakers", lambda self: []
+        ),
+        mock.patch.object(scraper.CircuitBreakerManager, "save", lambda self: None),
+        mock.patch.object(scraper.HorizonPlanner, "retrieve_stats", lambda self: []),
+        mock.patch.object(scraper.HorizonPlanner, "record", lambda self, *a: None),
+        mock.patch.object(
+            scraper.PageFingerprints,
+            "retrieve_fingerprints",
+            lambda self, **kwargs: [],
+        ),
+        mock.patch.object(scraper.PageFingerprints, "save", lambda self, *a: None),
+        mock.patch.object(TMDBCache, "retrieve_entries", lambda self, **kwargs: []),
+        mock.patch.object(TMDBIdIndex, "retrieve_movies", lambda self: []),
+        mock.patch.object(TMDBIdIndex, "retrieve_ids", lambda self: []),
+        mock.patch.object(TMDBEnricher, "save_cache", lambda self: None),
+        mock.patch.object(EnrichmentQueue, "save_results", lambda self, *a: None),
+        mock.patch.object(EnrichmentQueue, "get_due_movies", lambda self, **kw: []),
+        mock.patch.object(EnrichmentQueue, "get_status_counts", lambda self: {}),
+    ]
+    for patch in patches:
+        stack.enter_context(patch)
+    return stack
+
+
+def run_benchmark(
+    upstream: ReplayUpstream,
+    days: int,
+    concurrency: int = 4,
+    rate: float = 50.0,
+    ant_rate: float = 10.0,
+    backoff_delay: float = 1.0,
+    pipeline_fallback: bool = True,
+    trace_memory: bool = False,
+) -> dict:
+    """
+    Run ScraperManager end to end against a running upstream.
+
+    Args:
+        upstream (ReplayUpstream): The running upstream.
+        days (int): Days scraped per cinema.
+        concurrency (int): Cinemas scraped in parallel.
+        rate (float): Starting and maximum requests per second to the cinema site.
+        ant_rate (float): Requests per second to the ScrapingAnt stand-in.
+        backoff_delay (float): Seconds a host is paused after an injected failure. Shorter than in production, so failure injection does not dominate the wall time.
+        pipeline_fallback (bool): Retry failed URLs on the background fallback worker.
+        trace_memory (bool): Measure peak Python heap use with tracemalloc. Slows the run, so CPU time is not comparable with untraced runs.
+
+    Returns:
+        dict: Benchmark results.
+    """
+    scheduler = ScrapeScheduler(
+        max_concurrent_cinemas=concurrency,
+        max_requests_per_host=concurrency,
+        rate=rate,
+        max_rate=rate,
+        burst=concurrency,
+        max_jitter=0.0,
+        backoff_delay=backoff_delay,
+        host_limits={
+            "localhost": {"max_in_flight": 1, "rate": ant_rate, "max_rate": ant_rate}
+        },
+    )
+    logger = getLogger("benchmark")
+
+    with offline_environment(upstream):
+        if trace_memory:
+            tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        manager = scraper.ScraperManager(
+            logger,
+            start_day=0,
+            end_day=days,
+            scheduler=scheduler,
+            pipeline_fallback=pipeline_fallback,
+        )
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        traced_peak = None
+        if trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    requests_sent = upstream.direct_requests.value + upstream.ant_requests.value
+    pages = (
+        manager.total_direct_success
+        + manager.total_scrapingant_success
+        + manager.total_failures
+    )
+    return {
+        "cinemas": len(upstream.cinema_ids),
+        "pages": pages,
+        "requests": requests_sent,
+        "direct_requests": upstream.direct_requests.value,
+        "scrapingant_requests": upstream.ant_requests.value,
+        "direct_success": manager.total_direct_success,
+        "scrapingant_success": manager.total_scrapingant_success,
+        "failures": manager.total_failures,
+        "new_movies": len(manager.movie_man.new_movies),
+        "new_showings": len(manager.show_man.new_showings),
+        "wall_time_s": round(wall_time, 3),
+        "cpu_time_s": round(cpu_time, 3),
+        "requests_per_s": round(requests_sent / wall_time, 2) if wall_time else None,
+        "pages_per_s": round(pages / wall_time, 2) if wall_time else None,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "traced_peak_mb": (
+            round(traced_peak / 1024 / 1024, 1) if traced_peak is not None else None
+        ),
+        "stages": manager.get_pipeline_stats(),
+    }
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Return the relative change of each timing, throughput and memory result against a baseline."""
+    changes = {}
+    for key in (
+        "wall_time_s",
+        "cpu_time_s",
+        "requests_per_s",
+        "pages_per_s",
+        "peak_rss_mb",
+        "traced_peak_mb",
+    ):
+        if results.get(key) is not None and baseline.get(key):
+            changes[key] = f"{(results[key] - baseline[key]) / baseline[key]:+.1%}"
+    return changes
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scraper end to end against a local stand-in upstream"
+    )
+    parser.add_argument(
+        "--archive",
+        type=str,
+        default=None,
+        help="Glob pattern of raw data archives to replay (default=synthetic pages)",
+    )
+    parser.add_argument("--cinemas", type=int, default=10, help="Synthetic cinemas")
+    parser.add_argument("--days", type=int, default=14, help="Days per cinema")
+    parser.add_argument(
+        "--movies_per_page", type=int, default=15, help="Synthetic showings per page"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Seconds added to every response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Maximum random extra latency"
+    )
+    parser.add_argument(
+        "--failure_rate", type=float, default=0.0, help="Share of direct 403s"
+    )
+    parser.add_argument(
+        "--ant_failure_rate",
+        type=float,
+        default=0.0,
+        help="Share of ScrapingAnt failures",
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--rate", type=float, default=50.0, help="Direct requests per second"
+    )
+    parser.add_argument(
+        "--ant_rate", type=float, default=10.0, help="ScrapingAnt requests per second"
+    )
+    parser.add_argument(
+        "--backoff_delay",
+        type=float,
+        default=1.0,
+        help="Seconds a host is paused after a failure",
+    )
+    parser.add_argument(
+        "--no_pipeline", action="store_true", help="Disable the fallback worker"
+    )
+    parser.add_argument(
+        "--trace_memory", action="store_true", help="Report tracemalloc peak"
+    )
+    parser.add_argument("--save", type=str, default=None, help="Write results here")
+    parser.add_argument(
+        "--baseline", type=str, default=None, help="Compare with saved results"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    basicConfig(level="WARNING")
+
+    with ReplayUpstream(
+        archive=args.archive,
+        cinema_count=args.cinemas,
+        days=args.days,
+        movies_per_page=args.movies_per_page,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        ant_failure_rate=args.ant_failure_rate,
+    ) as upstream:
+        results = run_benchmark(
+            upstream,
+            days=args.days,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            ant_rate=args.ant_rate,
+            backoff_delay=args.backoff_delay,
+            pipeline_fallback=not args.no_pipeline,
+            trace_memory=args.trace_memory,
+        )
+
+    print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf8") as f:
+            print(json.dumps({"vs_baseline": compare(results, json.load(f))}, indent=2))
+    if args.save:
+        with open(args.save, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=2)
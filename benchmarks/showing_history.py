@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import argparse
+import hashlib
+import datetime
+import sqlite3
+import tracemalloc
+from logging import getLogger, basicConfig
+from unittest import mock
+
+# creds reads these at import time. The benchmark never contacts the database, so placeholders are enough when they are not set.
+for _name, _value in {
+    "DB_USER": "benchmark",
+    "DB_PORT": "3306",
+    "DB_HOST": "127.0.0.1",
+    "DB_NAME": "benchmark",
+    "PAYLOAD": "{}",
+    "DATA_REFRESH_AGE": "60",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utilities  # noqa: E402
+from showing import Showing, ShowingsManager, TABLE_NAME  # noqa: E402
+
+
+# Benchmark of ShowingsManager startup as the showtimes table's history grows. An SQLite stand-in for the database, with the same showtimes columns and start_time index, is filled with past showings in steps up to --history rows, plus --upcoming showings in the scrape window. At each step the dedup set is loaded with the full history and with the scrape window only, and the load time and memory are reported. The memory and lookup cost of a set of showing keys is also compared with a set of the hex SHA-256 hash_ids they replaced.
+#
+# Run from the repository root:
+#   python -m benchmarks.showing_history --history 1000000 --steps 4
+
+
+class SQLiteCursor:
+    """Cursor adapter running the MySQL style queries of the managers on SQLite."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.cursor = connection.cursor()
+
+    def execute(self, query: str, params: tuple = ()) -> None:
+        params = tuple(
+            str(param) if isinstance(param, datetime.datetime) else param
+            for param in params
+        )
+        self.cursor.execute(query.replace("%s", "?"), params)
+
+    def fetchall(self) -> list[tuple]:
+        return self.cursor.fetchall()
+
+    def __enter__(self) -> "SQLiteCursor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cursor.close()
+
+
+class SQLiteConnection:
+    """Connection adapter standing in for mysql.connector.connect, sharing one SQLite database across connections."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self.connection)
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def __enter__(self) -> "SQLiteConnection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+def add_showings(
+    connection: sqlite3.Connection, first_day: datetime.date, days: int, per_day: int
+) -> None:
+    """Insert `per_day` showings on each of `days` days from `first_day`."""
+    rows = []
+    for day in range(days):
+        date = first_day + datetime.timedelta(days=day)
+        for i in range(per_day):
+            start_time = datetime.datetime.combine(
+                date, datetime.time(10 + i % 13, (i // 13) % 60)
+            )
+            movie_id = f"TW92aWU6{i // 780:06d}"
+            cinema_id = f"B{i % 780 // 60:04d}"
+            rows.append(
+                (
+                    movie_id,
+                    cinema_id,
+                    str(start_time),
+                    Showing.calculate_key(movie_id, cinema_id, start_time),
+                )
+            )
+    connection.executemany(
+        f"INSERT OR IGNORE INTO {TABLE_NAME} (movie_id, cinema_id, start_time, showing_key) VALUES (?, ?, ?, ?);",
+        rows,
+    )
+    connection.commit()
+
+
+def measure_load(window_start: datetime.datetime | None) -> dict:
+    """Create a ShowingsManager and return the keys it loaded, its load time, and the memory the load allocated."""
+    logger = getLogger("benchmark")
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    show_man = ShowingsManager(logger, window_start=window_start)
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "keys_loaded": len(show_man.current_showings),
+        "load_s": round(elapsed, 3),
+        "retained_mb": round(current / 1024 / 1024, 1),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def compare_key_formats(count: int) -> dict:
+    """
+    Compare a set of showing keys with a set of the hex hash_ids they replaced.
+
+    Args:
+        count (int): Showings in each set.
+
+    Returns:
+        dict: Bytes per showing held by each set, and the cost of a lookup in it.
+    """
+    data = [f"TW92aWU6{i:06d}B0001{i}".encode() for i in range(count)]
+    formats = {
+        "hex_hash_id": lambda digest: digest.hex(),
+        "showing_key": Showing.key_from_digest,
+    }
+    results = {}
+    for name, to_key in formats.items():
+        digests = [hashlib.sha256(d).digest() for d in data]
+        tracemalloc.start()
+        keys = set(to_key(digest) for digest in digests)
+        set_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # Fresh objects, as scraped showings are not the objects held in the set
+        probes = [to_key(digest) for digest in digests]
+        t0 = time.perf_counter()
+        found = sum(1 for probe in probes if probe in keys)
+        elapsed = time.perf_counter() - t0
+        results[name] = {
+            "bytes_per_showing": round(set_bytes / count, 1),
+            "ns_per_lookup": round(elapsed / count * 1e9, 1),
+            "found": found,
+        }
+    return results
+
+
+def run_benchmark(history: int, upcoming: int, steps: int, per_day: int) -> list[dict]:
+    """
+    Grow the showtimes history and measure full and windowed dedup loads at each step.
+
+    Args:
+        history (int): Past showings in the table at the last step.
+        upcoming (int): Showings in the scrape window, from today on.
+        steps (int): Number of history sizes measured.
+        per_day (int): Showings per day, which decides how many days of history are created.
+
+    Returns:
+        list[dict]: Full and windowed load of each step.
+    """
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        f"CREATE TABLE {TABLE_NAME} (showtime_id INTEGER PRIMARY KEY AUTOINCREMENT, movie_id TEXT, cinema_id TEXT, start_time TEXT, showing_key INTEGER UNIQUE);"
+    )
+    connection.execute(
+        f"CREATE INDEX idx_showtimes_start_time ON {TABLE_NAME} (start_time);"
+    )
+    today = datetime.date.today()
+    window_start = datetime.datetime.combine(today, datetime.time())
+    add_showings(connection, today, max(1, upcoming // per_day), per_day)
+
+    history_days = max(1, history // per_day)
+    results = []
+    days_added = 0
+    with mock.patch.object(
+        db_utilities.mysql.connector,
+        "connect",
+        lambda **kwargs: SQLiteConnection(connection),
+    ):
+        for step in range(1, steps + 1):
+            # History is added further back in time at each step
+            target_days = history_days * step // steps
+            add_showings(
+                connection,
+                today - datetime.timedelta(days=target_days),
+                target_days - days_added,
+                per_day,
+            )
+            days_added = target_days
+            rows = connection.execute(f"SELECT COUNT(*) FROM {TABLE_NAME};").fetchone()
+            results.append(
+                {
+                    "table_rows": rows[0],
+                    "full_history": measure_load(None),
+                    "scrape_window": measure_load(window_start),
+                }
+            )
+    connection.close()
+    return results
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Measure the showing dedup load as the showtimes history grows"
+    )
+    parser.add_argument(
+        "--history", type=int, default=1_000_000, help="Past showings at the end"
+    )
+    parser.add_argument(
+        "--upcoming", type=int, default=20_000, help="Showings in the scrape window"
+    )
+    parser.add_argument("--steps", type=int, default=4, help="History sizes measured")
+    parser.add_argument("--per_day", type=int, default=2_000, help="Showings per day")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    basicConfig(level="WARNING")
+    results = {
+        "history": run_benchmark(
+            args.history, args.upcoming, args.steps, args.per_day
+        ),
+        "key_formats": compare_key_formats(args.history),
+    }
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import datetime
+import tracemalloc
+from logging import getLogger, basicConfig
+
+# creds reads these at import time. The benchmark never contacts the database, so placeholders are enough when they are not set.
+for _name, _value in {
+    "DB_USER": "benchmark",
+    "DB_PORT": "3306",
+    "DB_HOST": "127.0.0.1",
+    "DB_NAME": "benchmark",
+    "PAYLOAD": "{}",
+    "DATA_REFRESH_AGE": "60",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.showing_record import ShowingRecord  # noqa: E402
+from showing import Showing, ShowingsManager  # noqa: E402
+
+
+# Micro-benchmark of the cost per scraped showing of validating, hashing and deduplicating showings. The batch path, ShowingsManager.process_showings, is compared with the previous per-showing path, which built a validated Showing for every start time before checking whether it was already known. Both run without a database, on the same synthetic records, with none, half or all of the showings already in the database.
+#
+# Run from the repository root:
+#   python -m benchmarks.showing_validation --records 2000 --times 6
+
+
+class InMemoryShowingsManager(ShowingsManager):
+    """ShowingsManager that starts with the given showing keys instead of reading them from the database."""
+
+    def __init__(self, logger, known_keys: set[int]) -> None:
+        self.known_keys = known_keys
+        super().__init__(logger)
+
+    def retrieve_showings(self, window_start=None) -> list[int]:
+        return list(self.known_keys)
+
+
+def per_showing_path(
+    show_man: ShowingsManager, records: list[ShowingRecord], cinema_id: str
+) -> None:
+    """The previous path: parse each start time, build a Showing validated by ShowingModel, then check its key against the known showings."""
+    for record in records:
+        for date_str in record.start_times:
+            try:
+                start_time = datetime.datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S")
+                new_showing = Showing(
+                    show_man.logger, record.movie_id, cinema_id, start_time
+                )
+                if not show_man.showing_already_in_database(new_showing.showing_key):
+                    show_man.add_new_showing(new_showing)
+            except Exception as e:
+                show_man.logger.error(f"Showing could not be processed: {e}")
+
+
+def batch_path(
+    show_man: ShowingsManager, records: list[ShowingRecord], cinema_id: str
+) -> None:
+    show_man.process_showings(records, cinema_id)
+
+
+def synthetic_records(count: int, times: int) -> list[ShowingRecord]:
+    """Create scraped records with `times` start times each."""
+    today = datetime.date.today()
+    return [
+        ShowingRecord(
+            movie_id=base64.b64encode(f"Movie:{number:06d}".encode()).decode(),
+            original_title=f"Movie {number}",
+            french_title=f"Film {number}",
+            genres=("DRAMA",),
+            languages=("ENGLISH",),
+            cast=(),
+            production_year=2024,
+            start_times=tuple(
+                f"{today + datetime.timedelta(days=number % 14)}T{10 + t:02d}:00:00"
+                for t in range(times)
+            ),
+        )
+        for number in range(count)
+    ]
+
+
+def measure(path, records: list[ShowingRecord], known_share: float) -> dict:
+    """Run a path over the records, with `known_share` of the showings already in the database, and return its cost per showing."""
+    logger = getLogger("benchmark")
+    cinema_id = "B0001"
+    all_keys = [
+        Showing.calculate_key(
+            record.movie_id,
+            cinema_id,
+            datetime.datetime.fromisoformat(date_str),
+        )
+        for record in records
+        for date_str in record.start_times
+    ]
+    known = set(all_keys[: int(len(all_keys) * known_share)])
+
+    show_man = InMemoryShowingsManager(logger, set(known))
+    t0 = time.perf_counter()
+    path(show_man, records, cinema_id)
+    elapsed = time.perf_counter() - t0
+
+    # Memory is measured on a separate run, as tracing slows the path down
+    traced_man = InMemoryShowingsManager(logger, set(known))
+    tracemalloc.start()
+    path(traced_man, records, cinema_id)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "new_showings": len(show_man.new_showings),
+        "us_per_showing": round(elapsed / len(all_keys) * 1e6, 2),
+        "traced_peak_kb": round(traced_peak / 1024, 1),
+    }
+
+
+def run_benchmark(count: int, times: int, repeat: int = 3) -> dict:
+    """
+    Compare the per-showing and batch paths.
+
+    Args:
+        count (int): Scraped records.
+        times (int): Start times per record.
+        repeat (int): Runs of each case, the fastest is reported.
+
+    Returns:
+        dict: Cost per showing of each path, by share of showings already known.
+    """
+    records = synthetic_records(count, times)
+    results = {"showings": count * times}
+    for known_share in (0.0, 0.5, 1.0):
+        case = {}
+        for name, path in (("per_showing", per_showing_path), ("batch", batch_path)):
+            runs = [measure(path, records, known_share) for _ in range(repeat)]
+            case[name] = min(runs, key=lambda run: run["us_per_showing"])
+        case["speedup"] = round(
+            case["per_showing"]["us_per_showing"] / case["batch"]["us_per_showing"], 2
+        )
+        results[f"known_{int(known_share * 100)}pct"] = case
+    return results
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Compare the per-showing and batch showing validation paths"
+    )
+    parser.add_argument("--records", type=int, default=2000, help="Scraped records")
+    parser.add_argument("--times", type=int, default=6, help="Start times per record")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each case")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    basicConfig(level="CRITICAL")
+    print(json.dumps(run_benchmark(args.records, args.times, args.repeat), indent=2))
@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import datetime
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from logging import getLogger, basicConfig
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+
+# creds reads these at import time. The benchmark never contacts the database or TMDB, so placeholders are enough when they are not set.
+for _name, _value in {
+    "DB_USER": "benchmark",
+    "DB_PORT": "3306",
+    "DB_HOST": "127.0.0.1",
+    "DB_NAME": "benchmark",
+    "PAYLOAD": "{}",
+    "DATA_REFRESH_AGE": "60",
+    "TMDB_API_TOKEN": "benchmark",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tmdb  # noqa: E402
+from movie import Movie  # noqa: E402
+from tmdb import TMDBEnricher, DETAILS_APPEND  # noqa: E402
+from tmdb_cache import TMDBCache  # noqa: E402
+from tmdb_index import TMDBIdIndex  # noqa: E402
+
+
+# Counts the TMDB requests made per enriched movie. A local HTTP server stands in for the TMDB search and details endpoints, including the sub-resources requested with append_to_response, and counts requests by endpoint. New movies are enriched twice, first with an empty cache and id index, as on a first run, then again with the cache and index the first pass filled, as for movies seen on a later run.
+#
+# Run from the repository root:
+#   python -m benchmarks.tmdb_requests --movies 200
+#   python -m benchmarks.tmdb_requests --movies 200 --not_found 0.1 --latency 0.02
+
+
+class FakeTMDB:
+    """Local stand-in for the TMDB API, serving search and details responses for synthetic movies, run on a background thread."""
+
+    def __init__(self, not_found: float = 0.0, latency: float = 0.0) -> None:
+        """
+        Initialize a FakeTMDB object.
+
+        Args:
+            not_found (float): Share of titles TMDB finds no movie for.
+            latency (float): Seconds added to every response.
+        """
+        self.not_found = not_found
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+
+    def __enter__(self) -> "FakeTMDB":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                url = urlsplit(self.path)
+                body, endpoint = fake.respond(url.path, parse_qs(url.query))
+                with fake._lock:
+                    fake.requests[endpoint] += 1
+                self.send_response(200 if body is not None else 404)
+                body = json.dumps(body if body is not None else {}).encode()
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/3"
+
+    def respond(self, path: str, params: dict) -> tuple[dict | None, str]:
+        """Return the response body for a request, None for a 404, and the endpoint it is counted under."""
+        if path.endswith("/search/movie"):
+            # Synthetic titles are "Movie <n>", and movie n has tmdb_id n + 1
+            number = int(params["query"][0].split()[-1])
+            if number % 100 < self.not_found * 100:
+                return {"results": []}, "search"
+            return {"results": [{"id": number + 1}]}, "search"
+
+        tmdb_id = int(path.rstrip("/").split("/")[-1])
+        append = params.get("append_to_response", [""])[0].split(",")
+        details = {
+            "id": tmdb_id,
+            "original_title": f"Movie {tmdb_id - 1}",
+            "origin_country": ["US"],
+            "vote_average": 7.1,
+            "runtime": 110,
+            "tagline": "A tagline",
+            "overview": "A synopsis",
+            "imdb_id": f"tt{tmdb_id:07d}",
+            "poster_path": f"/{tmdb_id}.jpg",
+            "release_date": "2024-09-01",
+        }
+        if "credits" in append:
+            details["credits"] = {
+                "cast": [{"name": f"Actor {i}", "order": i} for i in range(40)],
+                "crew": [{"name": f"Crew {i}", "job": "Grip"} for i in range(80)]
+                + [{"name": "A Director", "job": "Director"}],
+            }
+        if "release_dates" in append:
+            details["release_dates"] = {
+                "results": [
+                    {
+                        "iso_3166_1": country,
+                        "release_dates": [
+                            {"type": 3, "release_date": "2024-10-02T00:00:00.000Z"}
+                        ],
+                    }
+                    for country in ("US", "FR", "DE", "GB")
+                ]
+            }
+        if "external_ids" in append:
+            details["external_ids"] = {"imdb_id": f"tt{tmdb_id:07d}"}
+        return details, "details"
+
+
+def synthetic_movies(count: int) -> list[Movie]:
+    """Create new movies as the scraper would, with scraped fields only."""
+    logger = getLogger("benchmark")
+    return [
+        Movie(
+            logger=logger,
+            movie_id=base64.b64encode(f"Movie:{number:06d}".encode()).decode(),
+            original_title=f"Movie {number}",
+            french_title=f"Film {number}",
+            release_date=datetime.datetime(2024, 1, 1),
+        )
+        for number in range(count)
+    ]
+
+
+def enrich_pass(enricher: TMDBEnricher, fake: FakeTMDB, count: int) -> dict:
+    """Enrich `count` new movies and return the requests made per endpoint and per enriched movie."""
+    fake.requests.clear()
+    requests_before = enricher.requests_sent
+    t0 = time.perf_counter()
+    failed = enricher.enrich_movies(synthetic_movies(count))
+    wall_time = time.perf_counter() - t0
+    enriched = count - len(failed)
+    requests_sent = enricher.requests_sent - requests_before
+    return {
+        "movies": count,
+        "enriched": enriched,
+        "requests": requests_sent,
+        "search_requests": fake.requests["search"],
+        "details_requests": fake.requests["details"],
+        "requests_per_movie": round(requests_sent / enriched, 2) if enriched else None,
+        # What the same details would cost with a request per sub-resource
+        "requests_per_movie_without_append": (
+            round(
+                (
+                    fake.requests["search"]
+                    + fake.requests["details"] * (1 + len(DETAILS_APPEND))
+                )
+                / enriched,
+                2,
+            )
+            if enriched
+            else None
+        ),
+        "wall_time_s": round(wall_time, 3),
+    }
+
+
+def run_benchmark(
+    count: int, not_found: float = 0.0, latency: float = 0.0, workers: int = 8
+) -> dict:
+    """
+    Enrich new movies against a local TMDB stand-in, on a first run and on a later run.
+
+    Args:
+        count (int): New movies enriched per pass.
+        not_found (float): Share of titles TMDB finds no movie for.
+        latency (float): Seconds added to every response.
+        workers (int): Movies enriched in parallel.
+
+    Returns:
+        dict: Requests per endpoint and per enriched movie of each pass, and the size of the cached details.
+    """
+    logger = getLogger("benchmark")
+    with FakeTMDB(not_found, latency) as fake, mock.patch.object(
+        tmdb, "TMDB_API_URL", fake.url
+    ), mock.patch.object(
+        TMDBCache, "retrieve_entries", lambda self, **kwargs: []
+    ), mock.patch.object(
+        TMDBIdIndex, "retrieve_movies", lambda self: []
+    ), mock.patch.object(
+        TMDBIdIndex, "retrieve_ids", lambda self: []
+    ):
+        cache, index = TMDBCache(logger), TMDBIdIndex(logger)
+        # The stand-in is local, so the rate limit is raised to measure requests rather than pacing
+        enricher = TMDBEnricher(logger, cache, index, max_workers=workers, rate=1000.0)
+        try:
+            first_run = enrich_pass(enricher, fake, count)
+            later_run = enrich_pass(enricher, fake, count)
+        finally:
+            enricher.close()
+
+    details = [
+        response
+        for cache_key, response in cache.entries.items()
+        if cache_key.startswith("movie:") and response is not None
+    ]
+    return {
+        "append_to_response": ",".join(DETAILS_APPEND),
+        "first_run": first_run,
+        "later_run": later_run,
+        "cached_details_bytes_per_movie": (
+            round(sum(len(json.dumps(d)) for d in details) / len(details))
+            if details
+            else None
+        ),
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Count TMDB requests per enriched movie against a local stand-in"
+    )
+    parser.add_argument("--movies", type=int, default=200, help="New movies")
+    parser.add_argument(
+        "--not_found",
+        type=float,
+        default=0.0,
+        help="Share of titles TMDB finds no movie for",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response"
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Parallel movies")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    basicConfig(level="CRITICAL")
+    results = run_benchmark(args.movies, args.not_found, args.latency, args.workers)
+    print(json.dumps(results, indent=2))
@@ -11,9 +11,18 @@ def create_tables(db, cursor, logger):
         tables_present = set(table[0] for table in tables_present)
 
     queries = {
-        "movies": "CREATE TABLE movies (movie_id VARCHAR(191) PRIMARY KEY,original_title VARCHAR(191),french_title VARCHAR(191),runtime SMALLINT UNSIGNED,synopsis VARCHAR(1000),cast VARCHAR(191),languages VARCHAR(191),genres VARCHAR(191),release_date DATE,imdb_url VARCHAR(255),origin_country VARCHAR(191),poster_hi_res VARCHAR(255),poster_lo_res VARCHAR(255),tagline VARCHAR(255),tmdb_id INT UNSIGNED,rating_imdb TINYINT UNSIGNED,rating_rt TINYINT UNSIGNED,rating_meta TINYINT UNSIGNED,date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP););",
+        "movies": "CREATE TABLE movies (movie_id VARCHAR(191) PRIMARY KEY,original_title VARCHAR(191),french_title VARCHAR(191),runtime SMALLINT UNSIGNED,synopsis VARCHAR(1000),cast VARCHAR(191),directors VARCHAR(191),languages VARCHAR(191),genres VARCHAR(191),release_date DATE,french_release_date DATE,imdb_url VARCHAR(255),origin_country VARCHAR(191),poster_hi_res VARCHAR(255),poster_lo_res VARCHAR(255),tagline VARCHAR(255),tmdb_id INT UNSIGNED,rating_imdb TINYINT UNSIGNED,rating_rt TINYINT UNSIGNED,rating_meta TINYINT UNSIGNED,ratings_updated_at DATETIME,enrichment_status VARCHAR(16) NOT NULL DEFAULT 'pending',enrichment_attempts SMALLINT UNSIGNED NOT NULL DEFAULT 0,enrichment_next_attempt DATETIME,date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP););",
         "cinemas": "CREATE TABLE cinemas (cinema_id CHAR(5) PRIMARY KEY,`name` VARCHAR(191),`address` VARCHAR(255),info VARCHAR(255),gps POINT,town VARCHAR(191));",
-        "showtimes": "CREATE TABLE showtimes (showtime_id INT UNSIGNED PRIMARY KEY AUTO_INCREMENT,movie_id VARCHAR(191),cinema_id CHAR(5),start_time DATETIME,hash_id CHAR(64),CONSTRAINT fk_movie_id FOREIGN KEY (movie_id) REFERENCES movies(movie_id),CONSTRAINT fk_cinema_id FOREIGN KEY (cinema_id) REFERENCES cinemas(cinema_id),CONSTRAINT unique_hash_id UNIQUE (hash_id));",
+        "showtimes": "CREATE TABLE showtimes (showtime_id INT UNSIGNED PRIMARY KEY AUTO_INCREMENT,movie_id VARCHAR(191),cinema_id CHAR(5),start_time DATETIME,showing_key BIGINT UNSIGNED,CONSTRAINT fk_movie_id FOREIGN KEY (movie_id) REFERENCES movies(movie_id),CONSTRAINT fk_cinema_id FOREIGN KEY (cinema_id) REFERENCES cinemas(cinema_id),CONSTRAINT unique_showing_key UNIQUE (showing_key),INDEX idx_showtimes_start_time (start_time),INDEX idx_showtimes_cinema_start_time (cinema_id, start_time));",
+        "showtime_changes": "CREATE TABLE showtime_changes (change_id BIGINT UNSIGNED PRIMARY KEY AUTO_INCREMENT,showing_key BIGINT UNSIGNED NOT NULL,change_type VARCHAR(8) NOT NULL,changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,INDEX idx_showtime_changes_changed_at (changed_at));",
+        "scrape_health": "CREATE TABLE scrape_health (cinema_id CHAR(5) PRIMARY KEY,state VARCHAR(16) NOT NULL DEFAULT 'closed',direct_success INT UNSIGNED NOT NULL DEFAULT 0,direct_fail INT UNSIGNED NOT NULL DEFAULT 0,consecutive_failures SMALLINT UNSIGNED NOT NULL DEFAULT 0,opened_at DATETIME,updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,CONSTRAINT fk_health_cinema_id FOREIGN KEY (cinema_id) REFERENCES cinemas(cinema_id) ON DELETE CASCADE);",
+        "scrape_jobs": "CREATE TABLE scrape_jobs (run_id CHAR(32) NOT NULL,run_window CHAR(21) NOT NULL,cinema_id CHAR(5) NOT NULL,show_date DATE NOT NULL,status VARCHAR(16) NOT NULL DEFAULT 'pending',worker_id VARCHAR(191),leased_at DATETIME,created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,PRIMARY KEY (run_id, cinema_id, show_date),INDEX idx_scrape_jobs_window (run_window, created_at));",
+        "scrape_runs": "CREATE TABLE scrape_runs (run_id CHAR(32) NOT NULL PRIMARY KEY,run_window CHAR(21) NOT NULL,merged_by VARCHAR(191),merged_at DATETIME,finished_at DATETIME,created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);",
+        "page_fingerprints": "CREATE TABLE page_fingerprints (cinema_id CHAR(5) NOT NULL,show_date DATE NOT NULL,content_hash CHAR(64) NOT NULL,checked_at DATETIME NOT NULL,PRIMARY KEY (cinema_id, show_date));",
+        "page_change_stats": "CREATE TABLE page_change_stats (cinema_id CHAR(5) NOT NULL,day_offset SMALLINT NOT NULL,checks INT UNSIGNED NOT NULL DEFAULT 0,changes INT UNSIGNED NOT NULL DEFAULT 0,last_checked DATETIME,PRIMARY KEY (cinema_id, day_offset));",
+        "tmdb_cache": "CREATE TABLE tmdb_cache (cache_key VARCHAR(255) NOT NULL PRIMARY KEY,response MEDIUMTEXT,found BOOLEAN NOT NULL,fetched_at DATETIME NOT NULL,INDEX idx_tmdb_cache_fetched_at (fetched_at));",
+        "api_usage": "CREATE TABLE api_usage (api VARCHAR(32) NOT NULL,usage_date DATE NOT NULL,requests INT UNSIGNED NOT NULL DEFAULT 0,PRIMARY KEY (api, usage_date));",
+        "tmdb_ids": "CREATE TABLE tmdb_ids (lookup_key VARCHAR(255) NOT NULL PRIMARY KEY,tmdb_id INT UNSIGNED NOT NULL,updated_at DATETIME NOT NULL);",
     }
 
     for query in queries:
@@ -27,6 +36,89 @@ def create_tables(db, cursor, logger):
     return tables_present
 
 
+def add_missing_columns(db, cursor, logger):
+    """Add columns introduced since a table was created, so existing deployments are migrated in place."""
+    columns = {
+        ("movies", "ratings_updated_at"): [
+            "ALTER TABLE movies ADD COLUMN ratings_updated_at DATETIME AFTER rating_meta;"
+        ],
+        # Movies written before the enrichment queue already have their TMDB details
+        ("movies", "enrichment_status"): [
+            "ALTER TABLE movies ADD COLUMN enrichment_status VARCHAR(16) NOT NULL DEFAULT 'enriched' AFTER ratings_updated_at;",
+            "ALTER TABLE movies ALTER COLUMN enrichment_status SET DEFAULT 'pending';",
+        ],
+        ("movies", "enrichment_attempts"): [
+            "ALTER TABLE movies ADD COLUMN enrichment_attempts SMALLINT UNSIGNED NOT NULL DEFAULT 0 AFTER enrichment_status;"
+        ],
+        ("movies", "enrichment_next_attempt"): [
+            "ALTER TABLE movies ADD COLUMN enrichment_next_attempt DATETIME AFTER enrichment_attempts;"
+        ],
+        ("movies", "directors"): [
+            "ALTER TABLE movies ADD COLUMN directors VARCHAR(191) AFTER cast;"
+        ],
+        ("movies", "french_release_date"): [
+            "ALTER TABLE movies ADD COLUMN french_release_date DATE AFTER release_date;"
+        ],
+        ("showtimes", "showing_key"): [
+            "ALTER TABLE showtimes ADD COLUMN showing_key BIGINT UNSIGNED AFTER start_time;"
+        ],
+        ("scrape_runs", "finished_at"): [
+            "ALTER TABLE scrape_runs ADD COLUMN finished_at DATETIME AFTER merged_at;"
+        ],
+    }
+
+    for (table, column), queries in columns.items():
+        cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s;", (column,))
+        if not cursor.fetchall():
+            for query in queries:
+                cursor.execute(query)
+            logger.info(f"Column {table}.{column} added")
+    db.commit()
+
+
+def migrate_showing_keys(db, cursor, logger):
+    """Replace the hex SHA-256 hash_id of showings with the 63-bit showing_key taken from the same hash, see Showing.key_from_digest. Each step is checked separately, so a migration that failed part way is finished by the next run."""
+    cursor.execute("SHOW COLUMNS FROM showtimes LIKE 'hash_id';")
+    has_hash_id = bool(cursor.fetchall())
+    if has_hash_id:
+        cursor.execute(
+            "UPDATE showtimes SET showing_key = CAST(CONV(LEFT(hash_id, 16), 16, 10) AS UNSIGNED) >> 1 WHERE showing_key IS NULL;"
+        )
+        db.commit()
+
+    cursor.execute("SHOW INDEX FROM showtimes WHERE Key_name = 'unique_showing_key';")
+    if not cursor.fetchall():
+        cursor.execute(
+            "ALTER TABLE showtimes ADD CONSTRAINT unique_showing_key UNIQUE (showing_key);"
+        )
+        logger.info("Index showtimes.unique_showing_key added")
+
+    if has_hash_id:
+        cursor.execute("SHOW INDEX FROM showtimes WHERE Key_name = 'unique_hash_id';")
+        if cursor.fetchall():
+            cursor.execute("ALTER TABLE showtimes DROP INDEX unique_hash_id;")
+        cursor.execute("ALTER TABLE showtimes DROP COLUMN hash_id;")
+        logger.info("Column showtimes.hash_id replaced by showing_key")
+    db.commit()
+
+
+def add_missing_indexes(db, cursor, logger):
+    """Add indexes introduced since a table was created, so existing deployments are migrated in place."""
+    indexes = {
+        # Scraper runs load the keys of showings from the start of the scrape window only
+        ("showtimes", "idx_showtimes_start_time"): "CREATE INDEX idx_showtimes_start_time ON showtimes (start_time);",
+        # Stored showings of a cinema on a scraped day are compared with the scraped ones, to remove cancelled showings
+        ("showtimes", "idx_showtimes_cinema_start_time"): "CREATE INDEX idx_showtimes_cinema_start_time ON showtimes (cinema_id, start_time);",
+    }
+
+    for (table, index), query in indexes.items():
+        cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s;", (index,))
+        if not cursor.fetchall():
+            cursor.execute(query)
+            logger.info(f"Index {table}.{index} added")
+    db.commit()
+
+
 def add_cinemas(db, cursor, logger):
     """Add cinema records to the cinemas table in the database."""
 
@@ -54,5 +146,8 @@ def add_cinemas(db, cursor, logger):
 def build_db(db, cursor, logger):
     """Initialize the database by creating tables and adding cinema data."""
     tables_present = create_tables(db, cursor, logger=logger)
+    add_missing_columns(db, cursor, logger=logger)
+    migrate_showing_keys(db, cursor, logger=logger)
+    add_missing_indexes(db, cursor, logger=logger)
     add_cinemas(db, cursor, logger=logger)
     return f"Tables in databse: {tables_present}"
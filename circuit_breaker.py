@@ -0,0 +1,180 @@
+import datetime
+from logging import Logger
+from threading import Lock
+
+from db_utilities import connect_to_database
+
+
+TABLE_NAME = "scrape_health"
+
+
+# Circuit breaker for direct scraping of one cinema, while open its URLs go straight to ScrapingAnt.
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        cinema_id: str,
+        state: str = CLOSED,
+        direct_success: int = 0,
+        direct_fail: int = 0,
+        consecutive_failures: int = 0,
+        opened_at: datetime.datetime | None = None,
+        failure_threshold: int = 3,
+        probe_interval: datetime.timedelta = datetime.timedelta(hours=24),
+    ) -> None:
+        """
+        Initialize a CircuitBreaker object. An open breaker becomes half open once `probe_interval` has passed, allowing a single direct request to probe whether direct access has come back.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            state (str): "closed", "open" or "half_open".
+            direct_success (int): Direct requests that have succeeded, across all runs.
+            direct_fail (int): Direct requests that have failed, across all runs.
+            consecutive_failures (int): Direct requests that have failed since the last success.
+            opened_at (datetime, optional): When the breaker was last opened.
+            failure_threshold (int): Consecutive failures that open the breaker.
+            probe_interval (timedelta): How long the breaker stays open before probing again.
+        """
+        self.cinema_id: str = cinema_id
+        self.state: str = state
+        self.direct_success: int = direct_success
+        self.direct_fail: int = direct_fail
+        self.consecutive_failures: int = consecutive_failures
+        self.opened_at: datetime.datetime | None = opened_at
+        self.failure_threshold: int = failure_threshold
+        # A half open breaker's probe is in flight, other requests wait for its outcome on ScrapingAnt
+        self.probing: bool = False
+        self._lock: Lock = Lock()
+
+        if (
+            self.state == self.OPEN
+            and self.opened_at is not None
+            and datetime.datetime.now() - self.opened_at >= probe_interval
+        ):
+            self.state = self.HALF_OPEN
+
+    def allow_direct(self) -> bool:
+        """Return True if the next request should be tried directly. A half open breaker allows a single probe until its outcome is recorded."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        """
+        Record the outcome of a direct request.
+
+        Args:
+            success (bool): True if the direct request succeeded.
+        """
+        with self._lock:
+            self.probing = False
+            if success:
+                self.direct_success += 1
+                self.consecutive_failures = 0
+                self.state = self.CLOSED
+                self.opened_at = None
+            else:
+                self.direct_fail += 1
+                self.consecutive_failures += 1
+                if (
+                    self.state == self.HALF_OPEN
+                    or self.consecutive_failures >= self.failure_threshold
+                ):
+                    self.state = self.OPEN
+                    self.opened_at = datetime.datetime.now()
+
+    @property
+    def success_rate(self) -> float | None:
+        """Share of direct requests that have succeeded, None if none have been made."""
+        total = self.direct_success + self.direct_fail
+        return self.direct_success / total if total else None
+
+    def database_format(self) -> dict:
+        """Return object in a format to be inserted into database"""
+        return {attr: self.__dict__.get(attr) for attr in self.get_columns()}
+
+    @staticmethod
+    def get_columns() -> tuple[str]:
+        """Returns a tuple of the database column names to be written to"""
+        return (
+            "cinema_id",
+            "state",
+            "direct_success",
+            "direct_fail",
+            "consecutive_failures",
+            "opened_at",
+        )
+
+
+class CircuitBreakerManager:
+    """Loads the circuit breaker of every cinema at the start of a run, and saves them at the end so they persist across runs."""
+
+    def __init__(self, logger: Logger) -> None:
+        """Initialize a CircuitBreakerManager object."""
+        self.logger: Logger = logger
+        self.breakers: dict[str, CircuitBreaker] = {}
+        # Only breakers handed out this run are saved, so workers sharing a run keep each other's state
+        self.used: set[str] = set()
+        try:
+            self.breakers = {
+                row["cinema_id"]: CircuitBreaker(**row)
+                for row in self.retrieve_breakers()
+            }
+        except Exception as e:
+            # Scraping can continue without history, all cinemas start closed
+            self.logger.warning(f"Unable to retrieve circuit breakers: {e}")
+
+    @connect_to_database
+    def retrieve_breakers(self, db, cursor) -> list[dict]:
+        """Retrieve the stored circuit breaker state for all cinemas."""
+        cursor = db.cursor(dictionary=True)
+        query = f"SELECT {', '.join(CircuitBreaker.get_columns())} FROM {TABLE_NAME};"
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    def get(self, cinema_id: str) -> CircuitBreaker:
+        """Return the circuit breaker for `cinema_id`, creating a closed one if the cinema has no history."""
+        if cinema_id not in self.breakers:
+            self.breakers[cinema_id] = CircuitBreaker(cinema_id)
+        self.used.add(cinema_id)
+        return self.breakers[cinema_id]
+
+    @connect_to_database
+    def save(self, db=None, cursor=None) -> None:
+        """Write the state of the circuit breakers used this run to the database."""
+        if self.used:
+            columns = CircuitBreaker.get_columns()
+            placeholders = ", ".join(f"%({key})s" for key in columns)
+            updates = ", ".join(
+                f"{col} = VALUES({col})" for col in columns if col != "cinema_id"
+            )
+            upsert_query = f"INSERT INTO {TABLE_NAME} ({', '.join(columns)}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {updates};"
+            cursor.executemany(
+                upsert_query,
+                [self.breakers[cinema_id].database_format() for cinema_id in self.used],
+            )
+            db.commit()
+
+            open_breakers = [
+                cinema_id
+                for cinema_id in self.used
+                if self.breakers[cinema_id].state == CircuitBreaker.OPEN
+            ]
+            if open_breakers:
+                self.logger.info(
+                    f"Direct scraping circuit open for cinema(s): {', '.join(sorted(open_breakers))}"
+                )
+
+    def __str__(self) -> str:
+        """Return a string showing how many circuit breakers are open."""
+        open_count = sum(
+            breaker.state == CircuitBreaker.OPEN for breaker in self.breakers.values()
+        )
+        return f"{open_count} of {len(self.breakers)} direct scraping circuit(s) open"
@@ -6,9 +6,11 @@ CREATE TABLE movies (
     runtime SMALLINT UNSIGNED,
     synopsis VARCHAR(1000),
     cast VARCHAR(191),
+    directors VARCHAR(191),
     languages VARCHAR(191),
     genres VARCHAR(191),
     release_date DATE,
+    french_release_date DATE,
     imdb_url VARCHAR(255),
     origin_country VARCHAR(191),
     poster_hi_res VARCHAR(255),
@@ -18,6 +20,11 @@ CREATE TABLE movies (
     rating_imdb TINYINT UNSIGNED,
     rating_rt TINYINT UNSIGNED,
     rating_meta TINYINT UNSIGNED,
+    ratings_updated_at DATETIME,
+    -- pending until TMDB details are retrieved, failed movies are retried from enrichment_next_attempt
+    enrichment_status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    enrichment_attempts SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    enrichment_next_attempt DATETIME,
     date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
 
 -- Create cinemas table
@@ -30,13 +37,106 @@ CREATE TABLE cinemas (
     town VARCHAR(191));
 
 -- Create showtimes table
--- hash_id is used to compare showings in database with newly scrapes showings to identify unknown ones, using SHA256
+-- showing_key is used to compare showings in database with newly scrapes showings to identify unknown ones, using the first 63 bits of the SHA256 of movie_id, cinema_id and start_time
 CREATE TABLE showtimes (
     showtime_id INT UNSIGNED PRIMARY KEY AUTO_INCREMENT,
     movie_id VARCHAR(191),
     cinema_id CHAR(5),
     start_time DATETIME,
-    hash_id CHAR(64),
+    showing_key BIGINT UNSIGNED,
     CONSTRAINT fk_movie_id FOREIGN KEY (movie_id) REFERENCES movies(movie_id),
     CONSTRAINT fk_cinema_id FOREIGN KEY (cinema_id) REFERENCES cinemas(cinema_id),
-    CONSTRAINT unique_hash_id UNIQUE (hash_id));
+    CONSTRAINT unique_showing_key UNIQUE (showing_key),
+    -- Scraper runs only load the keys of showings in the scrape window
+    INDEX idx_showtimes_start_time (start_time),
+    -- Stored showings of a cinema on a scraped day are compared with the scraped ones, to remove cancelled showings
+    INDEX idx_showtimes_cinema_start_time (cinema_id, start_time));
+
+-- Create showtime_changes table
+-- Showings inserted and deleted by scraper runs, in order, so the API cache can apply the changes since its last refresh instead of reloading every showing. Kept for a week
+CREATE TABLE showtime_changes (
+    change_id BIGINT UNSIGNED PRIMARY KEY AUTO_INCREMENT,
+    showing_key BIGINT UNSIGNED NOT NULL,
+    change_type VARCHAR(8) NOT NULL,
+    changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_showtime_changes_changed_at (changed_at));
+
+-- Create scrape_health table
+-- Direct scraping circuit breaker for each cinema, persisted across runs so cinemas that block direct requests are sent straight to ScrapingAnt
+CREATE TABLE scrape_health (
+    cinema_id CHAR(5) PRIMARY KEY,
+    state VARCHAR(16) NOT NULL DEFAULT 'closed',
+    direct_success INT UNSIGNED NOT NULL DEFAULT 0,
+    direct_fail INT UNSIGNED NOT NULL DEFAULT 0,
+    consecutive_failures SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    opened_at DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    CONSTRAINT fk_health_cinema_id FOREIGN KEY (cinema_id) REFERENCES cinemas(cinema_id) ON DELETE CASCADE);
+
+-- Create scrape_jobs table
+-- One row per (cinema, date) work item of a scraper run. Items are leased while being scraped and marked done once committed, so an interrupted run can be resumed
+CREATE TABLE scrape_jobs (
+    run_id CHAR(32) NOT NULL,
+    run_window CHAR(21) NOT NULL,
+    cinema_id CHAR(5) NOT NULL,
+    show_date DATE NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    worker_id VARCHAR(191),
+    leased_at DATETIME,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, cinema_id, show_date),
+    INDEX idx_scrape_jobs_window (run_window, created_at));
+
+-- Create scrape_runs table
+-- One row per scraper run, shared by every worker on the run. The merge step is claimed here so it runs once per run
+CREATE TABLE scrape_runs (
+    run_id CHAR(32) NOT NULL PRIMARY KEY,
+    run_window CHAR(21) NOT NULL,
+    merged_by VARCHAR(191),
+    merged_at DATETIME,
+    finished_at DATETIME,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+
+-- Create page_fingerprints table
+-- SHA256 of the English showings on each (cinema, date) page, so pages unchanged since the last run can skip processing
+CREATE TABLE page_fingerprints (
+    cinema_id CHAR(5) NOT NULL,
+    show_date DATE NOT NULL,
+    content_hash CHAR(64) NOT NULL,
+    checked_at DATETIME NOT NULL,
+    PRIMARY KEY (cinema_id, show_date));
+
+-- Create page_change_stats table
+-- How often the page for each cinema and day offset has changed, used to prioritise pages when a scraper run has a request budget
+CREATE TABLE page_change_stats (
+    cinema_id CHAR(5) NOT NULL,
+    day_offset SMALLINT NOT NULL,
+    checks INT UNSIGNED NOT NULL DEFAULT 0,
+    changes INT UNSIGNED NOT NULL DEFAULT 0,
+    last_checked DATETIME,
+    PRIMARY KEY (cinema_id, day_offset));
+
+-- Create tmdb_cache table
+-- TMDB search and details responses, keyed by query and year or by tmdb_id, so repeat lookups do not call TMDB. Responses that found nothing are kept for a shorter time than those that found a movie
+CREATE TABLE tmdb_cache (
+    cache_key VARCHAR(255) NOT NULL PRIMARY KEY,
+    response MEDIUMTEXT,
+    found BOOLEAN NOT NULL,
+    fetched_at DATETIME NOT NULL,
+    INDEX idx_tmdb_cache_fetched_at (fetched_at));
+
+-- Create tmdb_ids table
+-- tmdb_id each scraped movie_id and normalized (title, year) resolved to, so movies seen before, even if since purged from movies, need no TMDB search
+CREATE TABLE tmdb_ids (
+    lookup_key VARCHAR(255) NOT NULL PRIMARY KEY,
+    tmdb_id INT UNSIGNED NOT NULL,
+    updated_at DATETIME NOT NULL);
+
+-- Create api_usage table
+-- Requests sent to rate limited external APIs each day, so the daily OMDb quota is shared across runs
+CREATE TABLE api_usage (
+    api VARCHAR(32) NOT NULL,
+    usage_date DATE NOT NULL,
+    requests INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (api, usage_date));
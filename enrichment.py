@@ -0,0 +1,222 @@
+import datetime
+from logging import Logger
+
+from db_utilities import connect_to_database
+from movie import Movie
+from tmdb import TMDBEnricher
+from tmdb_cache import TMDBCache
+from tmdb_index import TMDBIdIndex
+
+
+TABLE_NAME = "movies"
+
+# Columns filled in from TMDB once a movie is enriched
+ENRICHED_COLUMNS = (
+    "original_title",
+    "tagline",
+    "rating",
+    "runtime",
+    "synopsis",
+    "release_date",
+    "french_release_date",
+    "cast",
+    "directors",
+    "origin_country",
+    "imdb_url",
+    "poster_hi_res",
+    "poster_lo_res",
+    "tmdb_id",
+)
+
+
+# Movies waiting for TMDB details, tracked by movies.enrichment_status and retried with backoff.
+class EnrichmentQueue:
+    def __init__(
+        self,
+        logger: Logger,
+        enricher: TMDBEnricher,
+        max_attempts: int = 8,
+        base_delay: datetime.timedelta = datetime.timedelta(minutes=30),
+        batch_size: int = 50,
+    ) -> None:
+        """
+        Initialize an EnrichmentQueue object.
+
+        Args:
+            logger (Logger): Logger object.
+            enricher (TMDBEnricher): Client the details are retrieved with.
+            max_attempts (int): Attempts after which a failed movie is no longer retried.
+            base_delay (timedelta): Delay before the first retry, doubled after each failed attempt.
+            batch_size (int): Movies enriched concurrently per batch when draining.
+        """
+        self.logger: Logger = logger
+        self.enricher: TMDBEnricher = enricher
+        self.max_attempts: int = max_attempts
+        self.base_delay: datetime.timedelta = base_delay
+        self.batch_size: int = batch_size
+
+    @connect_to_database
+    def get_due_movies(self, db, cursor, limit: int) -> list[tuple]:
+        """Retrieve pending movies, and failed movies whose retry is due, oldest first."""
+        query = f"""
+            SELECT movie_id, original_title, french_title, cast, languages, genres, release_date FROM {TABLE_NAME}
+            WHERE enrichment_status IN (%s, %s)
+            AND enrichment_attempts < %s
+            AND (enrichment_next_attempt IS NULL OR enrichment_next_attempt <= NOW())
+            ORDER BY date_added
+            LIMIT %s;
+        """
+        cursor.execute(query, (Movie.PENDING, Movie.FAILED, self.max_attempts, limit))
+        return cursor.fetchall()
+
+    @connect_to_database
+    def get_status_counts(self, db, cursor) -> dict[str, int]:
+        """Return the number of movies in each enrichment status."""
+        query = f"SELECT enrichment_status, COUNT(*) FROM {TABLE_NAME} GROUP BY enrichment_status;"
+        cursor.execute(query)
+        return dict(cursor.fetchall())
+
+    def create_movie(self, row: tuple) -> Movie:
+        """Create a Movie from the scraped fields stored in the database."""
+        movie_id, original_title, french_title, cast, languages, genres = row[:6]
+        release_date = row[6]
+
+        def split(csv: str | None) -> list[str] | None:
+            return csv.split(",") if csv else None
+
+        return Movie(
+            logger=self.logger,
+            movie_id=movie_id,
+            original_title=original_title,
+            french_title=french_title,
+            cast=split(cast),
+            languages=split(languages),
+            genres=split(genres),
+            release_date=(
+                datetime.datetime.combine(release_date, datetime.time())
+                if release_date
+                else None
+            ),
+        )
+
+    @connect_to_database
+    def save_results(
+        self, db, cursor, enriched: list[Movie], failed_ids: list[str]
+    ) -> None:
+        """
+        Write the TMDB details of enriched movies, and schedule the retry of failed movies.
+
+        Args:
+            enriched (list[Movie]): Movies enriched successfully.
+            failed_ids (list[str]): IDs of movies that could not be enriched.
+        """
+        if enriched:
+            set_clause = ", ".join(f"{col} = %({col})s" for col in ENRICHED_COLUMNS)
+            update_query = f"""
+                UPDATE {TABLE_NAME}
+                SET {set_clause}, enrichment_status = %(enrichment_status)s, enrichment_attempts = enrichment_attempts + 1, enrichment_next_attempt = NULL
+                WHERE movie_id = %(movie_id)s;
+            """
+            cursor.executemany(
+                update_query, [movie.database_format() for movie in enriched]
+            )
+        if failed_ids:
+            base_delay_minutes = int(self.base_delay.total_seconds() // 60)
+            # Delay doubles with each attempt, the attempt count is read before it is incremented
+            update_query = f"""
+                UPDATE {TABLE_NAME}
+                SET enrichment_status = %s, enrichment_next_attempt = NOW() + INTERVAL %s * POW(2, enrichment_attempts) MINUTE, enrichment_attempts = enrichment_attempts + 1
+                WHERE movie_id = %s;
+            """
+            cursor.executemany(
+                update_query,
+                [
+                    (Movie.FAILED, base_delay_minutes, movie_id)
+                    for movie_id in failed_ids
+                ],
+            )
+        db.commit()
+
+    def enrich(self, movie: Movie) -> bool:
+        """
+        Enrich a movie already written to the database, and write the result.
+
+        Args:
+            movie (Movie): The movie to enrich.
+
+        Returns:
+            bool: True if the movie was enriched.
+        """
+        try:
+            self.enricher.enrich(movie)
+        except Exception as e:
+            self.logger.error(f"Unable to enrich Movie {movie.movie_id}: {e}")
+            self.save_results([], [movie.movie_id])
+            return False
+        self.save_results([movie], [])
+        return True
+
+    def drain(self, limit: int | None = None) -> dict:
+        """
+        Enrich movies due for enrichment, in concurrent batches, until none are left or `limit` movies have been attempted.
+
+        Args:
+            limit (int, optional): Maximum number of movies to attempt. All due movies if None.
+
+        Returns:
+            dict: Movies enriched and failed, and the number of movies in each status afterwards.
+        """
+        enriched_count, failed_count = 0, 0
+        while limit is None or enriched_count + failed_count < limit:
+            batch_size = self.batch_size
+            if limit is not None:
+                batch_size = min(batch_size, limit - enriched_count - failed_count)
+            rows = self.get_due_movies(limit=batch_size)
+            if not rows:
+                break
+
+            movies, failed_ids = [], []
+            for row in rows:
+                try:
+                    movies.append(self.create_movie(row))
+                except Exception as e:
+                    # Stored fields that no longer validate are retried with backoff like any other failure
+                    self.logger.error(f"Unable to create Movie {row[0]}: {e}")
+                    failed_ids.append(row[0])
+            failed = self.enricher.enrich_movies(movies)
+            failed_ids += [movie.movie_id for movie in failed]
+            enriched = [movie for movie in movies if movie not in failed]
+            self.save_results(enriched, failed_ids)
+            self.enricher.save_cache()
+            enriched_count += len(enriched)
+            failed_count += len(failed_ids)
+
+        results = {
+            "enriched": enriched_count,
+            "failed": failed_count,
+            "status": self.get_status_counts(),
+        }
+        if enriched_count or failed_count:
+            self.logger.info(
+                f"Enrichment queue drained: {enriched_count} movies enriched, {failed_count} failed, status {results['status']}"
+            )
+        return results
+
+
+def drain_enrichment_queue(logger: Logger, limit: int | None = None) -> dict:
+    """
+    Enrich pending and due failed movies outside a scraper run, e.g. after TMDB was unavailable during one.
+
+    Args:
+        logger (Logger): Logger object.
+        limit (int, optional): Maximum number of movies to attempt. All due movies if None.
+
+    Returns:
+        dict: See EnrichmentQueue.drain.
+    """
+    enricher = TMDBEnricher(logger, TMDBCache(logger), TMDBIdIndex(logger))
+    try:
+        return EnrichmentQueue(logger, enricher).drain(limit)
+    finally:
+        enricher.save_cache()
+        enricher.close()
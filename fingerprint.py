@@ -0,0 +1,102 @@
+import json
+import datetime
+import hashlib
+from logging import Logger
+
+from db_utilities import connect_to_database
+
+
+TABLE_NAME = "page_fingerprints"
+
+
+# Hash of the English showings on each (cinema_id, date) page, so unchanged pages skip processing.
+class PageFingerprints:
+    def __init__(
+        self,
+        logger: Logger,
+        max_age: datetime.timedelta = datetime.timedelta(days=7),
+    ) -> None:
+        """
+        Initialize a PageFingerprints object and load the stored fingerprints of upcoming dates.
+
+        Args:
+            logger (Logger): Logger object.
+            max_age (timedelta): Fingerprints older than this are ignored, so every page is fully processed at least this often.
+        """
+        self.logger: Logger = logger
+        self.fingerprints: dict[tuple[str, datetime.date], str] = {}
+        try:
+            self.fingerprints = {
+                (cinema_id, show_date): content_hash
+                for cinema_id, show_date, content_hash in self.retrieve_fingerprints(
+                    max_age_hours=int(max_age.total_seconds() // 3600)
+                )
+            }
+        except Exception as e:
+            self.logger.warning(
+                f"Unable to retrieve page fingerprints, all pages are processed: {e}"
+            )
+
+    @connect_to_database
+    def retrieve_fingerprints(
+        self, db, cursor, max_age_hours: int
+    ) -> list[tuple[str, datetime.date, str]]:
+        """Retrieve fingerprints of upcoming dates checked within the last `max_age_hours`."""
+        query = f"SELECT cinema_id, show_date, content_hash FROM {TABLE_NAME} WHERE show_date >= CURDATE() AND checked_at >= NOW() - INTERVAL %s HOUR;"
+        cursor.execute(query, (max_age_hours,))
+        return cursor.fetchall()
+
+    @staticmethod
+    def calculate_hash(showings: list[dict]) -> str:
+        """
+        Calculate the SHA-256 hash of the English showings listed on a page. Keys are sorted so the hash does not depend on the order of keys in the response.
+
+        Args:
+            showings (list[dict]): English showings from the page.
+
+        Returns:
+            str: The calculated hash value.
+        """
+        data = json.dumps(showings, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def is_unchanged(
+        self, cinema_id: str, show_date: datetime.date, content_hash: str
+    ) -> bool | None:
+        """Return True if the page has the same fingerprint as when it was last processed, or None if it has no fingerprint."""
+        previous_hash = self.fingerprints.get((cinema_id, show_date))
+        if previous_hash is None:
+            return None
+        return previous_hash == content_hash
+
+    @connect_to_database
+    def save(
+        self,
+        db,
+        cursor,
+        cinema_id: str,
+        page_hashes: dict[datetime.date, str],
+    ) -> None:
+        """
+        Store the fingerprints of a cinema's pages. Only call once the pages' movies and showings have been committed, otherwise a failed write would be skipped on the next run.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            page_hashes (dict[date, str]): Fingerprint of each processed page, by date.
+        """
+        if page_hashes:
+            upsert_query = f"INSERT INTO {TABLE_NAME} (cinema_id, show_date, content_hash, checked_at) VALUES (%s, %s, %s, NOW()) ON DUPLICATE KEY UPDATE content_hash = VALUES(content_hash), checked_at = NOW();"
+            cursor.executemany(
+                upsert_query,
+                [
+                    (cinema_id, show_date, content_hash)
+                    for show_date, content_hash in page_hashes.items()
+                ],
+            )
+            cursor.execute(
+                f"DELETE FROM {TABLE_NAME} WHERE cinema_id = %s AND show_date < CURDATE();",
+                (cinema_id,),
+            )
+            db.commit()
+            for show_date, content_hash in page_hashes.items():
+                self.fingerprints[(cinema_id, show_date)] = content_hash
@@ -0,0 +1,145 @@
+import datetime
+from logging import Logger
+
+from db_utilities import connect_to_database
+
+
+TABLE_NAME = "page_change_stats"
+
+
+# Chooses the (cinema, day) pages to scrape within a request budget, from how often each page changes.
+class HorizonPlanner:
+    def __init__(
+        self,
+        logger: Logger,
+        near_days: int = 7,
+        max_age_factor: float = 7.0,
+    ) -> None:
+        """
+        Initialize a HorizonPlanner object and load the recorded change statistics.
+
+        Args:
+            logger (Logger): Logger object.
+            near_days (int): Day offset at which a page is weighted half as much as today's page.
+            max_age_factor (float): Cap on how much the time since a page was last checked can raise its priority, in days.
+        """
+        self.logger: Logger = logger
+        self.near_days: int = near_days
+        self.max_age_factor: float = max_age_factor
+        self.stats: dict[tuple[str, int], dict] = {}
+        try:
+            self.stats = {
+                (row["cinema_id"], row["day_offset"]): row
+                for row in self.retrieve_stats()
+            }
+        except Exception as e:
+            # Without statistics every page has the same change rate, so pages are prioritised by day offset alone
+            self.logger.warning(f"Unable to retrieve page change statistics: {e}")
+
+    @connect_to_database
+    def retrieve_stats(self, db, cursor) -> list[dict]:
+        """Retrieve the change statistics of every cinema and day offset."""
+        cursor = db.cursor(dictionary=True)
+        query = f"SELECT cinema_id, day_offset, checks, changes, last_checked FROM {TABLE_NAME};"
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    def priority(self, cinema_id: str, day_offset: int, now: datetime.datetime) -> float:
+        """
+        Return the scraping priority of a page: its estimated chance of having changed, weighted towards near days and pages not checked recently.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            day_offset (int): Days from today of the page's date.
+            now (datetime): Current time.
+
+        Returns:
+            float: Priority, higher is scraped first.
+        """
+        stats = self.stats.get((cinema_id, day_offset))
+        if stats is None or stats.get("last_checked") is None:
+            # Never checked, so the page is due as soon as possible
+            return float("inf")
+
+        # Laplace smoothing so pages with few checks are neither certain to change nor certain not to
+        change_rate = (stats["changes"] + 1) / (stats["checks"] + 2)
+        near_weight = 1 / (1 + day_offset / self.near_days)
+        days_since_check = (now - stats["last_checked"]).total_seconds() / 86400
+        age_factor = min(max(days_since_check, 0.0), self.max_age_factor)
+        return change_rate * near_weight * age_factor
+
+    def plan(
+        self,
+        cinema_ids: set[str],
+        start_day: int,
+        end_day: int,
+        budget: int | None,
+    ) -> dict[str, list[datetime.date]]:
+        """
+        Select the pages to scrape this run.
+
+        Args:
+            cinema_ids (set[str]): Cinemas to scrape.
+            start_day (int): The starting day for scraping. Today is day 0.
+            end_day (int): The ending day for scraping.
+            budget (int | None): Maximum number of pages to scrape. Every page in the window is selected if None.
+
+        Returns:
+            dict[str, list[date]]: Dates to scrape for each cinema. Cinemas with nothing to scrape are left out.
+        """
+        today = datetime.date.today()
+        now = datetime.datetime.now()
+        pages = [
+            (cinema_id, day_offset)
+            for cinema_id in sorted(cinema_ids)
+            for day_offset in range(start_day, end_day)
+        ]
+        if budget is not None and budget < len(pages):
+            # sorted() is stable, so ties keep cinema and day order
+            pages = sorted(
+                pages,
+                key=lambda page: self.priority(page[0], page[1], now),
+                reverse=True,
+            )[: max(budget, 0)]
+            self.logger.info(
+                f"Scrape horizon: {len(pages)} pages selected within a budget of {budget}"
+            )
+
+        selected: dict[str, list[datetime.date]] = {}
+        for cinema_id, day_offset in sorted(pages):
+            selected.setdefault(cinema_id, []).append(
+                today + datetime.timedelta(days=day_offset)
+            )
+        return selected
+
+    @connect_to_database
+    def record(
+        self,
+        db,
+        cursor,
+        cinema_id: str,
+        page_changes: dict[datetime.date, bool | None],
+    ) -> None:
+        """
+        Record whether each scraped page of a cinema had changed since it was last processed.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            page_changes (dict[date, bool | None]): True for each date whose page had changed. None for pages without a previous fingerprint, which only update last_checked.
+        """
+        if page_changes:
+            today = datetime.date.today()
+            upsert_query = f"INSERT INTO {TABLE_NAME} (cinema_id, day_offset, checks, changes, last_checked) VALUES (%s, %s, %s, %s, NOW()) ON DUPLICATE KEY UPDATE checks = checks + VALUES(checks), changes = changes + VALUES(changes), last_checked = NOW();"
+            cursor.executemany(
+                upsert_query,
+                [
+                    (
+                        cinema_id,
+                        (show_date - today).days,
+                        int(changed is not None),
+                        int(bool(changed)),
+                    )
+                    for show_date, changed in page_changes.items()
+                ],
+            )
+            db.commit()
@@ -0,0 +1,52 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Session shared by every scraper in a run, with User-Agent and Referer passed per request.
+class PooledSession(requests.Session):
+    def __init__(self, pool_maxsize: int = 10, pool_connections: int = 32) -> None:
+        """
+        Initialize a PooledSession object.
+
+        Args:
+            pool_maxsize (int): Connections kept open per host, should be at least the number of requests in flight to a single host.
+            pool_connections (int): Number of hosts whose connection pools are kept.
+        """
+        super().__init__()
+        self.adapter: HTTPAdapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+        self.headers.update(
+            {
+                "Accept": "*/*",
+                "Accept-Language": "en-US,en;q=0.5",
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            }
+        )
+
+    def get_pool_stats(self) -> dict:
+        """
+        Return connection reuse statistics for the session's connection pools.
+
+        Returns:
+            dict: Requests sent, connections opened (one TCP, and for HTTPS one TLS, handshake each), and the share of requests that reused an open connection.
+        """
+        requests_sent, connections_opened = 0, 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "pool_hit_rate": (
+                (requests_sent - connections_opened) / requests_sent
+                if requests_sent
+                else None
+            ),
+        }
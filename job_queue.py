@@ -0,0 +1,316 @@
+import datetime
+import os
+import socket
+from logging import Logger
+from uuid import uuid4
+
+from db_utilities import connect_to_database
+
+
+TABLE_NAME = "scrape_jobs"
+RUNS_TABLE_NAME = "scrape_runs"
+
+
+# Queue of (cinema_id, date) work items of a scraper run, leased per cinema so runs can be resumed or shared.
+class ScrapeJobQueue:
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        logger: Logger,
+        cinema_ids: set[str],
+        start_day: int,
+        end_day: int,
+        plan: dict[str, list[datetime.date]] | None = None,
+        lease_timeout: datetime.timedelta = datetime.timedelta(minutes=15),
+        resume_window: datetime.timedelta = datetime.timedelta(hours=12),
+        retention: datetime.timedelta = datetime.timedelta(days=7),
+    ) -> None:
+        """
+        Initialize a ScrapeJobQueue object. Joins the latest interrupted run over the same date window if one was started within `resume_window`, otherwise creates a new run.
+
+        Args:
+            logger (Logger): Logger object.
+            cinema_ids (set[str]): Cinemas to scrape if a new run is created.
+            start_day (int): The starting day for scraping. Today is day 0.
+            end_day (int): The ending day for scraping.
+            plan (dict[str, list[date]], optional): Dates to scrape for each cinema if a new run is created, e.g. from HorizonPlanner. Every date in the window for every cinema if None.
+            lease_timeout (timedelta): How long a leased item is reserved before another run may take it over.
+            resume_window (timedelta): How old an interrupted run can be and still be resumed.
+            retention (timedelta): Items of runs older than this are deleted when a new run is created.
+        """
+        self.logger: Logger = logger
+        self.lease_timeout: datetime.timedelta = lease_timeout
+        self.worker_id: str = f"{socket.gethostname()}:{os.getpid()}"
+        today = datetime.date.today()
+        self.dates: list[datetime.date] = [
+            today + datetime.timedelta(days=i) for i in range(start_day, end_day)
+        ]
+        self.run_window: str = (
+            f"{self.dates[0]}/{self.dates[-1]}" if self.dates else f"{today}/{today}"
+        )
+
+        if plan is None:
+            plan = {cinema_id: self.dates for cinema_id in cinema_ids}
+        self.run_id, self.resumed = self.start_run(
+            plan=plan,
+            resume_minutes=int(resume_window.total_seconds() // 60),
+            retention_days=max(1, retention.days),
+        )
+        if self.resumed:
+            self.logger.info(f"Joining unfinished scraper run {self.run_id}")
+
+    @connect_to_database
+    def start_run(
+        self,
+        db,
+        cursor,
+        plan: dict[str, list[datetime.date]],
+        resume_minutes: int,
+        retention_days: int,
+    ) -> tuple[str, bool]:
+        """
+        Join the latest unfinished run over this date window, or create a new run from `plan` if there is none.
+        Workers started at the same time take a named lock first, so they all join the same run rather than each creating one.
+
+        Returns:
+            tuple[str, bool]: The run_id, and True if an existing run was joined.
+        """
+        lock_name = f"{TABLE_NAME}:{self.run_window}"
+        cursor.execute("SELECT GET_LOCK(%s, 30);", (lock_name,))
+        if cursor.fetchone()[0] != 1:
+            raise TimeoutError(f"Unable to acquire lock {lock_name}")
+        try:
+            run_id = self._find_resumable_run(cursor, resume_minutes)
+            if run_id is not None:
+                # Runs created before scrape_runs existed have no row to record their merge
+                cursor.execute(
+                    f"INSERT IGNORE INTO {RUNS_TABLE_NAME} (run_id, run_window) VALUES (%s, %s);",
+                    (run_id, self.run_window),
+                )
+                db.commit()
+                return run_id, True
+
+            run_id = uuid4().hex
+            self._create_run(db, cursor, run_id, plan, retention_days)
+            return run_id, False
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s);", (lock_name,))
+            cursor.fetchall()
+
+    def _find_resumable_run(self, cursor, resume_minutes: int) -> str | None:
+        """Return the run_id of the latest run over this date window that was interrupted before it finished, or None if there is none."""
+        # Items released by a finished run are left for a new run, planned from the current statistics
+        query = f"""
+            SELECT jobs.run_id FROM {TABLE_NAME} AS jobs
+            LEFT JOIN {RUNS_TABLE_NAME} AS runs ON runs.run_id = jobs.run_id
+            WHERE jobs.run_window = %s AND jobs.created_at >= NOW() - INTERVAL %s MINUTE
+            AND runs.finished_at IS NULL
+            GROUP BY jobs.run_id
+            HAVING SUM(jobs.status IN (%s, %s)) > 0
+            ORDER BY MAX(jobs.created_at) DESC
+            LIMIT 1;
+        """
+        cursor.execute(
+            query, (self.run_window, resume_minutes, self.PENDING, self.LEASED)
+        )
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    def _create_run(
+        self,
+        db,
+        cursor,
+        run_id: str,
+        plan: dict[str, list[datetime.date]],
+        retention_days: int,
+    ) -> int:
+        """Insert a pending item for every cinema and date of a new run, delete items of old runs, and return the number of items inserted."""
+        for table in (TABLE_NAME, RUNS_TABLE_NAME):
+            cursor.execute(
+                f"DELETE FROM {table} WHERE created_at < NOW() - INTERVAL %s DAY;",
+                (retention_days,),
+            )
+        cursor.execute(
+            f"INSERT INTO {RUNS_TABLE_NAME} (run_id, run_window) VALUES (%s, %s);",
+            (run_id, self.run_window),
+        )
+        items = [
+            {
+                "run_id": run_id,
+                "run_window": self.run_window,
+                "cinema_id": cinema_id,
+                "show_date": date,
+            }
+            for cinema_id in sorted(plan)
+            for date in plan[cinema_id]
+        ]
+        if items:
+            insert_query = f"INSERT INTO {TABLE_NAME} (run_id, run_window, cinema_id, show_date) VALUES (%(run_id)s, %(run_window)s, %(cinema_id)s, %(show_date)s);"
+            cursor.executemany(insert_query, items)
+        db.commit()
+        self.logger.info(
+            f"Created scraper run {run_id} with {len(items)} cinema/day items"
+        )
+        return len(items)
+
+    @connect_to_database
+    def pending_cinemas(self, db, cursor) -> list[str]:
+        """Return the cinemas of this run that still have unfinished items."""
+        query = f"""
+            SELECT DISTINCT cinema_id FROM {TABLE_NAME}
+            WHERE run_id = %s AND (status = %s OR (status = %s AND leased_at < NOW() - INTERVAL %s SECOND))
+            ORDER BY cinema_id;
+        """
+        cursor.execute(
+            query,
+            (
+                self.run_id,
+                self.PENDING,
+                self.LEASED,
+                int(self.lease_timeout.total_seconds()),
+            ),
+        )
+        return [result[0] for result in cursor.fetchall()]
+
+    @connect_to_database
+    def lease(self, db, cursor, cinema_id: str) -> list[datetime.date]:
+        """
+        Lease the unfinished items of a cinema. Items leased by another worker are only taken over once their lease has expired.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+
+        Returns:
+            list[date]: Dates leased to this worker, empty if there is nothing left to scrape for the cinema.
+        """
+        lease_query = f"""
+            UPDATE {TABLE_NAME}
+            SET status = %s, worker_id = %s, leased_at = NOW()
+            WHERE run_id = %s AND cinema_id = %s
+            AND (status = %s OR (status = %s AND leased_at < NOW() - INTERVAL %s SECOND));
+        """
+        cursor.execute(
+            lease_query,
+            (
+                self.LEASED,
+                self.worker_id,
+                self.run_id,
+                cinema_id,
+                self.PENDING,
+                self.LEASED,
+                int(self.lease_timeout.total_seconds()),
+            ),
+        )
+        db.commit()
+
+        select_query = f"SELECT show_date FROM {TABLE_NAME} WHERE run_id = %s AND cinema_id = %s AND status = %s AND worker_id = %s ORDER BY show_date;"
+        cursor.execute(
+            select_query, (self.run_id, cinema_id, self.LEASED, self.worker_id)
+        )
+        return [result[0] for result in cursor.fetchall()]
+
+    @connect_to_database
+    def renew(self, db, cursor, cinema_ids: list[str]) -> int:
+        """
+        Extend this worker's leases on cinemas still being scraped, so they do not expire and get taken over by another worker.
+
+        Args:
+            cinema_ids (list[str]): Cinemas this worker is scraping.
+
+        Returns:
+            int: Number of items whose lease was extended.
+        """
+        if not cinema_ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(cinema_ids))
+        renew_query = f"UPDATE {TABLE_NAME} SET leased_at = NOW() WHERE run_id = %s AND worker_id = %s AND status = %s AND cinema_id IN ({placeholders});"
+        cursor.execute(
+            renew_query, (self.run_id, self.worker_id, self.LEASED, *cinema_ids)
+        )
+        db.commit()
+        return cursor.rowcount
+
+    @connect_to_database
+    def complete(
+        self,
+        db,
+        cursor,
+        cinema_id: str,
+        done_dates: list[datetime.date],
+        failed_dates: list[datetime.date],
+    ) -> int:
+        """
+        Mark the leased items of a cinema as done or failed once its results have been committed. Leased items in neither list are released for a later run to retry.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            done_dates (list[date]): Dates scraped successfully.
+            failed_dates (list[date]): Dates that could not be scraped.
+
+        Returns:
+            int: Number of items marked done or failed.
+        """
+        update_query = f"UPDATE {TABLE_NAME} SET status = %s, leased_at = NULL WHERE run_id = %s AND cinema_id = %s AND show_date = %s AND worker_id = %s;"
+        values = [
+            (status, self.run_id, cinema_id, date, self.worker_id)
+            for status, dates in ((self.DONE, done_dates), (self.FAILED, failed_dates))
+            for date in dates
+        ]
+        completed = 0
+        if values:
+            cursor.executemany(update_query, values)
+            completed = cursor.rowcount
+
+        release_query = f"UPDATE {TABLE_NAME} SET status = %s, leased_at = NULL, worker_id = NULL WHERE run_id = %s AND cinema_id = %s AND status = %s AND worker_id = %s;"
+        cursor.execute(
+            release_query,
+            (self.PENDING, self.run_id, cinema_id, self.LEASED, self.worker_id),
+        )
+        db.commit()
+        return completed
+
+    @connect_to_database
+    def finish(self, db, cursor) -> None:
+        """Record that a worker scraped the run to the end, so later runs over the same dates create a new run rather than resuming it."""
+        finish_query = f"UPDATE {RUNS_TABLE_NAME} SET finished_at = NOW() WHERE run_id = %s AND finished_at IS NULL;"
+        cursor.execute(finish_query, (self.run_id,))
+        db.commit()
+
+    @connect_to_database
+    def claim_merge(self, db, cursor) -> bool:
+        """
+        Claim the merge step of the run, which runs once after every item is done or failed. Only one worker's claim can succeed.
+
+        Returns:
+            bool: True if this worker should run the merge step. False if items are still unfinished, or another worker has claimed it.
+        """
+        claim_query = f"""
+            UPDATE {RUNS_TABLE_NAME} SET merged_by = %s, merged_at = NOW()
+            WHERE run_id = %s AND merged_at IS NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM {TABLE_NAME} WHERE run_id = %s AND status IN (%s, %s)
+            );
+        """
+        cursor.execute(
+            claim_query,
+            (self.worker_id, self.run_id, self.run_id, self.PENDING, self.LEASED),
+        )
+        db.commit()
+        return cursor.rowcount == 1
+
+    @connect_to_database
+    def get_progress(self, db, cursor) -> dict[str, int]:
+        """Return the number of items of this run in each status."""
+        query = f"SELECT status, COUNT(*) FROM {TABLE_NAME} WHERE run_id = %s GROUP BY status;"
+        cursor.execute(query, (self.run_id,))
+        return {status: count for status, count in cursor.fetchall()}
+
+    def __str__(self) -> str:
+        """Return a string showing the status of this run's items."""
+        progress = self.get_progress()
+        summary = ", ".join(f"{count} {status}" for status, count in progress.items())
+        return f"Scraper run {self.run_id}: {summary or 'no items'}"
@@ -1,6 +1,6 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, HTTPException, Header, Response
+from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,11 +11,13 @@ from slowapi.errors import RateLimitExceeded
 from routers.cinema_router import router as cinema_router
 from routers.search_router import router as search_router
 from routers.db_router import router as db_router
+from routers.run_router import router as run_router
 from routers.limiter import limiter
 from search import Search
+from run_tracker import ScraperRunTracker
 from logging import getLogger
 from logs.setup_logger import setup_logging
-from creds import SCRAPER_CODE, ORIGINS
+from creds import ORIGINS
 
 
 def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -35,7 +37,9 @@ async def lifespan(app: FastAPI):
     setup_logging()
     app.state.logger = logger
     app.state.search = Search(logger) 
+    app.state.scraper_runs = ScraperRunTracker(logger)
     yield
+    app.state.scraper_runs.shutdown()
 
 
 # Initialize app and search
@@ -54,6 +58,7 @@ app.add_middleware(
 app.include_router(cinema_router)
 app.include_router(search_router)
 app.include_router(db_router)
+app.include_router(run_router)
 
 # Add custom exception handler
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -68,43 +73,3 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 @limiter.limit("2/second;20/minute")
 def ping(request: Request) -> str:
     return "V.O.Flix API is running."
-
-
-# Endpoint to activate scraper manually
-@app.get("/run", tags=["Initiate Scraper"])
-@limiter.limit("1/30seconds")
-def run_scraper(
-    request: Request,
-    start: int = 0,
-    end: int = 14,
-    auth: str | None = Header(None),
-):
-    """Endpoint that can be used to initialize the scraper"""
-    import time
-
-    from scraper import ScraperManager
-
-    logger = request.app.state.logger
-
-    if not auth or auth.strip() != SCRAPER_CODE:
-        logger.error(
-            f"Unauthorized access attempt: Initialize scraper days {start} - {end}"
-        )
-        raise HTTPException(
-            status_code=401,
-            detail="Unauthorized access",
-        )
-
-    t0 = time.perf_counter()
-
-    try:
-        ScraperManager(
-            start_day=start,
-            end_day=end,
-            logger=logger,
-        )
-        logger.info(f"Time taken: {time.perf_counter() - t0:.2f}s")
-        return f"Scraper ran successfully, days {start} - {end}"
-    except Exception as e:
-        logger.error(e)
-        raise HTTPException(status_code=500, detail={"message": "Server Error"})
@@ -0,0 +1,35 @@
+import argparse
+import time
+from logging import getLogger
+
+from enrichment import drain_enrichment_queue
+from logs.setup_logger import setup_logging
+
+
+# Run this file to enrich movies the scraper could not, can also be done with CRON jobs for automation
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Maximum number of movies to attempt (default=all due movies)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    try:
+        t0 = time.perf_counter()
+
+        logger = getLogger(__name__)
+        setup_logging()
+
+        args = parse_arguments()
+        results = drain_enrichment_queue(logger, args.limit)
+        logger.info(
+            f"Ran enrichment. Time taken: {time.perf_counter() - t0:.2f}s, "
+            f"{results['enriched']} movies enriched, {results['failed']} failed"
+        )
+    except Exception as e:
+        logger.exception(e)
@@ -4,6 +4,7 @@ import datetime
 from logging import getLogger
 
 from scraper import ScraperManager
+from scheduler import ScrapeScheduler
 from logs.setup_logger import setup_logging
 
 
@@ -19,6 +20,41 @@ def parse_arguments():
         action="store_true",
         help="Save raw json data (default=False)",
     )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        help="Process raw data archives in raw_data/ matching this glob pattern instead of scraping, e.g. 'raw_data_2026-09-*'",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of cinemas scraped in parallel (default=4)",
+    )
+    parser.add_argument(
+        "--scrapingant_budget",
+        type=int,
+        default=None,
+        help="Maximum ScrapingAnt credits to spend (default=unlimited)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=None,
+        help="Maximum cinema/day pages to scrape, prioritised by how often they change (default=all)",
+    )
+    parser.add_argument(
+        "--metrics_file",
+        type=str,
+        default=None,
+        help="Write scraper metrics in Prometheus text format to this file, e.g. for a node_exporter textfile collector",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Share the run with other scraper workers, e.g. on other hosts. Cinemas are claimed through leases in the database, and ratings are updated once by the last worker to finish (default=False)",
+    )
     return parser.parse_args()
 
 
@@ -48,7 +84,13 @@ if __name__ == "__main__":
             start_day=start,
             end_day=end,
             save_raw_json_data=save_raw_json_data,
+            local_data_filename=args.replay,
             logger=logger,
+            scheduler=ScrapeScheduler(max_concurrent_cinemas=args.concurrency),
+            scrapingant_credit_budget=args.scrapingant_budget,
+            request_budget=args.budget,
+            shared_run=args.worker,
+            metrics_path=args.metrics_file,
         )
         logger.info(
             f"Ran scraper. Time taken: {time.perf_counter() - t0:.2f}s, dates: {start_date_str} - {end_date_str}"
@@ -0,0 +1,307 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable
+
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = "scraper"
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus style: a count per upper bound, plus the sum and count of all observations. Not thread safe on its own."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets: tuple[float, ...] = buckets
+        # One count per bucket, plus one for observations above the largest bucket
+        self.counts: list[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        """Return (le, count of observations <= le) for each bucket, ending with +Inf."""
+        total = 0
+        counts = []
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            counts.append(("+Inf" if bound == float("inf") else f"{bound:g}", total))
+        return counts
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate the q quantile by interpolating within its bucket, as Prometheus' histogram_quantile does."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count if count else bound
+            seen += count
+            lower = bound
+        return self.buckets[-1]
+
+
+# Request and showing telemetry of a scraper run, shared by every Scraper and exported for Prometheus.
+class ScrapeMetrics:
+    DIRECT = "direct"
+    SCRAPINGANT = "scrapingant"
+
+    def __init__(self) -> None:
+        """Initialize a ScrapeMetrics object."""
+        self.started_at: float = time.time()
+        self.finished_at: float | None = None
+        self.latency: dict[str, Histogram] = {}
+        self.requests: dict[tuple[str, str], int] = {}
+        self.bytes_downloaded: dict[str, int] = {}
+        self.retries: dict[str, int] = {}
+        self.wait_seconds: dict[str, float] = {}
+        self.work_seconds: dict[str, float] = {}
+        self.pages: dict[str, int] = {}
+        self.english_showings: dict[str, int] = {}
+        # Set by the ScraperManager to a callable returning the statistics of each pipeline stage
+        self.stage_stats: Callable[[], dict[str, dict]] | None = None
+        # Set by the ScraperManager to TMDBCache.get_stats
+        self.tmdb_cache_stats: Callable[[], dict] | None = None
+        self._lock: Lock = Lock()
+
+    def record_request(
+        self,
+        path: str,
+        status_code: int | None,
+        latency: float,
+        wait: float,
+        size: int = 0,
+    ) -> None:
+        """
+        Record one request.
+
+        Args:
+            path (str): Request path, DIRECT or SCRAPINGANT.
+            status_code (int | None): Response status code, None if the request raised (e.g. timeout).
+            latency (float): Seconds from sending the request to receiving the response.
+            wait (float): Seconds spent waiting for the scheduler to permit the request.
+            size (int): Bytes in the response body.
+        """
+        status = str(status_code) if status_code is not None else "error"
+        with self._lock:
+            self.latency.setdefault(path, Histogram()).observe(latency)
+            self.requests[(path, status)] = self.requests.get((path, status), 0) + 1
+            self.bytes_downloaded[path] = self.bytes_downloaded.get(path, 0) + size
+            self.wait_seconds[path] = self.wait_seconds.get(path, 0.0) + wait
+            self.work_seconds[path] = self.work_seconds.get(path, 0.0) + latency
+
+    def record_retry(self, path: str) -> None:
+        """Record a request for a URL that had already been requested, e.g. a ScrapingAnt request after a failed direct request."""
+        with self._lock:
+            self.retries[path] = self.retries.get(path, 0) + 1
+
+    def record_page(self, cinema_id: str, english_showings: int) -> None:
+        """Record a scraped page and the number of English showings it listed."""
+        with self._lock:
+            self.pages[cinema_id] = self.pages.get(cinema_id, 0) + 1
+            self.english_showings[cinema_id] = (
+                self.english_showings.get(cinema_id, 0) + english_showings
+            )
+
+    def finish(self) -> None:
+        """Mark the end of the run."""
+        self.finished_at = time.time()
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_prometheus(self) -> str:
+        """
+        Return the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Metrics text, e.g. for a node_exporter textfile collector or a /metrics endpoint.
+        """
+        p = METRIC_PREFIX
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[str]):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            lines.extend(samples)
+
+        with self._lock:
+            samples = []
+            for path, histogram in sorted(self.latency.items()):
+                for le, count in histogram.cumulative_counts():
+                    samples.append(
+                        f'{p}_request_duration_seconds_bucket{{path="{path}",le="{le}"}} {count}'
+                    )
+                samples.append(
+                    f'{p}_request_duration_seconds_sum{{path="{path}"}} {histogram.sum:.6f}'
+                )
+                samples.append(
+                    f'{p}_request_duration_seconds_count{{path="{path}"}} {histogram.count}'
+                )
+            metric(
+                "request_duration_seconds",
+                "histogram",
+                "Request latency by request path.",
+                samples,
+            )
+            metric(
+                "requests_total",
+                "counter",
+                "Requests by request path and status code.",
+                [
+                    f'{p}_requests_total{{path="{path}",status="{status}"}} {count}'
+                    for (path, status), count in sorted(self.requests.items())
+                ],
+            )
+            for name, kind, help_text, values in (
+                (
+                    "response_bytes_total",
+                    "counter",
+                    "Bytes downloaded by request path.",
+                    self.bytes_downloaded,
+                ),
+                (
+                    "retries_total",
+                    "counter",
+                    "Requests for URLs that had already been requested, by request path.",
+                    self.retries,
+                ),
+                (
+                    "wait_seconds_total",
+                    "counter",
+                    "Seconds spent waiting for the scheduler before requests, by request path.",
+                    self.wait_seconds,
+                ),
+                (
+                    "work_seconds_total",
+                    "counter",
+                    "Seconds spent on requests, by request path.",
+                    self.work_seconds,
+                ),
+            ):
+                metric(
+                    name,
+                    kind,
+                    help_text,
+                    [
+                        f'{p}_{name}{{path="{path}"}} {value:g}'
+                        for path, value in sorted(values.items())
+                    ],
+                )
+            for name, help_text, values in (
+                ("pages_total", "Pages scraped by cinema.", self.pages),
+                (
+                    "english_showings_total",
+                    "English showings yielded by cinema.",
+                    self.english_showings,
+                ),
+            ):
+                metric(
+                    name,
+                    "counter",
+                    help_text,
+                    [
+                        f'{p}_{name}{{cinema_id="{cinema_id}"}} {value}'
+                        for cinema_id, value in sorted(values.items())
+                    ],
+                )
+            stages = self.stage_stats() if self.stage_stats is not None else {}
+            for name, kind, help_text, key in (
+                (
+                    "stage_queue_depth",
+                    "gauge",
+                    "Items waiting for each pipeline stage.",
+                    "queue_depth",
+                ),
+                (
+                    "stage_items_total",
+                    "counter",
+                    "Items handled by each pipeline stage.",
+                    "processed",
+                ),
+                (
+                    "stage_throughput",
+                    "gauge",
+                    "Items handled per second by each pipeline stage.",
+                    "throughput",
+                ),
+                (
+                    "stage_blocked_seconds_total",
+                    "counter",
+                    "Seconds the previous stage spent blocked on each stage's full queue.",
+                    "blocked_seconds",
+                ),
+            ):
+                metric(
+                    name,
+                    kind,
+                    help_text,
+                    [
+                        f'{p}_{name}{{stage="{stage}"}} {stats[key]:g}'
+                        for stage, stats in stages.items()
+                        if key in stats
+                    ],
+                )
+            if self.tmdb_cache_stats is not None:
+                cache_stats = self.tmdb_cache_stats()
+                metric(
+                    "tmdb_cache_lookups_total",
+                    "counter",
+                    "TMDB lookups served from the cache (hit) and from TMDB (miss).",
+                    [
+                        f'{p}_tmdb_cache_lookups_total{{result="hit"}} {cache_stats["hits"]}',
+                        f'{p}_tmdb_cache_lookups_total{{result="miss"}} {cache_stats["misses"]}',
+                    ],
+                )
+            metric(
+                "run_duration_seconds",
+                "gauge",
+                "Seconds since the run started, or the length of the run once finished.",
+                [f"{p}_run_duration_seconds {self.duration:.3f}"],
+            )
+        return "\n".join(lines) + "\n"
+
+    def to_report(self) -> dict:
+        """
+        Return a summary of the run as a flat dict, e.g. to be logged as a structured run report.
+
+        Returns:
+            dict: Totals and latency quantiles per request path, and showings per cinema.
+        """
+        with self._lock:
+            report = {
+                "duration_s": round(self.duration, 3),
+                "pages": sum(self.pages.values()),
+                "english_showings": sum(self.english_showings.values()),
+                "english_showings_by_cinema": dict(sorted(self.english_showings.items())),
+            }
+            if self.stage_stats is not None:
+                report["stages"] = self.stage_stats()
+            if self.tmdb_cache_stats is not None:
+                cache_stats = self.tmdb_cache_stats()
+                report["tmdb_cache_hits"] = cache_stats["hits"]
+                report["tmdb_cache_misses"] = cache_stats["misses"]
+                report["tmdb_cache_hit_ratio"] = cache_stats["hit_ratio"]
+            for path, histogram in sorted(self.latency.items()):
+                p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+                report[f"{path}_requests"] = histogram.count
+                report[f"{path}_latency_p50_s"] = round(p50, 3)
+                report[f"{path}_latency_p95_s"] = round(p95, 3)
+                report[f"{path}_bytes"] = self.bytes_downloaded.get(path, 0)
+                report[f"{path}_retries"] = self.retries.get(path, 0)
+                report[f"{path}_wait_s"] = round(self.wait_seconds.get(path, 0.0), 3)
+                report[f"{path}_work_s"] = round(self.work_seconds.get(path, 0.0), 3)
+                report[f"{path}_errors"] = sum(
+                    count
+                    for (request_path, status), count in self.requests.items()
+                    if request_path == path and status != "200"
+                )
+        return report
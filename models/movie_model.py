@@ -2,7 +2,6 @@ from base64 import b64decode
 from typing import List
 from pydantic import BaseModel, field_validator, Field
 from datetime import datetime
-from logging import Logger
 
 
 class Base64FormatError(ValueError):
@@ -41,11 +40,10 @@ class RatingError(ValueError):
         super().__init__(message)
 
 
-# arbitrary_types_allowed=True is to allow the Logger type object through, which Pydantic doesn't know how to fully validate
-class MovieModel(BaseModel, arbitrary_types_allowed=True):
+# The validators' Logger is passed in the validation context rather than as a field
+class MovieModel(BaseModel):
     """Model to ensure the movie data is in the correct format before inserting into the database"""
 
-    logger: Logger
     movie_id: str = Field(..., min_length=12, max_length=191)
     original_title: str = Field(..., min_length=2, max_length=191)
     french_title: str = Field(..., min_length=2, max_length=191)
@@ -86,7 +84,7 @@ class MovieModel(BaseModel, arbitrary_types_allowed=True):
 
             return ",".join(input_list)
         except Exception as e:
-            logger = values.data.get("logger")
+            logger = (values.context or {}).get("logger")
             if logger:
                 logger.warning(
                     f"Movie.{values.field_name} csv list validation failed. {e}"
@@ -94,10 +92,9 @@ class MovieModel(BaseModel, arbitrary_types_allowed=True):
             return None
 
 
-class AdditionalDataMovieModel(BaseModel, arbitrary_types_allowed=True):
+class AdditionalDataMovieModel(BaseModel):
     """Model to ensure the additional movie data from TMDB is in the correct format before inserting into the database"""
 
-    logger: Logger
     original_title: str = Field(..., min_length=2, max_length=191)
     origin_country: str | None = Field(None, max_length=191)
     rating: float | None = None
@@ -108,6 +105,33 @@ class AdditionalDataMovieModel(BaseModel, arbitrary_types_allowed=True):
     poster_lo_res: str | None = Field(None, max_length=255)
     poster_hi_res: str | None = Field(None, max_length=255)
     tmdb_id: int | None = None
+    cast: str | None = None
+    directors: str | None = None
+    french_release_date: datetime | None = None
+
+    @field_validator("cast", "directors", mode="before")
+    def validate_names(cls, input_list, values):
+        try:
+            if not input_list:
+                return None
+            # Names are in billing order, so trailing names are dropped until the csv fits VARCHAR(191)
+            names = []
+            for name in input_list:
+                if not isinstance(name, str):
+                    raise ListStringError(
+                        value=input_list,
+                        message=f"All items must be strings: input contains {type(name)}",
+                    )
+                if len(",".join(names + [name])) > 191:
+                    break
+                names.append(name)
+            return ",".join(names) or None
+
+        except Exception as e:
+            logger = (values.context or {}).get("logger")
+            if logger:
+                logger.warning(f"Movie.{values.field_name} validation failed. {e}")
+            return None
 
     @field_validator("runtime", mode="before")
     def validate_smallint_un(cls, input, values):
@@ -127,7 +151,7 @@ class AdditionalDataMovieModel(BaseModel, arbitrary_types_allowed=True):
             return input
 
         except Exception as e:
-            logger = values.data.get("logger")
+            logger = (values.context or {}).get("logger")
             if logger:
                 logger.warning(e)
             return None
@@ -150,7 +174,7 @@ class AdditionalDataMovieModel(BaseModel, arbitrary_types_allowed=True):
             return input
 
         except Exception as e:
-            logger = values.data.get("logger")
+            logger = (values.context or {}).get("logger")
             if logger:
                 logger.warning(e)
             return None
@@ -174,7 +198,7 @@ class AdditionalDataMovieModel(BaseModel, arbitrary_types_allowed=True):
             return input
 
         except Exception as e:
-            logger = values.data.get("logger")
+            logger = (values.context or {}).get("logger")
             if logger:
                 logger.warning(e)
             return None
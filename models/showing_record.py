@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+
+
+# Showing times are listed in these buckets for original language (English) screenings
+ORIGINAL_SHOWTIME_KEYS = ("original", "original_st", "original_st_sme")
+
+
+@dataclass(slots=True, frozen=True)
+class ShowingRecord:
+    """Compact record of a scraped movie and its English showings at one cinema on one day. Built when a page is scraped, and holds only the fields used to create movies and showings, so the rest of the upstream JSON can be discarded straight away."""
+
+    movie_id: str
+    original_title: str
+    french_title: str
+    genres: tuple[str, ...]
+    languages: tuple[str, ...]
+    cast: tuple[str, ...]
+    production_year: int | None
+    start_times: tuple[str, ...]
+
+    @classmethod
+    def from_raw(cls, showing: dict) -> "ShowingRecord":
+        """
+        Create a ShowingRecord from a showing in the scraped JSON.
+
+        Args:
+            showing (dict): A movie & showings item from the upstream response.
+
+        Raises:
+            KeyError: If the movie ID or titles are missing.
+
+        Returns:
+            ShowingRecord: The compact record.
+        """
+        movie = showing["movie"]
+        showtimes = showing.get("showtimes") or {}
+        return cls(
+            movie_id=movie["id"],
+            original_title=movie["originalTitle"],
+            french_title=movie["title"],
+            genres=tuple(genre["tag"] for genre in movie.get("genres") or []),
+            languages=tuple(movie.get("languages") or []),
+            cast=cls.get_cast((movie.get("cast") or {}).get("edges") or []),
+            production_year=(movie.get("data") or {}).get("productionYear"),
+            start_times=tuple(
+                item["startsAt"]
+                for key in ORIGINAL_SHOWTIME_KEYS
+                for item in showtimes.get(key) or []
+            ),
+        )
+
+    @staticmethod
+    def get_cast(cast_json: list[dict]) -> tuple[str, ...]:
+        """Extract cast names from the cast edges in the scraped JSON"""
+        cast = []
+        for cast_raw in cast_json:
+            try:
+                # Below is to deal with some cast members having only first or last name
+                cast_member = cast_raw["node"]["actor"]
+                first_name = cast_member["firstName"] or ""
+                last_name = cast_member["lastName"] or ""
+                cast.append(" ".join([first_name, last_name]).strip())
+            except:
+                continue
+        return tuple(cast)
@@ -1,15 +1,17 @@
 # from os import getenv
 from datetime import datetime
-from requests import Session
 from pydantic import ValidationError
 from logging import Logger
 
 # from dotenv import load_dotenv
 
 from models.movie_model import MovieModel, AdditionalDataMovieModel
+from models.showing_record import ShowingRecord
+from tmdb import TMDBEnricher, RELEASE_COUNTRY
+from tmdb_cache import TMDBCache
+from tmdb_index import TMDBIdIndex
 from db_utilities import connect_to_database
 from data.country_info import country_codes
-from creds import TMDB_API_TOKEN
 
 
 # # Check of environment variables are loaded, and if not load them from .env
@@ -38,10 +40,33 @@ class Movie:
         release_date (datetime, optional): The release date of the movie.
 
     Methods:
-        get_additional_details(): Retrieve additional details for the movie from an external API.
+        add_additional_details(): Retrieve, validate and set additional details for the movie from TMDB.
+        get_additional_details(): Retrieve additional details for the movie from TMDB.
         movie_name(): Return the original title of the movie.
     """
 
+    # enrichment_status values. New movies are written pending, and the enrichment queue retrieves their TMDB details
+    PENDING = "pending"
+    ENRICHED = "enriched"
+    FAILED = "failed"
+
+    # The info below is not available from the initial source, so it is aquired from TBDM by add_additional_details. Dict below holds the attribute name for the Movie object, and the path of keys to it in the json from the API.
+    ADDITIONAL_REQUIRED_DETAILS = {
+        "original_title": ("original_title",),
+        "origin_country": ("origin_country",),
+        "rating": ("vote_average",),
+        "runtime": ("runtime",),
+        "tagline": ("tagline",),
+        "synopsis": ("overview",),
+        "imdb_url": ("external_ids", "imdb_id"),
+        "poster_slug": ("poster_path",),
+        "cast": ("credits", "cast"),
+        "directors": ("credits", "crew"),
+        "french_release_date": ("release_dates", "results"),
+    }
+    # TMDB release types counted as a French release, theatrical then limited theatrical
+    FRENCH_RELEASE_TYPES = (3, 2)
+
     def __init__(
         self,
         logger: Logger,
@@ -65,7 +90,9 @@ class Movie:
         }
         try:
             # Validate the input data using MovieModel
-            movie_model = MovieModel(**data, logger=logger)
+            movie_model = MovieModel.model_validate(
+                data, context={"logger": logger}
+            )
 
         except ValidationError as e:
             self.logger.error(f"Validation error: {e}")
@@ -86,30 +113,41 @@ class Movie:
         if isinstance(self.genres, str):
             self.genres = self.genres.replace("_", " ")
 
-        # The info below is not available from the initial source, so it is aquired from TBDM on instantiation. Dict below holds the attribute name for the Movie object, and the key value that stores the information in the json from the API.
-        additional_required_details = {
-            "original_title": ("original_title"),
-            "origin_country": ("origin_country"),
-            "rating": ("vote_average"),
-            "runtime": ("runtime"),
-            "tagline": ("tagline"),
-            "synopsis": ("overview"),
-            "imdb_url": ("imdb_id"),
-            "poster_slug": ("poster_path"),
-        }
+        # Filled in from TMDB by add_additional_details
+        self.origin_country = None
+        self.rating = None
+        self.tagline = None
+        self.synopsis = None
+        self.imdb_url = None
+        self.poster_hi_res = None
+        self.poster_lo_res = None
+        self.tmdb_id = None
+        self.runtime = None
+        self.directors = None
+        self.french_release_date = None
+        self.enrichment_status = self.PENDING
+
+    def add_additional_details(self, enricher: TMDBEnricher) -> None:
+        """Retrieve additional details for the movie from TMDB, validate them, and set them on the movie.
+
+        Args:
+            enricher (TMDBEnricher): Client the details are retrieved with.
 
+        Raises:
+            ValidationError: If the details are missing or invalid.
+        """
         try:
-            extra_movie_data = self.get_additional_details(additional_required_details)
+            extra_movie_data = self.get_additional_details(enricher)
 
-            additional_details_movie_model = AdditionalDataMovieModel(
-                **extra_movie_data, logger=logger
+            additional_details_movie_model = AdditionalDataMovieModel.model_validate(
+                extra_movie_data, context={"logger": self.logger}
             )
 
         except ValidationError as e:
             self.logger.error(f"Validation error: {e}")
             raise e
         except Exception as e:
-            self.logger.error(f"Unable to create Movie instance: {e}")
+            self.logger.error(f"Unable to add additional details to Movie: {e}")
             raise e
 
         # Origin countries are given as a csv of ISO 3166-1 alpha-2 codes. This will convert that into a csv of full country names
@@ -131,10 +169,19 @@ class Movie:
         self.poster_lo_res = additional_details_movie_model.poster_lo_res
         self.tmdb_id = additional_details_movie_model.tmdb_id
         self.runtime = additional_details_movie_model.runtime
-
-    def get_additional_details(self, additional_required_details):
+        self.directors = additional_details_movie_model.directors
+        self.french_release_date = additional_details_movie_model.french_release_date
+        # Cast scraped from the cinema listing is kept, TMDB's is only used when it is missing
+        if not self.cast:
+            self.cast = additional_details_movie_model.cast
+        self.enrichment_status = self.ENRICHED
+
+    def get_additional_details(self, enricher: TMDBEnricher) -> dict:
         """Retrieve additional details for the movie from an TMDB API.
 
+        Args:
+            enricher (TMDBEnricher): Client the details are retrieved with.
+
         Returns:
             dict: A dictionary containing additional details for the movie:
                 - original_title (str): Original title from TMDB, sometimes not translated in original source.
@@ -146,6 +193,9 @@ class Movie:
                 - imdb_url (str): The IMDB URL of the movie.
                 - poster_hi_res (str): The URL to the high-resolution poster image of the movie.
                 - poster_lo_res (str): The URL to the low-resolution poster image of the movie.
+                - cast (list[str]): The top billed cast of the movie.
+                - directors (list[str]): The directors of the movie.
+                - french_release_date (datetime): The first theatrical release date of the movie in France.
 
         Raises:
             Exception: If additional movie details are not found.
@@ -154,67 +204,87 @@ class Movie:
         # Create empty dict to hold additional details
         extra_movie_data = {}
 
-        s = Session()
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {TMDB_API_TOKEN}",
-        }
+        production_year = (
+            self.release_date.year if isinstance(self.release_date, datetime) else None
+        )
+        # production year can lag behind listed year, so look for the production year then the two following years
+        years = (
+            list(range(production_year, production_year + 3))
+            if production_year is not None
+            else [None]
+        )
 
         try:
-            id_url = f"https://api.themoviedb.org/3/search/movie"
-
-            if isinstance(self.release_date, datetime):
-                # production year can lag behind listed year, so search the production year then the two following years
-                for year in range(self.release_date.year, self.release_date.year + 3):
-                    queryparams = {
-                        "query": self.original_title,
-                        "primary_release_year": year,
-                    }
+            # Movies resolved before, or listed under another title, need no search
+            tmdb_id = enricher.lookup_tmdb_id(
+                self.movie_id, [self.original_title, self.french_title], years
+            )
+            if tmdb_id is not None:
+                extra_movie_data["tmdb_id"] = tmdb_id
 
+            if "tmdb_id" not in extra_movie_data.keys() and production_year is not None:
+                for year in years:
                     # TMDB ID must be identified first, then other details can be retrieved
-                    response = s.get(id_url, params=queryparams, headers=headers)
-                    response.raise_for_status()
-                    results = response.json().get("results")
-                    if results:
-                        extra_movie_data["tmdb_id"] = results[0]["id"]
+                    tmdb_id = enricher.search_tmdb_id(self.original_title, year)
+                    if tmdb_id is not None:
+                        extra_movie_data["tmdb_id"] = tmdb_id
                         break
 
             # If no results found using title and year, try again without the year.
             if "tmdb_id" not in extra_movie_data.keys():
-                queryparams = {
-                    "query": self.original_title,
-                }
-
-                response = s.get(id_url, params=queryparams, headers=headers)
-                response.raise_for_status()
-                results = response.json().get("results")
-                if results:
-                    extra_movie_data["tmdb_id"] = results[0]["id"]
+                tmdb_id = enricher.search_tmdb_id(self.original_title)
+                if tmdb_id is not None:
+                    extra_movie_data["tmdb_id"] = tmdb_id
                 else:
                     raise Exception("Movie not found")
 
-            details_url = (
-                f"https://api.themoviedb.org/3/movie/{extra_movie_data['tmdb_id']}"
-            )
-
             # TMDB ID must be identified first, then other details can be retrieved
-            response = s.get(details_url, headers=headers)
-            response.raise_for_status()
-
-            response_data = response.json()
-
-            for detail, key in additional_required_details.items():
-                info = response_data.get(key)
-                if isinstance(info, list):
+            response_data = enricher.get_movie_details(extra_movie_data["tmdb_id"])
+            if response_data is None:
+                raise Exception("Movie details not found")
+
+            for detail, path in self.ADDITIONAL_REQUIRED_DETAILS.items():
+                info = response_data
+                for key in path:
+                    info = info.get(key) if isinstance(info, dict) else None
+                if isinstance(info, list) and all(isinstance(i, str) for i in info):
                     extra_movie_data[detail] = ",".join(info)
                 else:
                     extra_movie_data[detail] = info
 
+            # Credits and release dates are lists of objects, reduced to the values stored
+            extra_movie_data["cast"] = [
+                member["name"]
+                for member in extra_movie_data.get("cast") or []
+                if member.get("name")
+            ]
+            extra_movie_data["directors"] = [
+                member["name"]
+                for member in extra_movie_data.get("directors") or []
+                if member.get("job") == "Director" and member.get("name")
+            ]
+            extra_movie_data["french_release_date"] = self.get_french_release_date(
+                extra_movie_data.get("french_release_date") or []
+            )
+            # Details requested before external_ids was appended still hold imdb_id
+            if extra_movie_data.get("imdb_url") is None:
+                extra_movie_data["imdb_url"] = response_data.get("imdb_id")
+
             # Overwrite production year data with release data from TMDB
             self.release_date = datetime.strptime(
                 response_data.get("release_date"), "%Y-%m-%d"
             )
 
+            enricher.record_tmdb_id(
+                extra_movie_data["tmdb_id"],
+                self.movie_id,
+                [
+                    (self.original_title, production_year),
+                    (self.french_title, production_year),
+                    (extra_movie_data["original_title"], self.release_date.year),
+                ],
+            )
+
             poster_slug = extra_movie_data.get("poster_slug")
 
             extra_movie_data["poster_hi_res"] = (
@@ -235,10 +305,24 @@ class Movie:
             self.logger.warning(
                 f"{self.original_title}: additional movie details not found: {e}"
             )
-        finally:
-            s.close()
         return extra_movie_data
 
+    @classmethod
+    def get_french_release_date(cls, release_dates: list[dict]) -> datetime | None:
+        """Return the earliest French theatrical release date from TMDB release_dates results, falling back to a limited release, None if the movie has no French release."""
+        for release_type in cls.FRENCH_RELEASE_TYPES:
+            dates = [
+                release["release_date"]
+                for country in release_dates
+                if country.get("iso_3166_1") == RELEASE_COUNTRY
+                for release in country.get("release_dates", [])
+                if release.get("type") == release_type and release.get("release_date")
+            ]
+            if dates:
+                # Dates are ISO 8601 timestamps, e.g. 2024-10-02T00:00:00.000Z
+                return datetime.strptime(min(dates)[:10], "%Y-%m-%d")
+        return None
+
     @staticmethod
     def get_columns() -> tuple[str]:
         """Returns a tuple of the database column names to be written to"""
@@ -259,6 +343,9 @@ class Movie:
             "poster_hi_res",
             "poster_lo_res",
             "tmdb_id",
+            "directors",
+            "french_release_date",
+            "enrichment_status",
         )
 
     def database_format(self):
@@ -283,7 +370,12 @@ class MovieManager:
         """Initialize a MovieManager object."""
         self.logger = logger
         self.current_movie_ids = set(self.retrieve_movies())
+        self.tmdb_cache = TMDBCache(logger)
+        self.tmdb_index = TMDBIdIndex(logger)
+        self.enricher = TMDBEnricher(logger, self.tmdb_cache, self.tmdb_index)
         self.new_movies = []
+        # Number of new_movies already written, so results can be committed incrementally during a run
+        self.saved_movie_count = 0
 
     @connect_to_database
     def retrieve_movies(self, db, cursor) -> list[tuple[str]]:
@@ -312,33 +404,27 @@ class MovieManager:
         self.new_movies.append(new_movie)
         self.current_movie_ids.add(new_movie.movie_id)
 
-    def process_movie(self, item: dict) -> None:
-        """Process a movie item from scraped JSON data."""
-        movie_id = item["movie"]["id"]
-        if not self.movie_already_in_database(movie_id):
+    def process_movie(self, record: ShowingRecord) -> None:
+        """Process a movie from a scraped showing record."""
+        if not self.movie_already_in_database(record.movie_id):
             try:
-                new_movie = self.create_movie(item)
+                new_movie = self.create_movie(record)
                 if new_movie is not None:
                     self.add_new_movie(new_movie)
             except Exception as e:
                 self.logger.error(f"Unable to create Movie: {e}")
 
-    def create_movie(self, item: dict) -> Movie:
+    def create_movie(self, record: ShowingRecord) -> Movie:
         try:
-            """Create a Movie object from raw JSON data."""
+            """Create a Movie object from a scraped showing record."""
             movie_details = {
-                "movie_id": item["movie"]["id"],
-                "original_title": item["movie"]["originalTitle"].strip(),
-                "french_title": item["movie"]["title"].strip(),
-                "genres": [
-                    genre["tag"].replace("_", " ").title()
-                    for genre in item["movie"]["genres"]
-                ],
-                "languages": [
-                    language.title() for language in item["movie"]["languages"]
-                ],
-                "cast": self.get_cast(item["movie"]["cast"]["edges"]),
-                "release_date": self.get_release_date(item),
+                "movie_id": record.movie_id,
+                "original_title": record.original_title.strip(),
+                "french_title": record.french_title.strip(),
+                "genres": [genre.replace("_", " ").title() for genre in record.genres],
+                "languages": [language.title() for language in record.languages],
+                "cast": list(record.cast),
+                "release_date": self.get_release_date(record),
             }
             new_movie = Movie(**movie_details, logger=self.logger)
 
@@ -349,27 +435,9 @@ class MovieManager:
             return None
 
     @staticmethod
-    def get_cast(cast_json):
-        """Method to extract cast names from scraped json"""
-        cast = []
-        for cast_raw in cast_json:
-            try:
-                # Below is to deal with some cast members having only first or last name
-                cast_member = cast_raw["node"]["actor"]
-                first_name = cast_member["firstName"] or ""
-                last_name = cast_member["lastName"] or ""
-                name = " ".join([first_name, last_name]).strip()
-
-                cast.append(name)
-
-            except:
-                continue
-        return cast
-
-    @staticmethod
-    def get_release_date(item):
+    def get_release_date(record: ShowingRecord):
         try:
-            date_str = str(item["movie"]["data"]["productionYear"]) + ("-01-01")
+            date_str = str(record.production_year) + ("-01-01")
             release_date = datetime.strptime(date_str, "%Y-%m-%d")
         except:
             release_date = None
@@ -377,15 +445,17 @@ class MovieManager:
 
     @connect_to_database
     def add_new_movies_to_database(self, db=None, cursor=None) -> None:
-        """Add new movies to the database."""
-        if self.new_movies:
-            movie_values_list = [movie.database_format() for movie in self.new_movies]
+        """Add new movies not yet written to the database."""
+        unsaved_movies = self.new_movies[self.saved_movie_count :]
+        if unsaved_movies:
+            movie_values_list = [movie.database_format() for movie in unsaved_movies]
 
             columns = Movie.get_columns()
             placeholders = ", ".join(f"%({key})s" for key in columns)
             insert_query = f"INSERT IGNORE INTO {TABLE_NAME} ({', '.join(columns)}) VALUES ({placeholders});"
             cursor.executemany(insert_query, movie_values_list)
             db.commit()
+            self.saved_movie_count += len(unsaved_movies)
 
             # Check for warnings during INSERT IGNORE
             cursor.execute("SHOW WARNINGS;")
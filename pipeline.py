@@ -0,0 +1,103 @@
+import time
+from logging import Logger
+from queue import Queue
+from threading import Lock, Thread
+from typing import Any, Callable
+
+# Put on a stage's queue once per worker to stop it
+_STOP = object()
+
+
+# One stage of the scrape pipeline, a bounded queue drained by a pool of worker threads.
+class PipelineStage:
+    def __init__(
+        self,
+        logger: Logger,
+        name: str,
+        handler: Callable[[Any], None],
+        workers: int = 1,
+        maxsize: int = 8,
+    ) -> None:
+        """
+        Initialize a PipelineStage object and start its workers.
+
+        Args:
+            logger (Logger): Logger object.
+            name (str): Name of the stage, used in thread names and statistics.
+            handler (Callable): Called with each item. Exceptions are logged and the item is dropped.
+            workers (int): Number of worker threads.
+            maxsize (int): Items the input queue holds before put() blocks.
+        """
+        self.logger: Logger = logger
+        self.name: str = name
+        self.handler: Callable[[Any], None] = handler
+        self.workers: int = workers
+        self.queue: Queue = Queue(maxsize=maxsize)
+        self.processed: int = 0
+        self.failed: int = 0
+        self.busy_seconds: float = 0.0
+        self.blocked_seconds: float = 0.0
+        self.max_depth: int = 0
+        self.started_at: float = time.perf_counter()
+        self._lock: Lock = Lock()
+        self._threads: list[Thread] = [
+            Thread(target=self._run, name=f"pipeline-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, item: Any) -> None:
+        """Queue an item for the stage, blocking while the queue is full."""
+        t0 = time.perf_counter()
+        self.queue.put(item)
+        with self._lock:
+            self.blocked_seconds += time.perf_counter() - t0
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self) -> None:
+        """Worker loop, handles items until close() is called."""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            t0 = time.perf_counter()
+            try:
+                self.handler(item)
+                failed = 0
+            except Exception as e:
+                failed = 1
+                self.logger.error(
+                    f"Pipeline stage {self.name} failed: {e}", exc_info=True
+                )
+            with self._lock:
+                self.processed += 1
+                self.failed += failed
+                self.busy_seconds += time.perf_counter() - t0
+
+    def close(self) -> None:
+        """Stop the workers once every queued item has been handled."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def get_stats(self) -> dict:
+        """
+        Return the stage's statistics.
+
+        Returns:
+            dict: Workers, current and maximum queue depth, items processed and failed, items per second, seconds workers spent busy, and seconds the previous stage spent blocked on a full queue.
+        """
+        elapsed = time.perf_counter() - self.started_at
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue.qsize(),
+                "max_queue_depth": self.max_depth,
+                "processed": self.processed,
+                "failed": self.failed,
+                "throughput": round(self.processed / elapsed, 3) if elapsed else 0.0,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "blocked_seconds": round(self.blocked_seconds, 3),
+            }
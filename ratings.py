@@ -0,0 +1,228 @@
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from threading import Lock
+
+import requests
+
+from creds import OMDB_API_URL, OMDB_API_KEY
+from db_utilities import connect_to_database
+from http_client import PooledSession
+from scheduler import ScrapeScheduler
+
+
+TABLE_NAME = "movies"
+SHOWTIMES_TABLE_NAME = "showtimes"
+USAGE_TABLE_NAME = "api_usage"
+OMDB_API = "omdb"
+# Error OMDb responds with once the API key's daily limit is used up
+OMDB_LIMIT_ERROR = "Request limit reached!"
+
+
+# Refreshes missing or stale OMDb ratings of upcoming movies within the daily OMDb quota.
+class RatingsRefresher:
+    def __init__(
+        self,
+        logger: Logger,
+        daily_quota: int = 1000,
+        max_age: datetime.timedelta = datetime.timedelta(days=1),
+        max_workers: int = 4,
+        rate: float = 5.0,
+    ) -> None:
+        """
+        Initialize a RatingsRefresher object.
+
+        Args:
+            logger (Logger): Logger object.
+            daily_quota (int): OMDb requests allowed per day across all runs, 1000 on the free tier.
+            max_age (timedelta): Ratings refreshed longer ago than this are stale.
+            max_workers (int): Requests in flight to OMDb.
+            rate (float): Requests per second permitted to OMDb.
+        """
+        self.logger: Logger = logger
+        self.daily_quota: int = daily_quota
+        self.max_age: datetime.timedelta = max_age
+        self.max_workers: int = max_workers
+        self.scheduler: ScrapeScheduler = ScrapeScheduler(
+            max_requests_per_host=max_workers,
+            rate=rate,
+            max_rate=rate,
+            burst=max_workers,
+            max_jitter=0.0,
+        )
+        self.requests_sent: int = 0
+        self.quota_exhausted: bool = False
+        self._lock: Lock = Lock()
+
+    @connect_to_database
+    def get_requests_used_today(self, db, cursor) -> int:
+        """Return the number of OMDb requests sent today, by this and earlier runs."""
+        query = f"SELECT requests FROM {USAGE_TABLE_NAME} WHERE api = %s AND usage_date = CURDATE();"
+        cursor.execute(query, (OMDB_API,))
+        result = cursor.fetchone()
+        return result[0] if result else 0
+
+    @connect_to_database
+    def get_movies_to_refresh(self, db, cursor, limit: int) -> list[tuple[str, str]]:
+        """
+        Retrieve upcoming movies whose ratings have never been fetched or are stale, never-rated movies first and then the stalest.
+
+        Args:
+            limit (int): Maximum number of movies to return.
+
+        Returns:
+            list[tuple[str, str]]: movie_id and imdb_url of each movie.
+        """
+        query = f"""
+            SELECT movie_id, imdb_url FROM {TABLE_NAME}
+            WHERE imdb_url IS NOT NULL
+            AND (ratings_updated_at IS NULL OR ratings_updated_at < NOW() - INTERVAL %s HOUR)
+            AND EXISTS (SELECT 1 FROM {SHOWTIMES_TABLE_NAME} WHERE {SHOWTIMES_TABLE_NAME}.movie_id = {TABLE_NAME}.movie_id AND start_time > DATE(NOW()))
+            ORDER BY ratings_updated_at IS NOT NULL, ratings_updated_at
+            LIMIT %s;
+        """
+        cursor.execute(query, (int(self.max_age.total_seconds() // 3600), limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def parse_ratings(ratings: list[dict]) -> dict:
+        """
+        Convert OMDb ratings to the database's rating columns.
+
+        Args:
+            ratings (list[dict]): The Ratings of an OMDb response.
+
+        Returns:
+            dict: rating_imdb (0-100), rating_rt (%) and rating_meta (0-100), None where the source has no rating.
+        """
+        rating_imdb, rating_rt, rating_meta = None, None, None
+        for rating in ratings:
+            match rating["Source"]:
+                case "Internet Movie Database":
+                    if isinstance(rating["Value"], str):
+                        rating_imdb = int(float(rating["Value"].split("/")[0]) * 10)
+                case "Rotten Tomatoes":
+                    if isinstance(rating["Value"], str):
+                        rating_rt = int(rating["Value"].replace("%", ""))
+                case "Metacritic":
+                    if isinstance(rating["Value"], str):
+                        rating_meta = int(rating["Value"].split("/")[0])
+        return {
+            "rating_imdb": rating_imdb,
+            "rating_rt": rating_rt,
+            "rating_meta": rating_meta,
+        }
+
+    def fetch_ratings(
+        self, session: requests.Session, movie_id: str, imdb_url: str
+    ) -> dict | None:
+        """
+        Fetch a movie's ratings from OMDb.
+
+        Args:
+            session (Session): Session the request is sent with.
+            movie_id (str): The ID of the movie.
+            imdb_url (str): The movie's IMDB URL, which ends with its IMDB ID.
+
+        Returns:
+            dict | None: Row for the ratings update, None if the request failed or OMDb has no ratings for the movie, so its existing ratings are kept.
+        """
+        imdb_id = imdb_url.split("/")[-1]
+        if self.quota_exhausted:
+            return None
+        try:
+            with self.scheduler.permit(OMDB_API_URL):
+                t0 = time.perf_counter()
+                with self._lock:
+                    self.requests_sent += 1
+                try:
+                    response = session.get(
+                        url=OMDB_API_URL,
+                        params={"apikey": OMDB_API_KEY, "i": imdb_id, "plot": "short"},
+                        timeout=10,
+                    )
+                except requests.RequestException:
+                    self.scheduler.report(OMDB_API_URL, None, time.perf_counter() - t0)
+                    raise
+            self.scheduler.report(
+                OMDB_API_URL, response.status_code, time.perf_counter() - t0
+            )
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            # OMDb reports unknown ids and the exhausted quota in the body, with a 200 or 401
+            if data.get("Response") == "False":
+                error = data.get("Error")
+                if error == OMDB_LIMIT_ERROR:
+                    self.quota_exhausted = True
+                self.logger.warning(f"OMDb returned no ratings for {imdb_id}: {error}")
+                return None
+            response.raise_for_status()
+            return {
+                "movie_id": movie_id,
+                **self.parse_ratings(data.get("Ratings", [])),
+            }
+        except Exception as e:
+            self.logger.error(f"Failed to fetch ratings for {imdb_id}: {e}")
+            return None
+
+    @connect_to_database
+    def save(self, db, cursor, ratings_values_list: list[dict]) -> None:
+        """Write refreshed ratings, and add the requests sent to today's OMDb usage."""
+        if ratings_values_list:
+            columns = ["rating_imdb", "rating_rt", "rating_meta"]
+            set_clause = ", ".join(f"{col} = %({col})s" for col in columns)
+            update_query = f"""
+                UPDATE {TABLE_NAME}
+                SET {set_clause}, ratings_updated_at = NOW()
+                WHERE movie_id = %(movie_id)s;
+            """
+            cursor.executemany(update_query, ratings_values_list)
+        usage_query = f"INSERT INTO {USAGE_TABLE_NAME} (api, usage_date, requests) VALUES (%s, CURDATE(), %s) ON DUPLICATE KEY UPDATE requests = requests + VALUES(requests);"
+        cursor.execute(usage_query, (OMDB_API, self.requests_sent))
+        db.commit()
+
+    def refresh(self) -> int:
+        """
+        Refresh the ratings of new and stale upcoming movies, within the remaining daily quota.
+
+        Returns:
+            int: Number of movies whose ratings were refreshed.
+        """
+        remaining_quota = self.daily_quota - self.get_requests_used_today()
+        if remaining_quota <= 0:
+            self.logger.warning(
+                f"OMDb daily quota of {self.daily_quota} requests used, ratings not refreshed"
+            )
+            return 0
+
+        movies = self.get_movies_to_refresh(limit=remaining_quota)
+        if not movies:
+            self.logger.info("No movie ratings to update")
+            return 0
+
+        with PooledSession(pool_maxsize=self.max_workers) as session:
+            with ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="omdb"
+            ) as executor:
+                results = list(
+                    executor.map(
+                        lambda movie: self.fetch_ratings(session, *movie), movies
+                    )
+                )
+        ratings_values_list = [result for result in results if result is not None]
+        if self.quota_exhausted:
+            self.logger.warning(
+                "OMDb request limit reached, remaining ratings are left for the next run"
+            )
+            # Later runs today skip OMDb, as the key's limit can be reached before the quota configured here
+            self.requests_sent = max(self.requests_sent, remaining_quota)
+        self.save(ratings_values_list)
+
+        self.logger.info(
+            f"Ratings updated for {len(ratings_values_list)} of {len(movies)} new or stale movies, "
+            f"{self.requests_sent} OMDb requests ({remaining_quota - self.requests_sent} left today)"
+        )
+        return len(ratings_values_list)
@@ -0,0 +1,84 @@
+import glob
+import gzip
+import json
+import datetime
+from threading import Lock
+from typing import Iterator
+
+
+ARCHIVE_EXTENSION = ".ndjson.gz"
+
+
+# Streams raw English showings of each page to a gzip NDJSON archive. Shared by all scrapers in a run.
+class RawArchiveWriter:
+    def __init__(self, path: str, compresslevel: int = 6) -> None:
+        """
+        Initialize a RawArchiveWriter object and open the archive file.
+
+        Args:
+            path (str): Path of the archive file to create.
+            compresslevel (int): gzip compression level, 1 is fastest and 9 is smallest.
+        """
+        self.path: str = path
+        self.page_count: int = 0
+        self._lock: Lock = Lock()
+        self._file = gzip.open(path, "wt", encoding="utf8", compresslevel=compresslevel)
+
+    def write(self, cinema_id: str, show_date: datetime.date, showings: list[dict]):
+        """
+        Append the raw showings of one page to the archive. Safe to call from scraper threads.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            show_date (date): The date of the page.
+            showings (list[dict]): English showings from the page, as returned upstream.
+        """
+        line = json.dumps(
+            {
+                "cinema_id": cinema_id,
+                "date": str(show_date),
+                "fetched_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "showings": showings,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self.page_count += 1
+
+    def close(self) -> None:
+        """Flush and close the archive file."""
+        with self._lock:
+            self._file.close()
+
+
+def find_raw_archives(pattern: str) -> list[str]:
+    """
+    Return the archive files matching a glob pattern, oldest first. Archive names include the time of the run, so sorting by name sorts by run.
+
+    Args:
+        pattern (str): Glob pattern, e.g. "raw_data/raw_data_2026-09-*".
+
+    Returns:
+        list[str]: Paths of the matching files.
+    """
+    return sorted(glob.glob(pattern))
+
+
+def read_raw_archive(path: str) -> Iterator[dict]:
+    """
+    Yield the pages of a raw archive one at a time, so an archive of any size is read in constant memory. Uncompressed .ndjson archives from earlier runs are also accepted.
+
+    Args:
+        path (str): Path of the archive file.
+
+    Returns:
+        Iterator[dict]: Each page, with cinema_id, date, fetched_at (None in archives written before it was recorded) and the raw showings.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf8") as f:
+        for line in f:
+            if line.strip():
+                page = json.loads(line)
+                page.setdefault("fetched_at", None)
+                yield page
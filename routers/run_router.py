@@ -0,0 +1,144 @@
+from fastapi import APIRouter, HTTPException, Request, Header, Depends, Response
+from fastapi.responses import PlainTextResponse
+
+from run_tracker import ScraperRun, ScraperRunTracker, ScraperRunInProgressError
+from routers.limiter import limiter
+from dependencies import get_logger
+from creds import SCRAPER_CODE
+
+
+router = APIRouter(
+    prefix="/run",
+)
+
+
+def get_run_tracker(request: Request) -> ScraperRunTracker:
+    """Retrieve the persistent ScraperRunTracker instance from app state"""
+    return request.app.state.scraper_runs
+
+
+# Endpoint to activate scraper manually
+@router.get("", status_code=202, tags=["Initiate Scraper"])
+@limiter.limit("1/30seconds")
+def run_scraper(
+    request: Request,
+    response: Response,
+    start: int = 0,
+    end: int = 14,
+    budget: int | None = None,
+    auth: str | None = Header(None),
+    logger=Depends(get_logger),
+    tracker=Depends(get_run_tracker),
+):
+    """Endpoint that can be used to initialize the scraper. The scraper runs in the background, use the returned job_id to check its progress"""
+    check_scraper_code(auth, logger, f"Initialize scraper days {start} - {end}")
+
+    try:
+        run, created = tracker.submit(start, end, budget)
+    except ScraperRunInProgressError as e:
+        logger.warning(f"Scraper run refused: {e.message}")
+        raise HTTPException(
+            status_code=409, detail={"message": e.message, "job_id": e.job_id}
+        )
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=500, detail={"message": "Server Error"})
+
+    if created:
+        logger.info(f"Scraper run {run.job_id} queued, days {start} - {end}")
+    else:
+        # Same date window and budget as the active run, so the request is coalesced into it
+        response.status_code = 200
+    return {**run.to_json(), "coalesced": not created}
+
+
+# Endpoint to retry enrichment of movies written without TMDB details
+@router.get("/enrichment", status_code=202, tags=["Initiate Scraper"])
+@limiter.limit("1/30seconds")
+def run_enrichment(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    auth: str | None = Header(None),
+    logger=Depends(get_logger),
+    tracker=Depends(get_run_tracker),
+):
+    """Endpoint to retrieve the TMDB details of pending movies, and of failed movies whose retry is due, up to `limit` movies. Runs in the background after any scraper run, use the returned job_id to check its results"""
+    check_scraper_code(auth, logger, f"Enrichment of up to {limit} movies")
+
+    try:
+        run, created = tracker.submit_enrichment(limit)
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=500, detail={"message": "Server Error"})
+
+    if created:
+        logger.info(f"Enrichment run {run.job_id} queued, up to {limit} movies")
+    else:
+        response.status_code = 200
+    return {**run.to_json(), "coalesced": not created}
+
+
+@router.get("/{job_id}", status_code=200, tags=["Initiate Scraper"])
+@limiter.limit("2/second;20/minute")
+def get_run_status(
+    request: Request,
+    job_id: str,
+    auth: str | None = Header(None),
+    logger=Depends(get_logger),
+    tracker=Depends(get_run_tracker),
+):
+    """Endpoint to check the status of a scraper run, or the results of an enrichment run"""
+    check_scraper_code(auth, logger, f"Scraper run status {job_id}")
+    return get_run(tracker, job_id).to_json()
+
+
+@router.get("/{job_id}/progress", status_code=200, tags=["Initiate Scraper"])
+@limiter.limit("2/second;20/minute")
+def get_run_progress(
+    request: Request,
+    job_id: str,
+    auth: str | None = Header(None),
+    logger=Depends(get_logger),
+    tracker=Depends(get_run_tracker),
+):
+    """Endpoint to check the progress and scraping statistics of each cinema in a scraper run"""
+    check_scraper_code(auth, logger, f"Scraper run progress {job_id}")
+    return get_run(tracker, job_id, scraper_only=True).progress_json()
+
+
+@router.get(
+    "/{job_id}/metrics",
+    status_code=200,
+    tags=["Initiate Scraper"],
+    response_class=PlainTextResponse,
+)
+@limiter.limit("2/second;20/minute")
+def get_run_metrics(
+    request: Request,
+    job_id: str,
+    auth: str | None = Header(None),
+    logger=Depends(get_logger),
+    tracker=Depends(get_run_tracker),
+):
+    """Endpoint to retrieve the request latency, bytes, retries and showings metrics of a scraper run, in Prometheus text format"""
+    check_scraper_code(auth, logger, f"Scraper run metrics {job_id}")
+    return get_run(tracker, job_id, scraper_only=True).metrics.to_prometheus()
+
+
+def get_run(tracker: ScraperRunTracker, job_id: str, scraper_only: bool = False):
+    """Return the run with `job_id`, or raise a 404 if it is unknown, or is not a scraper run when `scraper_only`"""
+    run = tracker.get(job_id)
+    if run is None or (scraper_only and not isinstance(run, ScraperRun)):
+        raise HTTPException(status_code=404, detail="Scraper run not found")
+    return run
+
+
+def check_scraper_code(auth, logger, request_type):
+    """Check if the correct authorization token has been provided"""
+    if not auth or auth.strip() != SCRAPER_CODE:
+        logger.error(f"Unauthorized access attempt: {request_type}")
+        raise HTTPException(
+            status_code=401,
+            detail="Unauthorized access",
+        )
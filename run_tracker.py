@@ -0,0 +1,293 @@
+import time
+import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from threading import Lock
+from uuid import uuid4
+
+from metrics import ScrapeMetrics
+
+
+class ScraperRunInProgressError(Exception):
+    """Exception to be raised when a scraper run is requested while a run over a different date window is already queued or running"""
+
+    def __init__(self, message: str, job_id: str):
+        self.message = message
+        self.job_id = job_id
+        super().__init__(message)
+
+
+class ScraperRun:
+    """State and per-cinema progress of a scraper run started through the API."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    def __init__(
+        self, start_day: int, end_day: int, request_budget: int | None = None
+    ) -> None:
+        """
+        Initialize a ScraperRun object.
+
+        Args:
+            start_day (int): The starting day for scraping. Today is day 0.
+            end_day (int): The ending day for scraping.
+            request_budget (int, optional): Maximum number of cinema/day pages to scrape.
+        """
+        self.job_id: str = uuid4().hex
+        self.start_day: int = start_day
+        self.end_day: int = end_day
+        self.request_budget: int | None = request_budget
+        self.status: str = self.QUEUED
+        self.created_at: datetime.datetime = datetime.datetime.now()
+        self.started_at: datetime.datetime | None = None
+        self.finished_at: datetime.datetime | None = None
+        self.error: str | None = None
+        self.cinemas: dict[str, dict] = {}
+        self.metrics: ScrapeMetrics = ScrapeMetrics()
+        self._lock: Lock = Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (self.QUEUED, self.RUNNING)
+
+    def update_cinema(self, cinema_id: str, status: str, stats: dict | None = None):
+        """
+        Record the progress of a single cinema. Passed to ScraperManager as its progress callback.
+
+        Args:
+            cinema_id (str): The ID of the cinema.
+            status (str): Progress of the cinema, e.g. "scraping" or "done".
+            stats (dict, optional): Scraping statistics for the cinema.
+        """
+        with self._lock:
+            self.cinemas[cinema_id] = {
+                "status": status,
+                "stats": stats or {},
+                "updated_at": datetime.datetime.now(),
+            }
+
+    def to_json(self) -> dict:
+        """Return a summary of the run as a dict"""
+        with self._lock:
+            cinemas_done = sum(c["status"] == "done" for c in self.cinemas.values())
+            cinemas_seen = len(self.cinemas)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "start": self.start_day,
+            "end": self.end_day,
+            "budget": self.request_budget,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cinemas_done": cinemas_done,
+            "cinemas_started": cinemas_seen,
+            "error": self.error,
+        }
+
+    def progress_json(self) -> dict:
+        """Return the summary of the run along with the progress and stats of every cinema"""
+        summary = self.to_json()
+        with self._lock:
+            summary["cinemas"] = {
+                cinema_id: dict(progress) for cinema_id, progress in self.cinemas.items()
+            }
+        return summary
+
+
+class EnrichmentRun:
+    """State and results of a drain of the enrichment queue started through the API."""
+
+    def __init__(self, limit: int | None = None) -> None:
+        """
+        Initialize an EnrichmentRun object.
+
+        Args:
+            limit (int, optional): Maximum number of movies to attempt. All due movies if None.
+        """
+        self.job_id: str = uuid4().hex
+        self.limit: int | None = limit
+        self.status: str = ScraperRun.QUEUED
+        self.created_at: datetime.datetime = datetime.datetime.now()
+        self.started_at: datetime.datetime | None = None
+        self.finished_at: datetime.datetime | None = None
+        self.error: str | None = None
+        self.results: dict | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (ScraperRun.QUEUED, ScraperRun.RUNNING)
+
+    def to_json(self) -> dict:
+        """Return a summary of the drain as a dict"""
+        return {
+            "job_id": self.job_id,
+            "type": "enrichment",
+            "status": self.status,
+            "limit": self.limit,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "results": self.results,
+            "error": self.error,
+        }
+
+
+# Runs scraper runs and enrichment drains on one background thread, coalescing repeat requests.
+class ScraperRunTracker:
+    def __init__(self, logger: Logger, max_history: int = 20) -> None:
+        """
+        Initialize a ScraperRunTracker object.
+
+        Args:
+            logger (Logger): Logger object.
+            max_history (int): Number of runs kept for status requests.
+        """
+        self.logger: Logger = logger
+        self.max_history: int = max_history
+        self.runs: OrderedDict[str, ScraperRun | EnrichmentRun] = OrderedDict()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="scraper-run"
+        )
+        self._lock: Lock = Lock()
+
+    def submit(
+        self, start_day: int, end_day: int, request_budget: int | None = None
+    ) -> tuple[ScraperRun, bool]:
+        """
+        Queue a scraper run, or coalesce the request into the active run if it covers the same date window and budget.
+
+        Args:
+            start_day (int): The starting day for scraping. Today is day 0.
+            end_day (int): The ending day for scraping.
+            request_budget (int, optional): Maximum number of cinema/day pages to scrape.
+
+        Raises:
+            ScraperRunInProgressError: If a run over a different date window is queued or running.
+
+        Returns:
+            tuple[ScraperRun, bool]: The run, and True if it was created by this request.
+        """
+        with self._lock:
+            active = next(
+                (
+                    run
+                    for run in self.runs.values()
+                    if isinstance(run, ScraperRun) and run.active
+                ),
+                None,
+            )
+            if active is not None:
+                if (active.start_day, active.end_day, active.request_budget) == (
+                    start_day,
+                    end_day,
+                    request_budget,
+                ):
+                    return active, False
+                raise ScraperRunInProgressError(
+                    f"Scraper run {active.job_id} for days {active.start_day} - {active.end_day} is {active.status}",
+                    job_id=active.job_id,
+                )
+
+            run = ScraperRun(start_day, end_day, request_budget)
+            self._add(run)
+
+        self._executor.submit(self._run, run)
+        return run, True
+
+    def submit_enrichment(self, limit: int | None = None) -> tuple[EnrichmentRun, bool]:
+        """
+        Queue a drain of the enrichment queue, or coalesce the request into the drain already queued or running. Drains share the scraper run thread, so they never work on the same movies as the drain at the end of a scraper run.
+
+        Args:
+            limit (int, optional): Maximum number of movies to attempt. All due movies if None.
+
+        Returns:
+            tuple[EnrichmentRun, bool]: The drain, and True if it was created by this request.
+        """
+        with self._lock:
+            active = next(
+                (
+                    run
+                    for run in self.runs.values()
+                    if isinstance(run, EnrichmentRun) and run.active
+                ),
+                None,
+            )
+            if active is not None:
+                return active, False
+            run = EnrichmentRun(limit)
+            self._add(run)
+
+        self._executor.submit(self._run_enrichment, run)
+        return run, True
+
+    def _add(self, run: ScraperRun | EnrichmentRun) -> None:
+        """Keep a run for status requests, dropping the oldest beyond max_history. Called with _lock held."""
+        self.runs[run.job_id] = run
+        while len(self.runs) > self.max_history:
+            self.runs.popitem(last=False)
+
+    def get(self, job_id: str) -> ScraperRun | EnrichmentRun | None:
+        """Return the run with `job_id`, or None if it is unknown."""
+        with self._lock:
+            return self.runs.get(job_id)
+
+    def _run(self, run: ScraperRun) -> None:
+        """Run the scraper for `run`. Runs on the background executor thread."""
+        from scraper import ScraperManager
+
+        run.status = ScraperRun.RUNNING
+        run.started_at = datetime.datetime.now()
+        t0 = time.perf_counter()
+        try:
+            manager = ScraperManager(
+                start_day=run.start_day,
+                end_day=run.end_day,
+                logger=self.logger,
+                progress_callback=run.update_cinema,
+                metrics=run.metrics,
+                request_budget=run.request_budget,
+            )
+            # ScraperManager logs the error it stopped on and keeps it, rather than raising it
+            if manager.error is not None:
+                run.status = ScraperRun.FAILED
+                run.error = manager.error
+                self.logger.error(f"Scraper run {run.job_id} failed: {manager.error}")
+            else:
+                run.status = ScraperRun.FINISHED
+                self.logger.info(
+                    f"Scraper run {run.job_id} finished. Time taken: {time.perf_counter() - t0:.2f}s"
+                )
+        except Exception as e:
+            run.status = ScraperRun.FAILED
+            run.error = str(e)
+            self.logger.error(f"Scraper run {run.job_id} failed: {e}", exc_info=True)
+        finally:
+            run.finished_at = datetime.datetime.now()
+
+    def _run_enrichment(self, run: EnrichmentRun) -> None:
+        """Drain the enrichment queue for `run`. Runs on the background executor thread."""
+        from enrichment import drain_enrichment_queue
+
+        run.status = ScraperRun.RUNNING
+        run.started_at = datetime.datetime.now()
+        try:
+            run.results = drain_enrichment_queue(self.logger, run.limit)
+            run.status = ScraperRun.FINISHED
+        except Exception as e:
+            run.status = ScraperRun.FAILED
+            run.error = str(e)
+            self.logger.error(
+                f"Enrichment run {run.job_id} failed: {e}", exc_info=True
+            )
+        finally:
+            run.finished_at = datetime.datetime.now()
+
+    def shutdown(self) -> None:
+        """Stop accepting runs. A run in progress is left to finish."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
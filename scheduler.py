@@ -0,0 +1,202 @@
+import time
+import random
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+from urllib.parse import urlsplit
+
+
+SCRAPING_ANT_HOST = "api.scrapingant.com"
+
+# Status codes that mean the upstream wants us to slow down
+BACKOFF_STATUS_CODES = {403, 429, 503}
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Tokens refill continuously at `rate` per second, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Initialize a TokenBucket object.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum number of tokens held, i.e. the largest permitted burst.
+        """
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated: float = time.monotonic()
+        self._lock: Lock = Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """
+        Take a token, sleeping until it is available. Tokens are reserved in order, so callers are served first come first served.
+
+        Returns:
+            float: Seconds spent waiting for the token.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate, keeping tokens accrued at the previous rate."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class HostLimiter:
+    """Request limits for a single host: a cap on requests in flight, a token bucket, and an adaptive rate."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        burst: float,
+    ) -> None:
+        self.slots: BoundedSemaphore = BoundedSemaphore(max_in_flight)
+        self.bucket: TokenBucket = TokenBucket(rate, burst)
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.blocked_until: float = 0.0
+        self._lock: Lock = Lock()
+
+    def backoff(self, retry_after: float) -> None:
+        """Halve the request rate and pause the host for `retry_after` seconds."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+
+    def slow_down(self) -> None:
+        """Reduce the request rate slightly, used when responses are slow."""
+        with self._lock:
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate * 0.8))
+
+    def speed_up(self, step: float) -> None:
+        """Raise the request rate by `step` per second, up to max_rate."""
+        with self._lock:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + step))
+
+
+# Politeness limits shared by every Scraper in a run, as cinemas are scraped concurrently.
+# Per-host token bucket, its rate raised while responses are fast and halved on 403/429/503 or timeouts.
+class ScrapeScheduler:
+    def __init__(
+        self,
+        max_concurrent_cinemas: int = 4,
+        max_requests_per_host: int = 2,
+        rate: float = 1.0,
+        min_rate: float = 0.1,
+        max_rate: float = 4.0,
+        burst: float = 2.0,
+        rate_step: float = 0.1,
+        slow_latency: float = 3.0,
+        backoff_delay: float = 30.0,
+        max_jitter: float = 0.5,
+        host_limits: dict[str, dict] | None = None,
+    ) -> None:
+        """
+        Initialize a ScrapeScheduler object.
+
+        Args:
+            max_concurrent_cinemas (int): Number of cinemas scraped in parallel.
+            max_requests_per_host (int): Default number of requests allowed in flight to a single host.
+            rate (float): Initial requests per second permitted to each host.
+            min_rate (float): Lowest rate backoff can reduce a host to.
+            max_rate (float): Highest rate a host can be raised to.
+            burst (float): Number of requests a host can receive back to back after being idle.
+            rate_step (float): Requests per second added to a host's rate after each fast, successful response.
+            slow_latency (float): Response time in seconds above which the host's rate is reduced.
+            backoff_delay (float): Seconds a host is paused after a backoff status code, unless it sends Retry-After.
+            max_jitter (float): Maximum random delay in seconds added before each request.
+            host_limits (dict[str, dict], optional): Per-host overrides of max_in_flight, rate, min_rate, max_rate and burst.
+        """
+        self.max_concurrent_cinemas: int = max_concurrent_cinemas
+        self.defaults: dict = {
+            "max_in_flight": max_requests_per_host,
+            "rate": rate,
+            "min_rate": min_rate,
+            "max_rate": max_rate,
+            "burst": burst,
+        }
+        self.rate_step: float = rate_step
+        self.slow_latency: float = slow_latency
+        self.backoff_delay: float = backoff_delay
+        self.max_jitter: float = max_jitter
+        # ScrapingAnt's free tier does not permit concurrent requests
+        self.host_limits: dict[str, dict] = {
+            SCRAPING_ANT_HOST: {"max_in_flight": 1, "rate": 1.0, "max_rate": 1.0}
+        }
+        self.host_limits.update(host_limits or {})
+        self._hosts: dict[str, HostLimiter] = {}
+        self._lock: Lock = Lock()
+
+    def _get_host(self, url: str) -> HostLimiter:
+        """Return the limiter for the host of `url`, creating it on first use."""
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            if host not in self._hosts:
+                limits = {**self.defaults, **self.host_limits.get(host, {})}
+                self._hosts[host] = HostLimiter(**limits)
+            return self._hosts[host]
+
+    @contextmanager
+    def permit(self, url: str):
+        """
+        Context manager that blocks until a request to the host of `url` is permitted, and holds one of the host's in-flight slots while the request runs.
+
+        Args:
+            url (str): URL about to be requested.
+        """
+        host = self._get_host(url)
+        with host.slots:
+            paused = host.blocked_until - time.monotonic()
+            if paused > 0:
+                time.sleep(paused)
+            host.bucket.acquire()
+            time.sleep(random.uniform(0, self.max_jitter))
+            yield
+
+    def report(
+        self,
+        url: str,
+        status_code: int | None,
+        latency: float,
+        retry_after: str | None = None,
+    ) -> None:
+        """
+        Adapt the request rate for the host of `url` to the outcome of a request.
+
+        Args:
+            url (str): URL that was requested.
+            status_code (int | None): Response status code, None if the request raised (e.g. timeout).
+            latency (float): Seconds the request took.
+            retry_after (str, optional): Value of the Retry-After response header, if any.
+        """
+        host = self._get_host(url)
+        if status_code is None or status_code in BACKOFF_STATUS_CODES:
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = self.backoff_delay
+            host.backoff(delay)
+        elif latency > self.slow_latency:
+            host.slow_down()
+        elif status_code == 200:
+            host.speed_up(self.rate_step)
+
+    def get_rates(self) -> dict[str, float]:
+        """Return the current requests per second permitted for each host seen so far."""
+        with self._lock:
+            return {host: limiter.bucket.rate for host, limiter in self._hosts.items()}
@@ -1,8 +1,13 @@
+import os
 import json
-import datetime
 import time
-import random
+import asyncio
+import datetime
+from dataclasses import asdict, dataclass, field
 from logging import Logger
+from typing import Callable, Iterator
+from queue import Queue
+from threading import Event, Lock, Thread
 
 import requests
 from tqdm import tqdm
@@ -10,18 +15,33 @@ from fake_useragent import UserAgent
 
 from cinema import CinemaManager
 from showing import ShowingsManager
-from movie import MovieManager
-from search import Search
-from db_utilities import connect_to_database
+from movie import Movie, MovieManager
+from enrichment import EnrichmentQueue
+from models.showing_record import ShowingRecord, ORIGINAL_SHOWTIME_KEYS
+from raw_archive import (
+    RawArchiveWriter,
+    ARCHIVE_EXTENSION,
+    find_raw_archives,
+    read_raw_archive,
+)
+from scheduler import ScrapeScheduler
+from http_client import PooledSession
+from metrics import ScrapeMetrics
+from pipeline import PipelineStage
+from circuit_breaker import CircuitBreaker, CircuitBreakerManager
+from job_queue import ScrapeJobQueue
+from fingerprint import PageFingerprints
+from horizon import HorizonPlanner
+from ratings import RatingsRefresher
 from creds import (
     SCRAPING_ANT_API_KEY,
     BASE_PREFIX,
     REFERER,
     PAYLOAD,
-    OMDB_API_URL,
-    OMDB_API_KEY,
 )
 
+SCRAPING_ANT_URL = "https://api.scrapingant.com/v2/general"
+
 
 # Scraper class, instantiate once per cinema, scrapes the full date range and stores raw data to be processed.
 class Scraper:
@@ -32,26 +52,60 @@ class Scraper:
         cinema_id: str,
         start_day: int,
         end_day: int,
+        scheduler: ScrapeScheduler | None = None,
+        fallback: "FallbackWorker | None" = None,
+        breaker: CircuitBreaker | None = None,
+        dates: list[datetime.date] | None = None,
+        fingerprints: PageFingerprints | None = None,
+        headers: dict | None = None,
+        raw_archive: RawArchiveWriter | None = None,
+        metrics: ScrapeMetrics | None = None,
     ) -> None:
         """
         Initialize a Scraper object. Runs for a single cinema.
 
         Args:
             logger (Logger): Logger object.
-            session(Session): Session object
+            session(Session): Session object, shared with the other scrapers in the run so connections are reused.
             cinema_id (str): The ID of the cinema to scrape.
             start_day (int): The starting day for scraping. Today is day 0.
             end_day (int): The ending day for scraping.
+            scheduler (ScrapeScheduler, optional): Politeness limits shared with other scrapers in the same run.
+            fallback (FallbackWorker, optional): If provided, failed URLs are handed to it as soon as they fail, instead of being retried after the direct pass.
+            breaker (CircuitBreaker, optional): Direct scraping circuit breaker for this cinema. While open, URLs skip the direct request.
+            dates (list[date], optional): Specific dates to scrape, e.g. the unfinished items of a resumed run. Overrides start_day and end_day.
+            fingerprints (PageFingerprints, optional): Fingerprints from previous runs. Pages whose English showings are unchanged are not added to records.
+            headers (dict, optional): Headers sent with every direct request for this cinema, e.g. User-Agent and Referer.
+            raw_archive (RawArchiveWriter, optional): If provided, the raw English showings of every scraped page are streamed to it.
+            metrics (ScrapeMetrics, optional): Telemetry shared with the other scrapers in the run.
         """
         self.logger: Logger = logger
         self.session: requests.Session = session
+        self.headers: dict = headers or {}
+        self.raw_archive: RawArchiveWriter | None = raw_archive
+        self.metrics: ScrapeMetrics = metrics or ScrapeMetrics()
+        self.requested_urls: set[str] = set()
         self.cinema_id: str = cinema_id
-        self.target_urls: list[str] = self.create_url_list(start_day, end_day)
-        self.raw_json_data: list[dict] = []
+        self.scheduler: ScrapeScheduler = scheduler or ScrapeScheduler()
+        self.fallback: FallbackWorker | None = fallback
+        self.breaker: CircuitBreaker = breaker or CircuitBreaker(cinema_id)
+        self.fingerprints: PageFingerprints | None = fingerprints
+        self.page_hashes: dict[datetime.date, str] = {}
+        # Whether each page changed since its previous fingerprint, None if it had none
+        self.page_changes: dict[datetime.date, bool | None] = {}
+        self.url_dates: dict[str, datetime.date] = {}
+        self.target_urls: list[str] = self.create_url_list(start_day, end_day, dates)
+        self.records: list[ShowingRecord] = []
+        # Dates whose non-empty pages were added to records in full, so showings stored for them but no longer listed can be removed
+        self.parsed_dates: list[datetime.date] = []
         self.failed_urls: list[str] = []
+        self.completed_dates: list[datetime.date] = []
+        self.failed_dates: list[datetime.date] = []
         self.direct_success_count: int = 0
         self.scrapingant_success_count: int = 0
         self.total_fail_count: int = 0
+        self.direct_skipped_count: int = 0
+        self.unchanged_page_count: int = 0
 
         try:
             self.scrape_urls()
@@ -60,22 +114,33 @@ class Scraper:
                 f"Scraper failed for cinema_id: {self.cinema_id}", exc_info=True
             )
 
-    def create_url_list(self, start_day: int, end_day: int):
+    def create_url_list(
+        self,
+        start_day: int,
+        end_day: int,
+        dates: list[datetime.date] | None = None,
+    ):
         """
-        Return a list of all URLs to be scraped for this cinema.
+        Return a list of all URLs to be scraped for this cinema, and record the date of each in url_dates.
 
         Args:
             start_day (int): The starting day for scraping.
             end_day (int): The ending day for scraping.
+            dates (list[date], optional): Specific dates to scrape instead of the start_day - end_day range.
 
         Returns:
             list: List of URLs.
         """
-        today_date = datetime.date.today()
-        url_list = [
-            f"{BASE_PREFIX}{self.cinema_id}/d-{today_date + datetime.timedelta(days=i)}/"
-            for i in range(start_day, end_day)
-        ]
+        if dates is None:
+            today_date = datetime.date.today()
+            dates = [
+                today_date + datetime.timedelta(days=i)
+                for i in range(start_day, end_day)
+            ]
+        self.url_dates = {
+            f"{BASE_PREFIX}{self.cinema_id}/d-{date}/": date for date in dates
+        }
+        url_list = list(self.url_dates)
         self.logger.debug(
             f"Scraper.create_url_list() for {self.cinema_id=} ran successfully"
         )
@@ -83,12 +148,32 @@ class Scraper:
 
     def return_data(self):
         """
-        Return all the scraped raw data.
+        Return all the scraped showing records.
+
+        Returns:
+            list[ShowingRecord]: Compact records of the English showings scraped.
+        """
+        return self.records
+
+    @staticmethod
+    def create_records(logger: Logger, showings: list[dict]) -> list[ShowingRecord]:
+        """
+        Convert raw showings from the scraped JSON into compact records. Showings missing required fields are skipped.
+
+        Args:
+            logger (Logger): Logger object.
+            showings (list[dict]): Raw showings.
 
         Returns:
-            list: List of raw JSON data.
+            list[ShowingRecord]: The records.
         """
-        return self.raw_json_data
+        records = []
+        for showing in showings:
+            try:
+                records.append(ShowingRecord.from_raw(showing))
+            except Exception as e:
+                logger.error(f"Unable to read scraped showing: {e}")
+        return records
 
     def get_stats(self):
         """
@@ -101,36 +186,102 @@ class Scraper:
             "direct_success": self.direct_success_count,
             "scrapingant_success": self.scrapingant_success_count,
             "total_fail": self.total_fail_count,
+            "direct_skipped": self.direct_skipped_count,
+            "unchanged_pages": self.unchanged_page_count,
         }
 
+    def record_failure(self, target_url: str) -> None:
+        """Record that `target_url` could not be scraped directly or through ScrapingAnt."""
+        self.total_fail_count += 1
+        self.failed_dates.append(self.url_dates[target_url])
+
     def scrape_urls(self) -> list | None:
         """
         Run scraper on all target URLs and process responses.
         First tries direct requests, then falls back to ScrapingAnt for failures.
+        With a FallbackWorker, failures are retried through ScrapingAnt while the direct pass continues.
 
         Returns:
             list: List of scraped data.
         """
-        # First pass: try direct requests
+        pending_fallbacks: list[Event] = []
+
+        # First pass: try direct requests, unless the circuit breaker shows direct access to this cinema is currently blocked
         for target_url in self.target_urls:
-            success = self._scrape_direct(target_url)
+            success = False
+            if self.breaker.allow_direct():
+                success = self._scrape_direct(target_url)
+                self.breaker.record(success)
+            else:
+                self.direct_skipped_count += 1
             if not success:
-                self.failed_urls.append(target_url)
+                if self.fallback is not None:
+                    pending_fallbacks.append(self.fallback.submit(self, target_url))
+                else:
+                    self.failed_urls.append(target_url)
 
-            time.sleep(random.uniform(2.5, 3.5))
+        # Data for this cinema is only complete once the fallback worker has handled its failed URLs
+        for done in pending_fallbacks:
+            done.wait()
 
         # Second pass: use ScrapingAnt for failed URLs
         if self.failed_urls:
             self.logger.info(
                 f"Retrying {len(self.failed_urls)} failed URLs with ScrapingAnt for cinema {self.cinema_id}"
             )
-            with requests.Session() as ant_session:
-                for target_url in self.failed_urls:
-                    success = self._scrape_with_scrapingant(target_url, ant_session)
-                    if not success:
-                        self.total_fail_count += 1
+            for target_url in self.failed_urls:
+                success = self._scrape_with_scrapingant(target_url, self.session)
+                if not success:
+                    self.record_failure(target_url)
             self.failed_urls = []
 
+    def _post(
+        self,
+        session: requests.Session,
+        url: str,
+        path: str,
+        target_url: str,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send a POST request once the scheduler permits it, and report the outcome back to the scheduler so it can adapt the host's request rate.
+
+        Args:
+            session (requests.Session): Session used to send the request.
+            url (str): URL to request.
+            path (str): Request path recorded in metrics, ScrapeMetrics.DIRECT or ScrapeMetrics.SCRAPINGANT.
+            target_url (str): Cinema page the request is for, used to count retries.
+            **kwargs: Passed to session.post().
+
+        Returns:
+            requests.Response: The response.
+        """
+        if target_url in self.requested_urls:
+            self.metrics.record_retry(path)
+        self.requested_urls.add(target_url)
+
+        t_wait = time.perf_counter()
+        with self.scheduler.permit(url):
+            t0 = time.perf_counter()
+            try:
+                response = session.post(url, **kwargs)
+            except requests.RequestException:
+                latency = time.perf_counter() - t0
+                self.scheduler.report(url, None, latency)
+                self.metrics.record_request(path, None, latency, t0 - t_wait)
+                raise
+        latency = time.perf_counter() - t0
+        self.scheduler.report(
+            url,
+            response.status_code,
+            latency,
+            response.headers.get("Retry-After"),
+        )
+        self.metrics.record_request(
+            path, response.status_code, latency, t0 - t_wait, len(response.content)
+        )
+        return response
+
     def _scrape_direct(self, target_url: str) -> bool:
         """
         Attempt to scrape URL directly with requests.
@@ -142,7 +293,15 @@ class Scraper:
             bool: True if successful, False otherwise.
         """
         try:
-            response = self.session.post(target_url, json=PAYLOAD, timeout=10)
+            response = self._post(
+                self.session,
+                target_url,
+                ScrapeMetrics.DIRECT,
+                target_url,
+                json=PAYLOAD,
+                headers=self.headers,
+                timeout=10,
+            )
             self.logger.debug(
                 f"Direct request sent. URL: {target_url} Status code: {response.status_code}"
             )
@@ -165,8 +324,9 @@ class Scraper:
                 )
                 return False
 
-            self._process_response_data(data)
+            self._process_response_data(data, target_url)
             self.direct_success_count += 1
+            self.completed_dates.append(self.url_dates[target_url])
             return True
 
         except (requests.RequestException, requests.Timeout, ConnectionError) as e:
@@ -191,7 +351,7 @@ class Scraper:
         Returns:
             bool: True if successful, False otherwise.
         """
-        base_url = "https://api.scrapingant.com/v2/general"
+        base_url = SCRAPING_ANT_URL
         params = {
             "url": target_url,
             "x-api-key": SCRAPING_ANT_API_KEY,
@@ -200,15 +360,22 @@ class Scraper:
         }
 
         try:
-            response = ant_session.post(
-                base_url, params=params, json=PAYLOAD, timeout=10
+            response = self._post(
+                ant_session,
+                base_url,
+                ScrapeMetrics.SCRAPINGANT,
+                target_url,
+                params=params,
+                json=PAYLOAD,
+                timeout=10,
             )
             response.raise_for_status()
 
             if response.status_code == 200:
                 data = response.json()
-                self._process_response_data(data)
+                self._process_response_data(data, target_url)
                 self.scrapingant_success_count += 1
+                self.completed_dates.append(self.url_dates[target_url])
                 return True
             else:
                 self.logger.error(
@@ -227,23 +394,145 @@ class Scraper:
             )
             return False
 
-    def _process_response_data(self, data: dict) -> None:
+    def _process_response_data(self, data: dict, target_url: str) -> None:
         """
-        Process response data and add English showings to raw_json_data.
+        Process response data and add records of the English showings to records, unless the page's English showings are unchanged since the last run.
+        The raw response is discarded once the records are created, unless a raw archive was provided.
 
         Args:
             data (dict): Response data containing results.
+            target_url (str): URL the data was scraped from.
         """
+        english_showings = []
         for showing in data["results"]:
             languages = showing.get("movie", {}).get("languages", [])
             if "ENGLISH" in languages:
                 # Showings can be listed as "original", "original_st", or "original_st_sme"
                 showtimes = showing.get("showtimes", {})
-                if any(
-                    showtimes.get(k)
-                    for k in ("original", "original_st", "original_st_sme")
-                ):
-                    self.raw_json_data.append(showing)
+                if any(showtimes.get(k) for k in ORIGINAL_SHOWTIME_KEYS):
+                    english_showings.append(showing)
+
+        show_date = self.url_dates[target_url]
+        self.metrics.record_page(self.cinema_id, len(english_showings))
+        if self.raw_archive is not None:
+            self.raw_archive.write(self.cinema_id, show_date, english_showings)
+        records = self.create_records(self.logger, english_showings)
+
+        if self.fingerprints is not None:
+            content_hash = PageFingerprints.calculate_hash(
+                [asdict(record) for record in records]
+            )
+            unchanged = self.fingerprints.is_unchanged(
+                self.cinema_id, show_date, content_hash
+            )
+            self.page_changes[show_date] = None if unchanged is None else not unchanged
+            if unchanged:
+                self.unchanged_page_count += 1
+                return
+            self.page_hashes[show_date] = content_hash
+
+        self.records.extend(records)
+        if not data["results"]:
+            # An empty page may be an upstream glitch, so the day's stored showings are kept rather than all removed
+            self.logger.debug(
+                f"Page of cinema {self.cinema_id} for {show_date} has no results, removed showings are not checked for it"
+            )
+            return
+        self.parsed_dates.append(show_date)
+
+
+# Retries failed direct URLs through ScrapingAnt on a background thread. Shared by all scrapers in a run.
+class FallbackWorker:
+    def __init__(
+        self,
+        logger: Logger,
+        session: requests.Session,
+        credit_budget: int | None = None,
+        credits_per_request: int = 1,
+    ) -> None:
+        """
+        Initialize a FallbackWorker object and start its worker thread.
+
+        Args:
+            logger (Logger): Logger object.
+            session (requests.Session): Session used for ScrapingAnt requests, shared with the scrapers in the run.
+            credit_budget (int, optional): Maximum ScrapingAnt credits to spend this run. Unlimited if None.
+            credits_per_request (int): ScrapingAnt credits charged per request.
+        """
+        self.logger: Logger = logger
+        self.session: requests.Session = session
+        self.credit_budget: int | None = credit_budget
+        self.credits_per_request: int = credits_per_request
+        self.credits_used: int = 0
+        self.queue: Queue = Queue()
+        self.thread: Thread = Thread(
+            target=self._run, name="scrapingant-fallback", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, scraper: Scraper, target_url: str) -> Event:
+        """
+        Queue a URL to be retried through ScrapingAnt.
+
+        Args:
+            scraper (Scraper): Scraper the URL belongs to, which receives the data and statistics.
+            target_url (str): URL that failed direct scraping.
+
+        Returns:
+            Event: Set once the URL has been handled, whether or not it succeeded.
+        """
+        done = Event()
+        self.queue.put((scraper, target_url, done))
+        return done
+
+    def _has_credit(self) -> bool:
+        if self.credit_budget is None:
+            return True
+        return self.credits_used + self.credits_per_request <= self.credit_budget
+
+    def _run(self) -> None:
+        """Worker loop, drains the queue until close() is called."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            scraper, target_url, done = item
+            try:
+                success = False
+                if self._has_credit():
+                    self.credits_used += self.credits_per_request
+                    success = scraper._scrape_with_scrapingant(
+                        target_url, self.session
+                    )
+                else:
+                    self.logger.warning(
+                        f"ScrapingAnt credit budget of {self.credit_budget} exhausted, skipping {target_url}"
+                    )
+                if not success:
+                    scraper.record_failure(target_url)
+            except Exception as e:
+                scraper.record_failure(target_url)
+                self.logger.error(f"Fallback worker failed for {target_url}: {e}")
+            finally:
+                done.set()
+
+    def close(self) -> None:
+        """Stop the worker thread once all queued URLs have been handled."""
+        self.queue.put(None)
+        self.thread.join()
+
+
+@dataclass
+class CinemaBatch:
+    """A scraped cinema on its way through the parse, persist and enrich stages."""
+
+    cinema: str
+    scraper: Scraper
+    stats: dict
+    # Movies first seen in the cinema's showings, enriched once written
+    new_movies: list[Movie] = field(default_factory=list)
+    # Position in ShowingsManager.new_showings after the cinema's showings
+    showings_end: int = 0
 
 
 # Instantiate to initialize scraping across the specified date range, will scrape the data for all cinemas, process the raw data, and add new data to database. Raw data can also be saved, or imported rather than scraping.
@@ -255,6 +544,18 @@ class ScraperManager:
         end_day: int = 15,
         save_raw_json_data=False,
         local_data_filename: str | None = None,
+        scheduler: ScrapeScheduler | None = None,
+        pipeline_fallback: bool = True,
+        scrapingant_credit_budget: int | None = None,
+        progress_callback: Callable[[str, str, dict | None], None] | None = None,
+        request_budget: int | None = None,
+        pool_size: int = 10,
+        shared_run: bool = False,
+        poll_interval: float = 30.0,
+        metrics: ScrapeMetrics | None = None,
+        metrics_path: str | None = None,
+        enrich_workers: int = 4,
+        stage_queue_size: int = 8,
     ):
         """
         Initialize a ScraperManager object.
@@ -262,16 +563,65 @@ class ScraperManager:
         Args:
             start_day (int): The starting day for scraping. Today is day 0.
             end_day (int): The ending day for scraping.
-            save_raw_json_data (bool, optional): Whether to save raw JSON data. Defaults to False.
+            save_raw_json_data (bool, optional): Whether to stream the raw JSON data of each scraped page to an archive in raw_data/. Defaults to False.
+            local_data_filename (str, optional): Raw data to process instead of scraping. A file name or glob pattern in raw_data/, matching archives written by save_raw_json_data or legacy .json files.
+            scheduler (ScrapeScheduler, optional): Concurrency and politeness limits for the run. Defaults to ScrapeScheduler().
+            pipeline_fallback (bool, optional): Retry failed URLs through ScrapingAnt on a background worker while direct scraping continues. Defaults to True.
+            scrapingant_credit_budget (int, optional): Maximum ScrapingAnt credits the fallback worker may spend. Unlimited if None.
+            progress_callback (Callable, optional): Called with (cinema_id, status, stats) as each cinema is queued, scraped, and committed.
+            request_budget (int, optional): Maximum number of cinema/day pages to scrape. Pages are chosen by HorizonPlanner from how often they change. Every page is scraped if None.
+            pool_size (int, optional): Connections kept open per host by the run's shared HTTP session. Defaults to 10.
+            shared_run (bool, optional): Other workers share the run. This worker takes over expired leases until every item is finished, and only the worker that claims the merge updates ratings. Defaults to False.
+            poll_interval (float, optional): Seconds between checks for expired leases while other workers finish a shared run. Defaults to 30.
+            metrics (ScrapeMetrics, optional): Telemetry for the run, e.g. to be served while the run is in progress. Defaults to ScrapeMetrics().
+            metrics_path (str, optional): File the metrics are written to in Prometheus text format once scraping finishes, e.g. for a node_exporter textfile collector.
+            enrich_workers (int, optional): Threads retrieving TMDB details of new movies in parallel, once the movies are written. Defaults to 4.
+            stage_queue_size (int, optional): Items held between pipeline stages before the previous stage waits. Defaults to 8.
         """
         self.start_day = start_day
         self.end_day = end_day
         self.logger = logger
-        self.all_scraped_json_data = {}
+        self.scheduler = scheduler or ScrapeScheduler()
+        self.pipeline_fallback = pipeline_fallback
+        self.scrapingant_credit_budget = scrapingant_credit_budget
+        self.pool_size = pool_size
+        self.http_client: PooledSession | None = None
+        self.pool_stats: dict | None = None
+        self.shared_run = shared_run
+        self.poll_interval = poll_interval
+        # Cinemas leased by this worker that are still being scraped, whose leases are renewed periodically
+        self.active_leases: set[str] = set()
+        self.leased_cinemas: set[str] = set()
+        self.metrics = metrics or ScrapeMetrics()
+        self.metrics.stage_stats = self.get_pipeline_stats
+        self.metrics_path = metrics_path
+        self.enrich_workers = enrich_workers
+        self.stage_queue_size = stage_queue_size
+        self.stages: dict[str, PipelineStage] = {}
+        # MovieManager and ShowingsManager are shared by the parse and persist stages, locked in that order
+        self._movie_lock = Lock()
+        self._showing_lock = Lock()
+        self.cinemas_queued = 0
+        self.cinemas_scraping = 0
+        self.cinemas_scraped = 0
+        self.scrape_started_at = time.perf_counter()
+        self.fallback: FallbackWorker | None = None
+        self.job_queue: ScrapeJobQueue | None = None
+        self.fingerprints: PageFingerprints | None = None
+        self.horizon: HorizonPlanner | None = None
+        self.plan: dict[str, list[datetime.date]] | None = None
+        self.request_budget = request_budget
+        self.progress_callback = progress_callback
+        self.save_raw_json_data = save_raw_json_data
+        self.raw_archive: RawArchiveWriter | None = None
         self.local_data_filename = local_data_filename
         self.total_direct_success = 0
         self.total_scrapingant_success = 0
         self.total_failures = 0
+        self.total_direct_skipped = 0
+        self.total_unchanged_pages = 0
+        # Error the run stopped on, None if it completed
+        self.error: str | None = None
 
         if self.local_data_filename is not None and save_raw_json_data:
             error_message = "`save_raw_json_data` and `local_data_filename` are mutually exclusive: When instantiating a ScraperManager object, one or both arguments must be false or not provided"
@@ -280,25 +630,43 @@ class ScraperManager:
         logger.debug("Initializing  cinema, movie, and showing managers")
         try:
             self.cinema_man: CinemaManager = CinemaManager(logger)
-            self.show_man: ShowingsManager = ShowingsManager(logger)
+            # Replayed raw data can be from any date, so only a live scrape limits the known showings to its window
+            showings_window_start = (
+                datetime.datetime.combine(
+                    datetime.date.today() + datetime.timedelta(days=start_day),
+                    datetime.time(),
+                )
+                if local_data_filename is None
+                else None
+            )
+            self.show_man: ShowingsManager = ShowingsManager(
+                logger, window_start=showings_window_start
+            )
             self.movie_man: MovieManager = MovieManager(logger)
-            self.search: Search = Search(logger)
+            self.metrics.tmdb_cache_stats = self.movie_man.tmdb_cache.get_stats
+            self.enrichment_queue: EnrichmentQueue = EnrichmentQueue(
+                logger, self.movie_man.enricher
+            )
+            self.breakers: CircuitBreakerManager = CircuitBreakerManager(logger)
 
             logger.debug(
                 "ScraperManager initialized successfully, checking new movie & showing info."
             )
             self.run_scrapers()
+            if self.local_data_filename is None:
+                self._save_circuit_breakers()
             self.movie_man.add_new_movies_to_database()
             self.show_man.add_new_showings_to_database()
             logger.info(self.movie_man)
             logger.info(self.show_man)
-            self.update_ratings()
+            self._merge_run()
+            self._drain_enrichment_queue()
 
             self._log_scraping_stats()
-
-            if save_raw_json_data:
-                self._save_raw_data()
+            self._export_metrics()
+            self.movie_man.enricher.close()
         except Exception as e:
+            self.error = str(e)
             self.logger.error(f"Error running ScraperManager: {e}", exc_info=True)
 
     def run_scrapers(self):
@@ -309,61 +677,437 @@ class ScraperManager:
         # If `local_data_filename` is provided, raw data will be imported and processed. If not provided, new raw data will be scraped and processed.
         try:
             if self.local_data_filename is None:
-                ua = UserAgent()
-
-                for cinema in tqdm(self.cinema_man.cinema_ids, unit="Cinema"):
-                    # Create new session with random user agent for each cinema
-                    with requests.Session() as session:
-                        session.headers.update(
-                            {
-                                "User-Agent": ua.random,
-                                "Accept": "*/*",
-                                "Accept-Language": "en-US,en;q=0.5",
-                                "Accept-Encoding": "gzip, deflate",
-                                "Connection": "keep-alive",
-                                "Referer": f"{REFERER}{cinema}.html",
-                            }
+                self.horizon = HorizonPlanner(self.logger)
+                self.plan = self.horizon.plan(
+                    self.cinema_man.cinema_ids,
+                    self.start_day,
+                    self.end_day,
+                    self.request_budget,
+                )
+                self.job_queue = self._create_job_queue()
+                if self.job_queue is None and self.shared_run:
+                    # Without leases every worker would scrape every cinema
+                    self.error = "Scrape job queue unavailable, unable to share the run with other workers"
+                    self.logger.error(self.error)
+                    return
+                # Fingerprints are kept as long as the horizon's age cap, so pages skipped that long are still compared
+                self.fingerprints = PageFingerprints(
+                    self.logger,
+                    max_age=datetime.timedelta(days=self.horizon.max_age_factor),
+                )
+                # One session for the whole run, so connections to the cinema site and ScrapingAnt are reused across cinemas
+                if self.save_raw_json_data:
+                    self.raw_archive = self._create_raw_archive()
+                self.http_client = PooledSession(
+                    pool_maxsize=max(
+                        self.pool_size, self.scheduler.max_concurrent_cinemas
+                    )
+                )
+                if self.pipeline_fallback:
+                    self.fallback = FallbackWorker(
+                        self.logger,
+                        self.http_client,
+                        credit_budget=self.scrapingant_credit_budget,
+                    )
+                try:
+                    asyncio.run(self._scrape_all_cinemas())
+                finally:
+                    if self.fallback is not None:
+                        self.fallback.close()
+                    # Closing the session clears its connection pools, so statistics are read first
+                    self.pool_stats = self.http_client.get_pool_stats()
+                    self.http_client.close()
+                    if self.raw_archive is not None:
+                        self.raw_archive.close()
+                        self.logger.info(
+                            f"Raw data for {self.raw_archive.page_count} pages saved to {self.raw_archive.path}"
                         )
+            else:
+                self._process_local_data()
+        except Exception as e:
+            self.error = str(e)
+            self.logger.error(f"Error running scrapers: {e}", exc_info=True)
 
-                        scraper = Scraper(
-                            logger=self.logger,
-                            session=session,
-                            cinema_id=cinema,
-                            start_day=self.start_day,
-                            end_day=self.end_day,
+    async def _scrape_all_cinemas(self):
+        """
+        Scrape all cinemas concurrently, up to `scheduler.max_concurrent_cinemas` at a time, and pass each scraped cinema through the parse, persist and enrich stages.
+        """
+        self._start_pipeline()
+        try:
+            if self.job_queue is None:
+                await self._scrape_cinemas(list(self.plan))
+            else:
+                await self._scrape_leased_cinemas()
+        finally:
+            # Later stages finish the cinemas already scraped
+            await asyncio.to_thread(self._close_pipeline)
+        if self.job_queue is not None:
+            await asyncio.to_thread(self._finish_run)
+
+    async def _scrape_leased_cinemas(self):
+        """
+        Scrape the cinemas with unfinished work items in the job queue.
+        With a shared run, keeps taking over cinemas whose leases expired, e.g. because their worker died, until no items are left leased by other workers.
+        """
+        heartbeat = asyncio.create_task(self._renew_leases())
+        try:
+            while True:
+                # Cinemas with unfinished items. Items this worker released are left for the next run, not retried in a loop
+                cinemas = [
+                    cinema
+                    for cinema in await asyncio.to_thread(self.job_queue.pending_cinemas)
+                    if cinema not in self.leased_cinemas
+                ]
+                if cinemas:
+                    await self._scrape_cinemas(cinemas)
+                    if self.shared_run:
+                        continue
+                if not self.shared_run:
+                    break
+                progress = await asyncio.to_thread(self.job_queue.get_progress)
+                if not progress.get(ScrapeJobQueue.LEASED):
+                    break
+                self.logger.info(
+                    f"Waiting for {progress[ScrapeJobQueue.LEASED]} items leased by other workers"
+                )
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            heartbeat.cancel()
+
+    async def _renew_leases(self):
+        """Renew this worker's leases every third of the lease timeout, so cinemas that take a long time to scrape are not taken over by another worker."""
+        interval = self.job_queue.lease_timeout.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.job_queue.renew, list(self.active_leases))
+            except Exception as e:
+                self.logger.warning(f"Unable to renew leases: {e}")
+
+    async def _scrape_cinemas(self, cinemas: list[str]):
+        """
+        Scrape `cinemas` concurrently, up to `scheduler.max_concurrent_cinemas` at a time.
+        Each cinema is handed to the parse stage as soon as its scraper finishes, while the others keep scraping.
+        """
+        ua = UserAgent()
+        cinema_slots = asyncio.Semaphore(self.scheduler.max_concurrent_cinemas)
+
+        async def scrape_cinema(cinema: str) -> tuple[str, Scraper | None, bool]:
+            async with cinema_slots:
+                self.cinemas_queued -= 1
+                self.cinemas_scraping += 1
+                scraper, failed = None, False
+                try:
+                    scraper = await asyncio.to_thread(
+                        self._scrape_cinema, cinema, ua.random
+                    )
+                    if scraper is not None:
+                        # The slot is held until the parse stage accepts the cinema, so scraping slows when stages fall behind
+                        await asyncio.to_thread(
+                            self.stages["parse"].put, (cinema, scraper)
                         )
+                except Exception as e:
+                    # Other cinemas carry on, the cinema's leases are no longer renewed so its items are scraped again once they expire
+                    self.logger.error(
+                        f"Unable to scrape cinema {cinema}: {e}", exc_info=True
+                    )
+                    self.active_leases.discard(cinema)
+                    scraper, failed = None, True
+                finally:
+                    self.cinemas_scraping -= 1
+                return cinema, scraper, failed
+
+        for cinema in cinemas:
+            self._report_progress(cinema, "queued")
+        self.cinemas_queued += len(cinemas)
+
+        tasks = [asyncio.create_task(scrape_cinema(cinema)) for cinema in cinemas]
+        with tqdm(total=len(tasks), unit="Cinema") as progress:
+            for next_scraper in asyncio.as_completed(tasks):
+                cinema, scraper, failed = await next_scraper
+                if scraper is None:
+                    self._report_progress(cinema, "failed" if failed else "skipped")
+                    progress.update()
+                    continue
+
+                self.cinemas_scraped += 1
+                progress.update()
+
+    def _start_pipeline(self):
+        """Start the parse, persist and enrich stages. Scraping is the first stage, run by _scrape_cinemas."""
+        self.scrape_started_at = time.perf_counter()
+        # Movie and showing managers are not thread safe, so parsing and database writes each run on a single worker
+        self.stages = {
+            "parse": PipelineStage(
+                self.logger, "parse", self._parse_cinema, 1, self.stage_queue_size
+            ),
+            "persist": PipelineStage(
+                self.logger, "persist", self._persist_cinema, 1, self.stage_queue_size
+            ),
+            "enrich": PipelineStage(
+                self.logger,
+                "enrich",
+                self._enrich_movie,
+                self.enrich_workers,
+                self.stage_queue_size,
+            ),
+        }
 
-                        # Collect statistics
-                        stats = scraper.get_stats()
-                        self.total_direct_success += stats["direct_success"]
-                        self.total_scrapingant_success += stats["scrapingant_success"]
-                        self.total_failures += stats["total_fail"]
+    def _close_pipeline(self):
+        """Wait for every stage to finish its queued items, in pipeline order."""
+        for stage in self.stages.values():
+            stage.close()
 
-                        data = scraper.return_data()
-                        self.all_scraped_json_data[cinema] = data
-                        self.process_data(cinema, data)
-            else:
-                with open(
-                    f"raw_data/{self.local_data_filename}", "r", encoding="utf8"
-                ) as f:
-                    local_data = json.load(f)
-                for cinema, data in local_data.items():
-                    self.process_data(cinema, data)
+    def _parse_cinema(self, item: tuple[str, Scraper]):
+        """
+        Parse stage: create the movies and showings of a scraped cinema. New movies only hold the scraped fields until they are enriched.
+
+        Args:
+            item (tuple[str, Scraper]): The cinema ID and its finished scraper.
+        """
+        cinema, scraper = item
+        stats = scraper.get_stats()
+        self.total_direct_success += stats["direct_success"]
+        self.total_scrapingant_success += stats["scrapingant_success"]
+        self.total_failures += stats["total_fail"]
+        self.total_direct_skipped += stats["direct_skipped"]
+        self.total_unchanged_pages += stats["unchanged_pages"]
+        self._report_progress(cinema, "processing", stats)
+
+        batch = CinemaBatch(cinema, scraper, stats)
+        with self._movie_lock, self._showing_lock:
+            movies_start = len(self.movie_man.new_movies)
+            self.process_data(cinema, scraper.return_data(), scraper.parsed_dates)
+            batch.new_movies = self.movie_man.new_movies[movies_start:]
+            batch.showings_end = len(self.show_man.new_showings)
+        self.stages["persist"].put(batch)
+
+    def _persist_cinema(self, batch: CinemaBatch):
+        """Persist stage: write the cinema's new movies and showings to the database, then queue the new movies for enrichment."""
+        self._commit_cinema(batch.cinema, batch.scraper, batch.showings_end)
+        self.active_leases.discard(batch.cinema)
+        self._report_progress(batch.cinema, "done", batch.stats)
+        for movie in batch.new_movies:
+            self.stages["enrich"].put(movie)
+
+    def _enrich_movie(self, movie: Movie):
+        """Enrich stage: retrieve a written movie's details from TMDB and update it. Failures are retried later by the enrichment queue."""
+        self.enrichment_queue.enrich(movie)
+
+    def _drain_enrichment_queue(self):
+        """Enrich movies still pending, e.g. from replayed raw data, and retry failed movies that are due. Showings are already written, so this only delays the end of the run."""
+        try:
+            self.enrichment_queue.drain()
         except Exception as e:
-            self.logger.error(f"Error running scrapers: {e}", exc_info=True)
+            self.logger.error(f"Unable to drain enrichment queue: {e}")
+        self.movie_man.enricher.save_cache()
+
+    def get_pipeline_stats(self) -> dict[str, dict]:
+        """
+        Return queue depth and throughput statistics for each pipeline stage.
+
+        Returns:
+            dict[str, dict]: Statistics by stage name. The scrape stage's queue depth is the number of cinemas waiting for a slot.
+        """
+        elapsed = time.perf_counter() - self.scrape_started_at
+        stats = {
+            "scrape": {
+                "workers": self.scheduler.max_concurrent_cinemas,
+                "queue_depth": self.cinemas_queued,
+                "in_progress": self.cinemas_scraping,
+                "processed": self.cinemas_scraped,
+                "throughput": (
+                    round(self.cinemas_scraped / elapsed, 3) if elapsed else 0.0
+                ),
+            }
+        }
+        for name, stage in self.stages.items():
+            stats[name] = stage.get_stats()
+        return stats
+
+    def _report_progress(self, cinema: str, status: str, stats: dict | None = None):
+        """Pass the progress of a cinema to progress_callback, if one was provided."""
+        if self.progress_callback is not None:
+            try:
+                self.progress_callback(cinema, status, stats)
+            except Exception as e:
+                self.logger.warning(f"Progress callback failed: {e}")
+
+    def _create_job_queue(self) -> ScrapeJobQueue | None:
+        """Create or resume the checkpointed work items for this run. If the job queue is unavailable the run continues without checkpoints."""
+        try:
+            return ScrapeJobQueue(
+                self.logger,
+                cinema_ids=self.cinema_man.cinema_ids,
+                start_day=self.start_day,
+                end_day=self.end_day,
+                plan=self.plan,
+            )
+        except Exception as e:
+            self.logger.warning(
+                f"Scrape job queue unavailable, run will not be resumable: {e}"
+            )
+            return None
+
+    def _commit_cinema(
+        self, cinema: str, scraper: Scraper, showings_end: int | None = None
+    ) -> None:
+        """
+        Write the movies and showings found so far to the database, then mark the cinema's work items as finished so a resumed run does not scrape them again.
+
+        Args:
+            cinema (str): The ID of the cinema.
+            scraper (Scraper): The finished scraper for the cinema.
+            showings_end (int, optional): Only showings before this position in new_showings are written, leaving those of cinemas still waiting for their movies. All new showings are written if None.
+        """
+        try:
+            with self._movie_lock:
+                self.movie_man.add_new_movies_to_database()
+            with self._showing_lock:
+                self.show_man.add_new_showings_to_database(
+                    end=showings_end, cinema_id=cinema
+                )
+                dropped_dates = set(self.show_man.dropped_dates.get(cinema, set()))
+            if self.fingerprints is not None:
+                # Pages with showings that were not inserted are processed again next run
+                self.fingerprints.save(
+                    cinema,
+                    {
+                        show_date: content_hash
+                        for show_date, content_hash in scraper.page_hashes.items()
+                        if show_date not in dropped_dates
+                    },
+                )
+            if self.horizon is not None:
+                self.horizon.record(cinema, scraper.page_changes)
+            if self.job_queue is not None:
+                self.job_queue.complete(
+                    cinema, scraper.completed_dates, scraper.failed_dates
+                )
+        except Exception as e:
+            # Work items stay leased, and are picked up again once the lease expires
+            self.logger.error(f"Unable to commit results for cinema {cinema}: {e}")
+
+    def _scrape_cinema(self, cinema: str, user_agent: str) -> Scraper | None:
+        """
+        Scrape a single cinema. Runs in a worker thread.
+
+        Args:
+            cinema (str): The ID of the cinema to scrape.
+            user_agent (str): User agent used for every request to this cinema.
 
-    def process_data(self, cinema, data):
-        for showing in data:
+        Returns:
+            Scraper | None: The finished scraper, holding the raw data and statistics. None if there was nothing left to scrape for the cinema.
+        """
+        dates = self.plan.get(cinema) if self.plan is not None else None
+        if self.job_queue is not None:
+            try:
+                dates = self.job_queue.lease(cinema)
+            except Exception as e:
+                self.logger.error(f"Unable to lease work items for {cinema}: {e}")
+                return None
+            if not dates:
+                # Nothing left to scrape, or another worker holds the lease
+                return None
+            self.active_leases.add(cinema)
+            self.leased_cinemas.add(cinema)
+
+        self._report_progress(cinema, "scraping")
+        # Random user agent for each cinema, sent per request so the shared session's connections are still reused
+        return Scraper(
+            logger=self.logger,
+            session=self.http_client,
+            cinema_id=cinema,
+            start_day=self.start_day,
+            end_day=self.end_day,
+            scheduler=self.scheduler,
+            fallback=self.fallback,
+            breaker=self.breakers.get(cinema),
+            dates=dates,
+            fingerprints=self.fingerprints,
+            raw_archive=self.raw_archive,
+            metrics=self.metrics,
+            headers={
+                "User-Agent": user_agent,
+                "Referer": f"{REFERER}{cinema}.html",
+            },
+        )
+
+    def _process_local_data(self):
+        """Process raw data saved by previous runs instead of scraping. Each archive is committed to the database once processed, so long replays make progress even if interrupted."""
+        paths = find_raw_archives(f"raw_data/{self.local_data_filename}")
+        if not paths:
+            self.logger.warning(f"No raw data found for {self.local_data_filename}")
+        for path in paths:
+            self.logger.info(f"Processing raw data from {path}")
+            for cinema, records in self.replay_raw_data(path):
+                self.process_data(cinema, records)
+            self.movie_man.add_new_movies_to_database()
+            self.show_man.add_new_showings_to_database()
+
+    def replay_raw_data(self, path: str) -> Iterator[tuple[str, list[ShowingRecord]]]:
+        """
+        Yield the showing records of each page in a raw data file, one page at a time.
+
+        Args:
+            path (str): Path of an archive, or of a legacy .json file.
+
+        Returns:
+            Iterator[tuple[str, list[ShowingRecord]]]: The cinema ID and showing records of each page.
+        """
+        if path.endswith(".json"):
+            # Legacy format, a single json object of raw showings keyed by cinema, which has to be loaded whole
+            with open(path, "r", encoding="utf8") as f:
+                local_data = json.load(f)
+            for cinema, showings in local_data.items():
+                yield cinema, Scraper.create_records(self.logger, showings)
+        else:
+            for page in read_raw_archive(path):
+                yield page["cinema_id"], Scraper.create_records(
+                    self.logger, page["showings"]
+                )
+
+    def process_data(
+        self,
+        cinema: str,
+        records: list[ShowingRecord],
+        show_dates: list[datetime.date] | None = None,
+    ):
+        records = list(records)
+        for record in records:
             try:
                 # Process movie
-                self.movie_man.process_movie(showing)
-                # Process showing
-                self.show_man.process_showing(showing, cinema)
+                self.movie_man.process_movie(record)
             except Exception as e:
                 self.logger.error(f"Unable to process data: {e}")
+        # Showings of the whole cinema are validated and deduplicated as one batch
+        try:
+            # Replayed pages may be partial, so only scraped pages are diffed for removed showings
+            self.show_man.process_showings(records, cinema, show_dates)
+        except Exception as e:
+            self.logger.error(f"Unable to process showings: {e}")
 
     def _log_scraping_stats(self):
         """Log statistics about scraping success and failures."""
+        tmdb_cache_stats = self.movie_man.tmdb_cache.get_stats()
+        if tmdb_cache_stats["hit_ratio"] is not None:
+            self.logger.info(
+                f"TMDB cache: {tmdb_cache_stats['hits']} hits, {tmdb_cache_stats['misses']} misses "
+                f"(hit ratio {tmdb_cache_stats['hit_ratio']:.1%})"
+            )
+        tmdb_index_stats = self.movie_man.tmdb_index.get_stats()
+        if tmdb_index_stats["hits"]:
+            self.logger.info(
+                f"TMDB id index: {tmdb_index_stats['hits']} movies resolved without searching, "
+                f"{tmdb_index_stats['misses']} searched"
+            )
+        enricher_stats = self.movie_man.enricher.get_stats()
+        if enricher_stats["enriched"] or enricher_stats["failed"]:
+            self.logger.info(
+                f"TMDB enrichment: {enricher_stats['enriched']} movies enriched, {enricher_stats['failed']} failed, "
+                f"{enricher_stats['requests']} requests sent"
+            )
+
         total_requests = (
             self.total_direct_success
             + self.total_scrapingant_success
@@ -384,119 +1128,106 @@ class ScraperManager:
             f"ScrapingAnt Success: {self.total_scrapingant_success} ({scrapingant_pct:.1f}%) | "
             f"Total Failures: {self.total_failures} ({fail_pct:.1f}%)"
         )
+        if self.job_queue is not None:
+            self.logger.info(self.job_queue)
+        if self.total_unchanged_pages:
+            self.logger.info(
+                f"Pages unchanged since last run, processing skipped: {self.total_unchanged_pages}"
+            )
+        if self.total_direct_skipped:
+            self.logger.info(
+                f"Direct requests skipped by open circuit breakers: {self.total_direct_skipped}"
+            )
+        if self.pool_stats is not None and self.pool_stats["requests"]:
+            self.logger.info(
+                f"HTTP connections opened: {self.pool_stats['connections_opened']} for {self.pool_stats['requests']} requests "
+                f"(pool hit rate {self.pool_stats['pool_hit_rate']:.1%})"
+            )
+        for name, stage in self.get_pipeline_stats().items():
+            if stage["processed"]:
+                self.logger.info(
+                    f"Pipeline stage {name}: {stage['processed']} items with {stage['workers']} workers "
+                    f"({stage['throughput']:g}/s)"
+                    + (
+                        f", max queue depth {stage['max_queue_depth']}, previous stage blocked {stage['blocked_seconds']:g}s"
+                        if "max_queue_depth" in stage
+                        else ""
+                    )
+                )
+        if self.fallback is not None:
+            self.logger.info(
+                f"ScrapingAnt credits used: {self.fallback.credits_used}"
+                + (
+                    f" / {self.fallback.credit_budget}"
+                    if self.fallback.credit_budget is not None
+                    else ""
+                )
+            )
 
-    @connect_to_database
-    def update_ratings(self, db, cursor) -> None:
-        """Update ratings in database for upcoming movies"""
+    def _export_metrics(self):
+        """Log the run report, which the JSON log handler records as a structured row, and write the metrics in Prometheus text format if metrics_path was provided."""
+        self.metrics.finish()
+        self.logger.info(
+            "Scrape run report", extra={"run_report": self.metrics.to_report()}
+        )
+        if self.metrics_path is not None:
+            try:
+                # Written to a temporary file first, so a collector never reads a partial file
+                tmp_path = f"{self.metrics_path}.tmp"
+                with open(tmp_path, "w", encoding="utf8") as f:
+                    f.write(self.metrics.to_prometheus())
+                os.replace(tmp_path, self.metrics_path)
+            except Exception as e:
+                self.logger.error(f"Error writing scraper metrics: {e}")
 
-        ratings_values_list = self._get_movies_for_ratings_update()
-        if not ratings_values_list:
-            self.logger.info("No movie ratings to update")
-            return
+    def _save_circuit_breakers(self):
+        """Persist direct scraping circuit breakers so the next run can route blocked cinemas straight to ScrapingAnt."""
         try:
-            columns = ["rating_imdb", "rating_rt", "rating_meta"]
-            TABLE_NAME = "movies"
-
-            set_clause = ", ".join(f"{col} = %({col})s" for col in columns)
-            update_query = f"""
-                UPDATE {TABLE_NAME}
-                SET {set_clause}
-                WHERE movie_id = %(movie_id)s;
-            """
-
-            cursor.executemany(update_query, ratings_values_list)
-            db.commit()
-
-            self.logger.info(f"Ratings updated for {len(ratings_values_list)} movies")
+            self.breakers.save()
+            self.logger.info(self.breakers)
         except Exception as e:
-            self.logger.error(f"Error updating ratings: {e}", exc_info=True)
+            self.logger.error(f"Error saving circuit breakers: {e}")
 
-    def _get_movies_for_ratings_update(self):
+    def _finish_run(self):
+        """Mark the run as finished once every cinema was scraped and committed, so an interrupted run is the only kind resumed."""
         try:
-            # Get a list of upcoming movies so we know which ones to update
-            upcoming_movies: dict = self.search.get_movies()
-            # Filter the results to get just the details we need
-            IMDB_IDS = [
-                {
-                    "movie_id": upcoming_movies.get(movie, {}).get("movie_id"),
-                    "imdb_id": upcoming_movies.get(movie, {})
-                    .get("imdb_url", "")
-                    .split("/")[-1],
-                }
-                for movie in upcoming_movies
-                if upcoming_movies.get(movie, {}).get("imdb_url", "")
-            ]
+            self.job_queue.finish()
         except Exception as e:
-            self.logger.error(f"Unable to get movie_ids for ratings update: {e}")
+            self.logger.error(f"Unable to mark scraper run as finished: {e}")
 
-        ratings_values_list = []
+    def _merge_run(self):
+        """Run the steps that should happen once per run rather than once per worker. With a shared run, only the worker that claims the merge once every item is finished runs them."""
+        if self.shared_run and self.job_queue is not None:
+            try:
+                claimed = self.job_queue.claim_merge()
+            except Exception as e:
+                self.logger.error(f"Unable to claim merge of scraper run: {e}")
+                return
+            if not claimed:
+                self.logger.info(
+                    f"Scraper run {self.job_queue.run_id} is unfinished or merged by another worker, skipping merge"
+                )
+                return
+            self.logger.info(f"Merging scraper run {self.job_queue.run_id}")
+        self.update_ratings()
+
+    def update_ratings(self) -> None:
+        """Refresh OMDb ratings of upcoming movies that are new or stale, within the daily OMDb quota."""
         try:
-            with requests.Session() as session:
-                for movie in IMDB_IDS:
-                    try:
-                        params = {
-                            "apikey": OMDB_API_KEY,
-                            "i": movie["imdb_id"],
-                            "plot": "short",
-                        }
-
-                        response = session.get(
-                            url=OMDB_API_URL, params=params, timeout=10
-                        )
-                        response.raise_for_status()
-
-                        ratings = response.json().get("Ratings", {})
-
-                        rating_imdb, rating_rt, rating_meta = None, None, None
-                        for rating in ratings:
-                            match rating["Source"]:
-                                case "Internet Movie Database":
-                                    if isinstance(rating["Value"], str):
-                                        rating_imdb = int(
-                                            float(rating["Value"].split("/")[0]) * 10
-                                        )
-                                case "Rotten Tomatoes":
-                                    if isinstance(rating["Value"], str):
-                                        rating_rt = int(
-                                            rating["Value"].replace("%", "")
-                                        )
-                                case "Metacritic":
-                                    if isinstance(rating["Value"], str):
-                                        rating_meta = int(rating["Value"].split("/")[0])
-
-                        ratings_values_list.append(
-                            {
-                                "movie_id": movie["movie_id"],
-                                "rating_imdb": rating_imdb,
-                                "rating_rt": rating_rt,
-                                "rating_meta": rating_meta,
-                            }
-                        )
-                    except requests.RequestException as e:
-                        self.logger.error(
-                            f"Failed to fetch ratings for {movie['imdb_id']}: {e}"
-                        )
-                        continue
+            RatingsRefresher(self.logger).refresh()
         except Exception as e:
-            self.logger.error(
-                f"Error fetching movies for ratings update: {e}", exc_info=True
-            )
-            return []
-
-        return ratings_values_list
+            self.logger.error(f"Error updating ratings: {e}", exc_info=True)
 
-    def _save_raw_data(self):
-        """Save raw JSON data to a file."""
+    def _create_raw_archive(self) -> RawArchiveWriter | None:
+        """Open an archive to stream raw data to for this run. If it cannot be created the run continues without saving raw data."""
         try:
-            current_time = datetime.datetime.now()
-            formatted_time = current_time.strftime("%Y-%m-%d_%H-%M-%S")
-            file_name = f"raw_data_{formatted_time}.json"
+            formatted_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            file_name = f"raw_data_{formatted_time}{ARCHIVE_EXTENSION}"
             self.logger.info(f"Saving raw scraped json data to {file_name}")
-
-            with open(f"raw_data/{file_name}", "w", encoding="utf8") as f:
-                json.dump(self.all_scraped_json_data, f, ensure_ascii=False)
+            return RawArchiveWriter(f"raw_data/{file_name}")
         except Exception as e:
-            self.logger.error(f"Error saving raw json data: {e}")
+            self.logger.error(f"Error creating raw data archive: {e}")
+            return None
 
 
 class ScraperManagerInitializationError(Exception):
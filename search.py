@@ -1,10 +1,19 @@
 import time
+import datetime
 from threading import Lock
 
 from logging import Logger
 from creds import DATA_REFRESH_AGE
 
 from db_utilities import connect_to_database, DatabaseConnectionError
+from showing import TABLE_NAME, CHANGES_TABLE_NAME, DELETED
+
+SHOWING_COLUMNS = "showtimes.showing_key, showtimes.movie_id, start_time, name AS cinema_name, town AS cinema_town, showtimes.cinema_id"
+MOVIE_COLUMNS = "movie_id, original_title, runtime, synopsis, cast, directors, genres, release_date, french_release_date, rating_imdb, rating_rt, rating_meta, imdb_url, poster_hi_res, poster_lo_res"
+# Every showing is reloaded at least this often, in seconds, even if changes could be applied
+FULL_REFRESH_AGE = 3600
+# Above this many showtime changes since the last refresh, reloading every showing is cheaper than applying them
+MAX_APPLIED_CHANGES = 5000
 
 
 class Search:
@@ -13,12 +22,19 @@ class Search:
 
     This class implements a thread-safe caching mechanism that reduces database load
     by storing movie and showing data in memory and refreshing it only when necessary.
+    Stale data is refreshed by applying the showings inserted and deleted since the
+    last refresh, read from the showtime change log, rather than reloading every showing.
 
     Attributes:
         logger (Logger): Logger instance for recording operations and errors.
         data (dict): Cached data containing movies and showings.
         time_at_data_refresh (float): Timestamp of the last data refresh.
         max_data_age (int): Maximum age of cached data in seconds before refresh.
+        showing_rows (dict): Upcoming showings by showing_key, with their cinema.
+        movie_rows (dict): Details of the movies of upcoming showings by movie_id.
+        last_change_id (int): Last showtime change applied to showing_rows.
+        data_date (datetime.date | None): Day showing_rows were fully loaded on, None if never.
+        time_at_full_refresh (float): Timestamp of the last full reload of showing_rows.
         _refresh_lock (Lock): Thread lock to prevent concurrent database refreshes.
     """
 
@@ -36,6 +52,11 @@ class Search:
         self.data: dict = {}
         self.time_at_data_refresh: float = 0.0
         self.max_data_age: int = DATA_REFRESH_AGE
+        self.showing_rows: dict[int, dict] = {}
+        self.movie_rows: dict[str, dict] = {}
+        self.last_change_id: int = 0
+        self.data_date: datetime.date | None = None
+        self.time_at_full_refresh: float = 0.0
         self._refresh_lock: Lock = Lock()
         try:
             self.data = self._refresh_data()
@@ -69,7 +90,7 @@ class Search:
                     or force_refresh
                     or current_data_age > self.max_data_age
                 ):
-                    self.data = self._refresh_data()
+                    self.data = self._refresh_data(incremental=not force_refresh)
                     data_source = "database"
 
         self.logger.info(
@@ -105,7 +126,7 @@ class Search:
                     or force_refresh
                     or current_data_age > self.max_data_age
                 ):
-                    self.data = self._refresh_data()
+                    self.data = self._refresh_data(incremental=not force_refresh)
                     data_source = "database"
 
         self.logger.info(
@@ -114,17 +135,21 @@ class Search:
         return self.data.get("showings", [])
 
     @connect_to_database
-    def _refresh_data(self, db, cursor) -> dict:
+    def _refresh_data(self, db, cursor, incremental: bool = False) -> dict:
         """
         Fetch fresh data from the database and update the cache.
 
         This method is decorated with @connect_to_database which handles the database
-        connection. It queries upcoming showtimes and related movie information,
-        formats the data, and updates the cache timestamp.
+        connection. It brings the upcoming showtimes up to date, either by applying the
+        changes since the last refresh or by reloading them all, reloads the details of
+        their movies, formats the data, and updates the cache timestamp.
 
         Args:
             db: Database connection object (provided by decorator).
             cursor: Database cursor object (provided by decorator).
+            incremental (bool, optional): Apply showtime changes where possible. Every
+                showing is reloaded on a new day, after FULL_REFRESH_AGE, or if the
+                changes cannot be applied. Defaults to False.
 
         Returns:
             dict: Refreshed data dictionary with 'movies' and 'showings' keys.
@@ -133,30 +158,123 @@ class Search:
 
         try:
             cursor = db.cursor(dictionary=True)
-            columns_required = "movies.movie_id AS movie_id, start_time, original_title, runtime, synopsis, cast, genres, release_date, rating_imdb, rating_rt, rating_meta, imdb_url, poster_hi_res, poster_lo_res, name AS cinema_name, town AS cinema_town, showtimes.cinema_id"
-            search_query = f"SELECT {columns_required} FROM showtimes LEFT JOIN movies ON showtimes.movie_id = movies.movie_id LEFT JOIN cinemas ON showtimes.cinema_id = cinemas.cinema_id WHERE start_time > DATE(NOW()) ORDER BY start_time ASC"
-
-            cursor.execute(search_query)
-
-            results = cursor.fetchall()
-            if results:
-                for result in results:
-                    d_t = result["start_time"]
-                    result["start_time"] = {
-                        "time": d_t.strftime("%#H:%M"),
-                        "date": f"{d_t.strftime('%#d')} {d_t.strftime('%B')}",
-                        "year": d_t.strftime("%Y"),
-                    }
+            refresh_type = "full"
+            if (
+                incremental
+                and self.data_date is not None
+                and time.time() - self.time_at_full_refresh < FULL_REFRESH_AGE
+            ):
+                try:
+                    applied = self._apply_changes(cursor)
+                except Exception as e:
+                    self.logger.warning(f"Unable to apply showtime changes: {e}")
+                    applied = None
+                if applied is not None:
+                    refresh_type = f"incremental, {applied} changes applied"
+            if refresh_type == "full":
+                self._load_showings(cursor)
+
+            cursor.execute(
+                f"SELECT {MOVIE_COLUMNS} FROM movies WHERE movie_id IN (SELECT movie_id FROM {TABLE_NAME} WHERE start_time > DATE(NOW()));"
+            )
+            self.movie_rows = {movie["movie_id"]: movie for movie in cursor.fetchall()}
+
+            results = [
+                {**self.movie_rows.get(showing["movie_id"], {}), **showing}
+                for showing in sorted(
+                    self.showing_rows.values(), key=lambda showing: showing["start"]
+                )
+            ]
             data: dict = self._process_data_from_db(results)
             self.logger.info(
-                f"Data refreshed at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}"
+                f"Data refreshed ({refresh_type}) at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}"
             )
             self.time_at_data_refresh = time.time()
             return data
         except Exception as e:
+            self.data_date = None
             self.logger.error(f"Search.refresh_data() failed: {e}", exc_info=True)
             return {"movies": {}, "showings": []}
 
+    def _load_showings(self, cursor) -> None:
+        """Reload every upcoming showing, and the position in the showtime change log they are up to date with."""
+        # Read first, so changes committed while loading are applied again by the next refresh, which is harmless
+        cursor.execute(
+            f"SELECT COALESCE(MAX(change_id), 0) AS last_change_id, CURDATE() AS today FROM {CHANGES_TABLE_NAME};"
+        )
+        log_position = cursor.fetchall()[0]
+        cursor.execute(
+            f"SELECT {SHOWING_COLUMNS} FROM {TABLE_NAME} LEFT JOIN cinemas ON showtimes.cinema_id = cinemas.cinema_id WHERE start_time > DATE(NOW());"
+        )
+        self.showing_rows = {
+            showing["showing_key"]: self._format_showing(showing)
+            for showing in cursor.fetchall()
+        }
+        self.last_change_id = log_position["last_change_id"]
+        self.data_date = log_position["today"]
+        self.time_at_full_refresh = time.time()
+
+    def _apply_changes(self, cursor) -> int | None:
+        """
+        Apply the showings inserted and deleted since the last refresh to showing_rows.
+
+        Args:
+            cursor: Dictionary cursor of the refresh's connection.
+
+        Returns:
+            int | None: Number of changes applied. None if every showing should be
+                reloaded instead, on a new day or when there are too many changes.
+        """
+        cursor.execute(
+            f"SELECT COALESCE(MAX(change_id), 0) AS last_change_id, COUNT(*) AS changes, CURDATE() AS today FROM {CHANGES_TABLE_NAME} WHERE change_id > %s;",
+            (self.last_change_id,),
+        )
+        log_position = cursor.fetchall()[0]
+        # Showings of the previous day leave the data at midnight
+        if log_position["today"] != self.data_date:
+            return None
+        if log_position["changes"] > MAX_APPLIED_CHANGES:
+            return None
+        if not log_position["changes"]:
+            return 0
+
+        cursor.execute(
+            f"SELECT showing_key, change_type FROM {CHANGES_TABLE_NAME} WHERE change_id > %s AND change_id <= %s ORDER BY change_id;",
+            (self.last_change_id, log_position["last_change_id"]),
+        )
+        changes = cursor.fetchall()
+        inserted_keys = set()
+        for change in changes:
+            if change["change_type"] == DELETED:
+                self.showing_rows.pop(change["showing_key"], None)
+                inserted_keys.discard(change["showing_key"])
+            else:
+                inserted_keys.add(change["showing_key"])
+        if inserted_keys:
+            placeholders = ", ".join(["%s"] * len(inserted_keys))
+            cursor.execute(
+                f"SELECT {SHOWING_COLUMNS} FROM {TABLE_NAME} LEFT JOIN cinemas ON showtimes.cinema_id = cinemas.cinema_id WHERE start_time > DATE(NOW()) AND showtimes.showing_key IN ({placeholders});",
+                tuple(inserted_keys),
+            )
+            for showing in cursor.fetchall():
+                self.showing_rows[showing["showing_key"]] = self._format_showing(
+                    showing
+                )
+        self.last_change_id = log_position["last_change_id"]
+        return len(changes)
+
+    @staticmethod
+    def _format_showing(showing: dict) -> dict:
+        """Format a showing's start_time for the API, keeping the datetime in 'start' to sort by."""
+        d_t = showing["start_time"]
+        showing["start"] = d_t
+        showing["start_time"] = {
+            "time": d_t.strftime("%#H:%M"),
+            "date": f"{d_t.strftime('%#d')} {d_t.strftime('%B')}",
+            "year": d_t.strftime("%Y"),
+        }
+        return showing
+
     @staticmethod
     def date_with_suffix(n: str) -> str:
         """
@@ -202,8 +320,10 @@ class Search:
                         "runtime": showing.get("runtime"),
                         "synopsis": showing.get("synopsis"),
                         "cast": showing.get("cast"),
+                        "directors": showing.get("directors"),
                         "genres": showing.get("genres"),
                         "release_date": showing.get("release_date"),
+                        "french_release_date": showing.get("french_release_date"),
                         "rating_imdb": showing.get("rating_imdb") / 10
                         if showing.get("rating_imdb")
                         else None,
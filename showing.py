@@ -1,19 +1,39 @@
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+import re
 import hashlib
 from pydantic import ValidationError
 from logging import Logger
 
 from db_utilities import connect_to_database
 from models.showing_model import ShowingModel
+from models.showing_record import ShowingRecord
 
 TABLE_NAME = "showtimes"
+CHANGES_TABLE_NAME = "showtime_changes"
+# Values of showtime_changes.change_type
+INSERTED = "insert"
+DELETED = "delete"
+# Changes are kept long enough for any Search cache to catch up, as it is fully reloaded at least daily
+CHANGES_RETENTION_DAYS = 7
+# Most showings removed from one cinema in a run, so a broken page cannot wipe a cinema's listings
+MAX_REMOVED_SHOWINGS = 50
+# Late showings are on the previous day's page, so a page covers this time until the same time next day
+CINEMA_DAY_START = time(6)
+
+# Precompiled ShowingModel constraints, to validate a batch of showings without a model each
+CINEMA_ID_PATTERN = re.compile(r"^[A-Z]\d{4}$")
+MOVIE_ID_PATTERN = re.compile(r"^.{12,191}$", re.DOTALL)
+START_TIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$")
 
 
 class Showing:
+    # Many thousands are held per run, so no per-instance __dict__
+    __slots__ = ("movie_id", "cinema_id", "start_time", "showing_key")
+
     @staticmethod
     def get_columns() -> tuple[str]:
         """Returns a tuple of the database column names to be written to"""
-        return ("movie_id", "cinema_id", "start_time", "hash_id")
+        return ("movie_id", "cinema_id", "start_time", "showing_key")
 
     def __init__(
         self,
@@ -30,7 +50,6 @@ class Showing:
             cinema_id (str): The ID of the cinema.
             start_time (datetime): The start time of the showing.
         """
-        self.logger = logger
         try:
             data = {
                 "movie_id": movie_id,
@@ -50,15 +69,27 @@ class Showing:
         self.movie_id = showing_model.movie_id
         self.cinema_id = showing_model.cinema_id
         self.start_time = showing_model.start_time
-        self.hash_id = self.calculate_hash(
+        self.showing_key = self.calculate_key(
             self.movie_id, self.cinema_id, self.start_time
         )
 
-    # Hash function to create a single data point for each showing that can be compared with newly scraped showings, to identify showings not yet in the database. @staticmethod used as it does not require 'self' to be passed.
+    @classmethod
+    def from_validated(
+        cls, movie_id: str, cinema_id: str, start_time: datetime, showing_key: int
+    ) -> "Showing":
+        """Create a Showing from values already validated and keyed by ShowingsManager.process_showings, skipping ShowingModel."""
+        showing = cls.__new__(cls)
+        showing.movie_id = movie_id
+        showing.cinema_id = cinema_id
+        showing.start_time = start_time
+        showing.showing_key = showing_key
+        return showing
+
+    # Key function to create a single data point for each showing that can be compared with newly scraped showings, to identify showings not yet in the database. @staticmethod used as it does not require 'self' to be passed.
     @staticmethod
-    def calculate_hash(movie_id: str, cinema_id: str, start_time: datetime) -> str:
+    def calculate_key(movie_id: str, cinema_id: str, start_time: datetime) -> int:
         """
-        Calculate the SHA-256 hash of the showing data.
+        Calculate the 63-bit fingerprint of the showing data.
 
         Args:
             movie_id (str): The ID of the movie.
@@ -66,20 +97,38 @@ class Showing:
             start_time (datetime): The start time of the showing.
 
         Returns:
-            str: The calculated hash value.
+            int: The calculated key.
         """
         data = f"{movie_id}{cinema_id}{start_time}"
-        hash_value = hashlib.sha256(data.encode()).hexdigest()
+        return Showing.key_from_digest(hashlib.sha256(data.encode()).digest())
+
+    @staticmethod
+    def key_from_digest(digest: bytes) -> int:
+        """
+        Return the key of a showing, the first 64 bits of the SHA-256 digest of its data shifted to 63. Keys are stored as BIGINT UNSIGNED, and stay valid signed 64-bit integers, e.g. in SQLite.
+
+        Args:
+            digest (bytes): The SHA-256 digest.
 
-        return hash_value
+        Returns:
+            int: The key.
+        """
+        return int.from_bytes(digest[:8], "big") >> 1
+
+    @staticmethod
+    def cinema_day(start_time: datetime) -> date:
+        """Return the day whose page lists a showing, late showings before CINEMA_DAY_START belonging to the previous day."""
+        if start_time.time() < CINEMA_DAY_START:
+            return start_time.date() - timedelta(days=1)
+        return start_time.date()
 
     def database_format(self):
         """Return object in a format to be inserted into database"""
-        return {attr: self.__dict__.get(attr) for attr in self.get_columns()}
+        return {attr: getattr(self, attr) for attr in self.get_columns()}
 
     def __str__(self) -> str:
         """Return a string representation of the Showing object."""
-        return f"\nMovie ID: {self.movie_id} \nCinema ID: {self.cinema_id} \nStart Time: {self.start_time} \nHash ID: {self.hash_id}"
+        return f"\nMovie ID: {self.movie_id} \nCinema ID: {self.cinema_id} \nStart Time: {self.start_time} \nShowing key: {self.showing_key}"
 
     def __repr__(self) -> str:
         """Return a string representation of the Showing object for debugging."""
@@ -87,13 +136,28 @@ class Showing:
 
 
 class ShowingsManager:
-    def __init__(self, logger: Logger) -> None:
-        """Initialize a ShowingsManager object."""
+    def __init__(self, logger: Logger, window_start: datetime | None = None) -> None:
+        """Initialize a ShowingsManager object.
+
+        Args:
+            logger (Logger): Logger object.
+            window_start (datetime, optional): Only keys of showings starting from then are loaded. All showings are loaded if None, e.g. when replaying past raw data."""
         self.logger = logger
         self.new_showings = []
+        # Number of new_showings already written, so results can be committed incrementally during a run
+        self.saved_showing_count = 0
+        # Scraped days and showing keys of each cinema, compared with the stored showings when written
+        self.pending_diffs: dict[str, tuple[set[date], set[int]]] = {}
+        # Cinemas whose pages listed showings outside the days they were scraped for, which are never diffed this run
+        self.undiffed_cinemas: set[str] = set()
+        self.deleted_showing_count = 0
+        # Showings removed from each cinema this run, limited to MAX_REMOVED_SHOWINGS
+        self.removed_counts: dict[str, int] = {}
+        # Days of each cinema with showings the database did not insert, e.g. for a movie that failed to be written, so their pages are processed again
+        self.dropped_dates: dict[str, set[date]] = {}
 
         try:
-            current_showings = self.retrieve_showings()
+            current_showings = self.retrieve_showings(window_start=window_start)
             self.current_showings = set(current_showings)
         except Exception as e:
             self.logger.error("Unable to retrieve showings: %s", e, exc_info=True)
@@ -101,76 +165,151 @@ class ShowingsManager:
 
     @staticmethod
     @connect_to_database
-    def retrieve_showings(db, cursor) -> list[tuple[str]]:
+    def retrieve_showings(db, cursor, window_start: datetime | None = None) -> list[int]:
         """
-        Retrieve hash_id values for all showings in the database.
+        Retrieve showing_key values for showings in the database, using the start_time index.
+
+        Args:
+            window_start (datetime, optional): Only retrieve showings starting from then. All showings if None.
 
         Returns:
-            list: List of hash_id values.
+            list: List of showing_key values.
         """
-        query = f"SELECT hash_id FROM {TABLE_NAME};"
-        cursor.execute(query)
+        if window_start is None:
+            query = f"SELECT showing_key FROM {TABLE_NAME};"
+            cursor.execute(query)
+        else:
+            query = f"SELECT showing_key FROM {TABLE_NAME} WHERE start_time >= %s;"
+            cursor.execute(query, (window_start,))
         results = cursor.fetchall()
 
         # results has a list of tuples, the line below extracts the string from each tuple.
         return [result[0] for result in results]
 
-    def showing_already_in_database(self, hash_id: str) -> bool:
+    def showing_already_in_database(self, showing_key: int) -> bool:
         """
         Check if a showing is already in the database.
 
         Args:
-            hash_id (str): The hash ID of the showing.
+            showing_key (int): The key of the showing.
 
         Returns:
             bool: True if the showing is in the database, False otherwise.
         """
-        return hash_id in self.current_showings
+        return showing_key in self.current_showings
 
-    def process_showing(self, item: dict, cinema_id: str) -> None:
-        """Create Showing object(s) for each movie & showing object in scraped json, check if showing is already in database, and if not add to new_showings list for batch addition.
+    def process_showing(self, record: ShowingRecord, cinema_id: str) -> None:
+        """Create Showing object(s) for each start time in a scraped showing record, check if showing is already in database, and if not add to new_showings list for batch addition.
 
         Args:
-            item (dict): The showing data.
+            record (ShowingRecord): The scraped movie & showings.
             cinema_id (str): The ID of the cinema."""
-        showings = (
-            item["showtimes"].get("original", [])
-            + item["showtimes"].get("original_st", [])
-            + item["showtimes"].get("original_st_sme", [])
-        )
+        self.process_showings([record], cinema_id)
 
-        if showings:
-            for showing in showings:
-                try:
-                    # Identify values for new showing
-                    movie_id = item["movie"]["id"]
-                    date_str = showing["startsAt"]
-                    start_time = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S")
-                    # Create new Showing object, to create hash_id for comparison with current showings
-                    new_showing = Showing(self.logger, movie_id, cinema_id, start_time)
-                    # Check if new showing is already in database by comparing hash_id, if not add to list to new showings to be added to database
-                    if not self.showing_already_in_database(new_showing.hash_id):
-                        self.add_new_showing(new_showing)
-                except Exception as e:
+    def process_showings(
+        self,
+        records: list[ShowingRecord],
+        cinema_id: str,
+        show_dates: list[date] | None = None,
+    ) -> None:
+        """Validate the start times of all scraped showing records of a cinema at once, and add those not already in the database to new_showings.
+
+        Args:
+            records (list[ShowingRecord]): The scraped movies & showings of the cinema.
+            cinema_id (str): The ID of the cinema.
+            show_dates (list[date], optional): Days whose pages were fully scraped into `records`, whose stored showings that were not scraped are removed. Nothing is removed if None."""
+        if not CINEMA_ID_PATTERN.match(cinema_id):
+            self.logger.error(
+                f"Showings could not be processed: invalid cinema_id {cinema_id!r}"
+            )
+            return
+
+        scraped_keys = None
+        outside_show_dates = 0
+        if show_dates and cinema_id not in self.undiffed_cinemas:
+            diff_dates, scraped_keys = self.pending_diffs.setdefault(
+                cinema_id, (set(), set())
+            )
+            diff_dates.update(show_dates)
+
+        for record in records:
+            if not MOVIE_ID_PATTERN.match(record.movie_id):
+                self.logger.error(
+                    f"Showing could not be processed: invalid movie_id {record.movie_id!r}"
+                )
+                continue
+            # The hash input starts with movie_id and cinema_id, so their digest state is copied per start time
+            prefix_hash = hashlib.sha256(f"{record.movie_id}{cinema_id}".encode())
+            for date_str in record.start_times:
+                if not START_TIME_PATTERN.match(date_str):
                     self.logger.error(
-                        f"Showing could not be processed: {e}", exc_info=True
+                        f"Showing could not be processed: invalid start time {date_str!r}"
                     )
+                    continue
+                try:
+                    start_time = datetime.fromisoformat(date_str)
+                except ValueError as e:
+                    self.logger.error(f"Showing could not be processed: {e}")
+                    continue
+                showing_hash = prefix_hash.copy()
+                showing_hash.update(str(start_time).encode())
+                showing_key = Showing.key_from_digest(showing_hash.digest())
+                if scraped_keys is not None:
+                    scraped_keys.add(showing_key)
+                    if Showing.cinema_day(start_time) not in diff_dates:
+                        outside_show_dates += 1
+                # Check if new showing is already in database by comparing showing_key, if not add to list to new showings to be added to database
+                if not self.showing_already_in_database(showing_key):
+                    self.add_new_showing(
+                        Showing.from_validated(
+                            record.movie_id, cinema_id, start_time, showing_key
+                        )
+                    )
+
+        # A showing outside the scraped days means pages do not cover the days assumed, so nothing is removed
+        if outside_show_dates:
+            self.logger.warning(
+                f"{outside_show_dates} showings of cinema {cinema_id} are outside the days scraped, removed showings are not checked for it this run"
+            )
+            self.pending_diffs.pop(cinema_id, None)
+            self.undiffed_cinemas.add(cinema_id)
 
     def add_new_showing(self, new_showing: Showing) -> None:
-        """Add new showing to new_showings list to be added to database, and add hash_id to set.
+        """Add new showing to new_showings list to be added to database, and add showing_key to set.
 
         Args:
         new_showing (Showing): The new showing to add."""
         self.new_showings.append(new_showing)
-        self.current_showings.add(new_showing.hash_id)
+        self.current_showings.add(new_showing.showing_key)
 
     @connect_to_database
-    def add_new_showings_to_database(self, db=None, cursor=None) -> None:
-        if self.new_showings:
-            """Run this to add all new showings stored in self.new_showings to database."""
+    def add_new_showings_to_database(
+        self,
+        db=None,
+        cursor=None,
+        end: int | None = None,
+        cinema_id: str | None = None,
+    ) -> None:
+        """Run this to add new showings stored in self.new_showings, that have not yet been written, to database, and remove stored showings no longer listed, in one transaction.
+
+        Args:
+            end (int, optional): Only write showings before this position in new_showings. All unsaved showings are written if None.
+            cinema_id (str, optional): Only delete showings of this cinema, e.g. the cinema being committed while others are still being parsed. Showings of every cinema processed so far are compared if None."""
+        unsaved_showings = self.new_showings[self.saved_showing_count : end]
+        if cinema_id is None:
+            diffs, self.pending_diffs = self.pending_diffs, {}
+        else:
+            diff = self.pending_diffs.pop(cinema_id, None)
+            diffs = {cinema_id: diff} if diff is not None else {}
+        if not unsaved_showings and not diffs:
+            return
+
+        changes = []
+        dropped_showings = []
+        if unsaved_showings:
             # List of dicts of values for each new showing to be inserted into {TABLE_NAME} table
             showing_values_list = [
-                showing.database_format() for showing in self.new_showings
+                showing.database_format() for showing in unsaved_showings
             ]
 
             self.logger.debug("Adding new showings to database")
@@ -179,8 +318,7 @@ class ShowingsManager:
             placeholders = ", ".join(f"%({key})s" for key in columns)
             insert_query = f"INSERT IGNORE INTO {TABLE_NAME} ({', '.join(columns)}) VALUES ({placeholders});"
             cursor.executemany(insert_query, showing_values_list)
-            # Commit changes to database
-            db.commit()
+            inserted_count = cursor.rowcount
 
             cursor.execute("SHOW WARNINGS;")
             warnings = cursor.fetchall()
@@ -188,12 +326,112 @@ class ShowingsManager:
                 self.logger.warning(
                     f"Warning(s) while inserting showings into database: {warnings}"
                 )
-            self.logger.info(f"{len(self.new_showings)} new showings added to database")
+            if inserted_count < len(unsaved_showings):
+                dropped_showings = self.find_dropped_showings(cursor, unsaved_showings)
+            changes += [(showing.showing_key, INSERTED) for showing in unsaved_showings]
+
+        deleted_keys = []
+        removed_counts = {}
+        for diff_cinema_id, (diff_dates, scraped_keys) in diffs.items():
+            removed = self.find_removed_showings(
+                cursor, diff_cinema_id, diff_dates, scraped_keys
+            )
+            allowed = MAX_REMOVED_SHOWINGS - self.removed_counts.get(
+                diff_cinema_id, 0
+            )
+            if len(removed) > allowed:
+                self.logger.warning(
+                    f"{len(removed)} showings of cinema {diff_cinema_id} are no longer listed, only {max(allowed, 0)} are removed this run"
+                )
+                removed = removed[: max(allowed, 0)]
+            removed_counts[diff_cinema_id] = len(removed)
+            deleted_keys += removed
+        if deleted_keys:
+            placeholders = ", ".join(["%s"] * len(deleted_keys))
+            delete_query = f"DELETE FROM {TABLE_NAME} WHERE showing_key IN ({placeholders}) AND start_time >= NOW();"
+            cursor.execute(delete_query, deleted_keys)
+            changes += [(showing_key, DELETED) for showing_key in deleted_keys]
+
+        if changes:
+            changes_query = f"INSERT INTO {CHANGES_TABLE_NAME} (showing_key, change_type, changed_at) VALUES (%s, %s, NOW());"
+            cursor.executemany(changes_query, changes)
+        cursor.execute(
+            f"DELETE FROM {CHANGES_TABLE_NAME} WHERE changed_at < NOW() - INTERVAL %s DAY;",
+            (CHANGES_RETENTION_DAYS,),
+        )
+        # Commit changes to database
+        db.commit()
+
+        self.saved_showing_count += len(unsaved_showings)
+        for showing in dropped_showings:
+            self.dropped_dates.setdefault(showing.cinema_id, set()).add(
+                Showing.cinema_day(showing.start_time)
+            )
+        self.deleted_showing_count += len(deleted_keys)
+        for diff_cinema_id, count in removed_counts.items():
+            self.removed_counts[diff_cinema_id] = (
+                self.removed_counts.get(diff_cinema_id, 0) + count
+            )
+        self.current_showings.difference_update(deleted_keys)
+        self.logger.info(
+            f"{len(unsaved_showings)} new showings added to database, {len(deleted_keys)} removed"
+        )
+
+    @staticmethod
+    def find_dropped_showings(cursor, showings: list[Showing]) -> list[Showing]:
+        """
+        Return the showings that are not in the database after being inserted, i.e. ignored by INSERT IGNORE for reasons other than being duplicates.
+
+        Args:
+            cursor: Cursor of the transaction the showings were inserted in.
+            showings (list[Showing]): The inserted showings.
+
+        Returns:
+            list[Showing]: Showings missing from the database.
+        """
+        placeholders = ", ".join(["%s"] * len(showings))
+        select_query = f"SELECT showing_key FROM {TABLE_NAME} WHERE showing_key IN ({placeholders});"
+        cursor.execute(select_query, [showing.showing_key for showing in showings])
+        stored_keys = {showing_key for (showing_key,) in cursor.fetchall()}
+        return [
+            showing for showing in showings if showing.showing_key not in stored_keys
+        ]
+
+    @staticmethod
+    def find_removed_showings(
+        cursor, cinema_id: str, show_dates: set[date], scraped_keys: set[int]
+    ) -> list[int]:
+        """
+        Return the keys of a cinema's stored showings on the scraped days that were not scraped and have not started, i.e. cancelled or rescheduled. Rows are locked until the transaction ends, so they are not changed while the diff is applied.
+
+        Args:
+            cursor: Cursor of the transaction the showings are written in.
+            cinema_id (str): The ID of the cinema.
+            show_dates (set[date]): Days whose pages were fully scraped.
+            scraped_keys (set[int]): Keys of every showing scraped for the cinema in this run, so a showing listed on another day's page is not removed.
+
+        Returns:
+            list[int]: Keys of the showings to delete.
+        """
+        removed = []
+        # Showings that have started are kept, as the site drops them from today's page
+        select_query = f"SELECT showing_key FROM {TABLE_NAME} WHERE cinema_id = %s AND start_time >= %s AND start_time < %s AND start_time >= NOW() FOR UPDATE;"
+        for show_date in sorted(show_dates):
+            day_start = datetime.combine(show_date, CINEMA_DAY_START)
+            cursor.execute(
+                select_query, (cinema_id, day_start, day_start + timedelta(days=1))
+            )
+            removed += [
+                showing_key
+                for (showing_key,) in cursor.fetchall()
+                if showing_key not in scraped_keys
+            ]
+        return removed
 
     def __str__(self):
         """Return a string showing how many new showings have been found this run."""
-        if self.new_showings:
-            return f"{len(self.new_showings)} new showings found."
+        if self.new_showings or self.deleted_showing_count:
+            return f"{len(self.new_showings)} new showings found, {self.deleted_showing_count} removed."
         else:
             return "No new showings"
 
@@ -0,0 +1,271 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from threading import Lock
+from typing import TYPE_CHECKING, Callable
+
+from creds import TMDB_API_TOKEN
+from http_client import PooledSession
+from scheduler import ScrapeScheduler
+from tmdb_cache import TMDBCache
+from tmdb_index import TMDBIdIndex
+
+if TYPE_CHECKING:
+    from movie import Movie
+
+
+TMDB_API_URL = "https://api.themoviedb.org/3"
+# Sub-resources returned with a movie's details by append_to_response, so one request gets everything enrichment needs
+DETAILS_APPEND = ("release_dates", "credits", "external_ids")
+# Cast members kept from TMDB credits, in billing order
+CREDITS_CAST_SIZE = 10
+# Country whose release dates are kept from TMDB release_dates
+RELEASE_COUNTRY = "FR"
+
+
+# Retrieves movie details from TMDB concurrently, over one pooled and rate limited session.
+class TMDBEnricher:
+    def __init__(
+        self,
+        logger: Logger,
+        cache: TMDBCache | None = None,
+        index: TMDBIdIndex | None = None,
+        max_workers: int = 8,
+        rate: float = 40.0,
+    ) -> None:
+        """
+        Initialize a TMDBEnricher object.
+
+        Args:
+            logger (Logger): Logger object.
+            cache (TMDBCache, optional): Cache of TMDB responses. TMDB is always called if None.
+            index (TMDBIdIndex, optional): Index of known tmdb_ids. Every movie is searched on TMDB if None.
+            max_workers (int): Movies enriched in parallel, and requests allowed in flight to TMDB.
+            rate (float): Requests per second permitted to TMDB, which allows around 50.
+        """
+        self.logger: Logger = logger
+        self.cache: TMDBCache | None = cache
+        self.index: TMDBIdIndex | None = index
+        self.max_workers: int = max_workers
+        self.session: PooledSession = PooledSession(pool_maxsize=max_workers)
+        self.session.headers.update(
+            {
+                "accept": "application/json",
+                "Authorization": f"Bearer {TMDB_API_TOKEN}",
+            }
+        )
+        # TMDB responds quickly and asks to slow down with 429 and Retry-After, so the rate is fixed rather than probed upwards
+        self.scheduler: ScrapeScheduler = ScrapeScheduler(
+            max_requests_per_host=max_workers,
+            rate=rate,
+            max_rate=rate,
+            burst=max_workers,
+            backoff_delay=10.0,
+            max_jitter=0.0,
+        )
+        self.requests_sent: int = 0
+        self.enriched: int = 0
+        self.failed: int = 0
+        self._lock: Lock = Lock()
+
+    def get(
+        self,
+        url: str,
+        cache_key: str,
+        params: dict | None = None,
+        trim: Callable[[dict], dict] | None = None,
+    ) -> dict | None:
+        """
+        Get a TMDB response, from the cache if it holds one.
+
+        Args:
+            url (str): TMDB API URL.
+            cache_key (str): Key of the response in the TMDB cache.
+            params (dict, optional): Query parameters.
+            trim (Callable, optional): Applied to the response before it is cached, to drop the parts that are not used.
+
+        Returns:
+            dict | None: The response, None if TMDB found nothing. Searches only keep their first result.
+
+        Raises:
+            HTTPError: If TMDB responds with an error other than 404. Errors are not cached.
+        """
+        if self.cache is not None:
+            cached, response_data = self.cache.get(cache_key)
+            if cached:
+                return response_data
+
+        with self.scheduler.permit(url):
+            t0 = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=30)
+            except Exception:
+                self.scheduler.report(url, None, time.perf_counter() - t0)
+                raise
+        self.scheduler.report(
+            url,
+            response.status_code,
+            time.perf_counter() - t0,
+            response.headers.get("Retry-After"),
+        )
+        with self._lock:
+            self.requests_sent += 1
+
+        if response.status_code == 404:
+            response_data = None
+        else:
+            response.raise_for_status()
+            response_data = response.json()
+            if "results" in response_data:
+                # Only the first search result is used
+                results = response_data["results"][:1]
+                response_data = {"results": results} if results else None
+            elif trim is not None:
+                response_data = trim(response_data)
+
+        if self.cache is not None:
+            self.cache.put(cache_key, response_data, response_data is not None)
+        return response_data
+
+    def search_tmdb_id(self, title: str, year: int | None = None) -> int | None:
+        """Search TMDB for a title, optionally released in `year`, and return the tmdb_id of the first result, None if nothing was found."""
+        queryparams = {"query": title}
+        if year is not None:
+            queryparams["primary_release_year"] = year
+        response_data = self.get(
+            f"{TMDB_API_URL}/search/movie",
+            TMDBCache.search_key(title, year),
+            queryparams,
+        )
+        return response_data["results"][0]["id"] if response_data else None
+
+    def lookup_tmdb_id(
+        self, movie_id: str, titles: list[str], years: list[int | None]
+    ) -> int | None:
+        """Return the tmdb_id of a movie resolved before, from the index, None if it has to be searched. See TMDBIdIndex.lookup."""
+        if self.index is None:
+            return None
+        return self.index.lookup(movie_id, titles, years)
+
+    def record_tmdb_id(
+        self, tmdb_id: int, movie_id: str, titles: list[tuple[str, int | None]]
+    ) -> None:
+        """Record the tmdb_id a movie resolved to in the index. See TMDBIdIndex.record."""
+        if self.index is not None:
+            self.index.record(tmdb_id, movie_id, titles)
+
+    @staticmethod
+    def trim_details(response_data: dict) -> dict:
+        """Drop the parts of a details response that enrichment does not use, i.e. crew other than directors, cast beyond the top billed, and release dates of other countries, so cached details stay small."""
+        credits = response_data.get("credits")
+        if credits is not None:
+            response_data["credits"] = {
+                "cast": [
+                    {"name": member.get("name")}
+                    for member in credits.get("cast", [])[:CREDITS_CAST_SIZE]
+                ],
+                "crew": [
+                    {"name": member.get("name"), "job": member.get("job")}
+                    for member in credits.get("crew", [])
+                    if member.get("job") == "Director"
+                ],
+            }
+        release_dates = response_data.get("release_dates")
+        if release_dates is not None:
+            response_data["release_dates"] = {
+                "results": [
+                    country
+                    for country in release_dates.get("results", [])
+                    if country.get("iso_3166_1") == RELEASE_COUNTRY
+                ]
+            }
+        return response_data
+
+    def get_movie_details(self, tmdb_id: int) -> dict | None:
+        """Return TMDB's details of a movie, with the DETAILS_APPEND sub-resources, in a single request. None if TMDB has no such movie."""
+        return self.get(
+            f"{TMDB_API_URL}/movie/{tmdb_id}",
+            TMDBCache.details_key(tmdb_id, DETAILS_APPEND),
+            {"append_to_response": ",".join(DETAILS_APPEND)},
+            trim=self.trim_details,
+        )
+
+    def enrich(self, movie: "Movie") -> None:
+        """
+        Add TMDB details to a movie.
+
+        Args:
+            movie (Movie): The movie to enrich.
+
+        Raises:
+            Exception: If the details are missing or invalid, in which case the movie should not be written to the database.
+        """
+        try:
+            movie.add_additional_details(self)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.enriched += 1
+
+    def enrich_movies(self, movies: list["Movie"]) -> list["Movie"]:
+        """
+        Add TMDB details to movies concurrently.
+
+        Args:
+            movies (list[Movie]): Movies to enrich.
+
+        Returns:
+            list[Movie]: Movies that could not be enriched.
+        """
+
+        def enrich_movie(movie: "Movie") -> bool:
+            try:
+                self.enrich(movie)
+                return True
+            except Exception as e:
+                self.logger.error(f"Unable to enrich Movie {movie.movie_id}: {e}")
+                return False
+
+        if not movies:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(movies)),
+            thread_name_prefix="tmdb",
+        ) as executor:
+            results = list(executor.map(enrich_movie, movies))
+        return [movie for movie, enriched in zip(movies, results) if not enriched]
+
+    def save_cache(self) -> None:
+        """Write the TMDB responses and tmdb_id resolutions of this run to the database. If this fails they are fetched from TMDB again next run."""
+        try:
+            if self.cache is not None:
+                self.cache.save()
+            if self.index is not None:
+                self.index.save()
+        except Exception as e:
+            self.logger.warning(f"Unable to save TMDB cache and id index: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        Return the enricher's statistics.
+
+        Returns:
+            dict: Requests sent to TMDB, and movies enriched and failed.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests_sent,
+                "enriched": self.enriched,
+                "failed": self.failed,
+                "requests_per_movie": (
+                    round(self.requests_sent / self.enriched, 2)
+                    if self.enriched
+                    else None
+                ),
+            }
+
+    def close(self) -> None:
+        """Close the session's connections."""
+        self.session.close()
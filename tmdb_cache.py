@@ -0,0 +1,183 @@
+import json
+import datetime
+from logging import Logger
+from threading import Lock
+
+from db_utilities import connect_to_database
+
+
+TABLE_NAME = "tmdb_cache"
+
+
+# Cache of TMDB search and details responses across runs, misses kept for less time than hits.
+class TMDBCache:
+    def __init__(
+        self,
+        logger: Logger,
+        hit_ttl: datetime.timedelta = datetime.timedelta(days=30),
+        negative_ttl: datetime.timedelta = datetime.timedelta(days=2),
+    ) -> None:
+        """
+        Initialize a TMDBCache object. Stored responses are loaded when they are first looked up, rather than every unexpired response at once.
+
+        Args:
+            logger (Logger): Logger object.
+            hit_ttl (timedelta): How long a response that found a movie is reused.
+            negative_ttl (timedelta): How long a response that found nothing is reused, after which the lookup is tried again.
+        """
+        self.logger: Logger = logger
+        self.hit_ttl: datetime.timedelta = hit_ttl
+        self.negative_ttl: datetime.timedelta = negative_ttl
+        self.entries: dict[str, dict | None] = {}
+        # Keys already looked up in the database, whether or not they were stored there
+        self.loaded_keys: set[str] = set()
+        # Cleared if the database cannot be read, after which lookups go to TMDB
+        self.available: bool = True
+        # Responses fetched during this run, written by save()
+        self.new_entries: dict[str, tuple[dict | None, bool]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock: Lock = Lock()
+
+    @connect_to_database
+    def retrieve_entries(
+        self,
+        db,
+        cursor,
+        cache_keys: list[str],
+        hit_ttl_hours: int,
+        negative_ttl_hours: int,
+    ) -> list[tuple[str, str | None]]:
+        """Retrieve the responses of `cache_keys` that found a movie within the last `hit_ttl_hours`, or found nothing within the last `negative_ttl_hours`."""
+        placeholders = ", ".join(["%s"] * len(cache_keys))
+        query = f"SELECT cache_key, response FROM {TABLE_NAME} WHERE cache_key IN ({placeholders}) AND fetched_at >= NOW() - INTERVAL IF(found, %s, %s) HOUR;"
+        cursor.execute(query, (*cache_keys, hit_ttl_hours, negative_ttl_hours))
+        return cursor.fetchall()
+
+    def load(self, cache_keys: list[str]) -> None:
+        """
+        Load the stored responses of keys not looked up yet in one query, e.g. the keys of a batch of movies about to be enriched.
+
+        Args:
+            cache_keys (list[str]): Keys from search_key() or details_key().
+        """
+        with self._lock:
+            if not self.available:
+                return
+            cache_keys = [
+                cache_key
+                for cache_key in dict.fromkeys(cache_keys)
+                if cache_key not in self.loaded_keys
+            ]
+        if not cache_keys:
+            return
+        try:
+            rows = self.retrieve_entries(
+                cache_keys=cache_keys,
+                hit_ttl_hours=int(self.hit_ttl.total_seconds() // 3600),
+                negative_ttl_hours=int(self.negative_ttl.total_seconds() // 3600),
+            )
+        except Exception as e:
+            with self._lock:
+                self.available = False
+            self.logger.warning(
+                f"Unable to retrieve TMDB cache, lookups go to TMDB: {e}"
+            )
+            return
+        with self._lock:
+            for cache_key, response in rows:
+                # A response fetched during this run is newer than the stored one
+                self.entries.setdefault(
+                    cache_key, json.loads(response) if response is not None else None
+                )
+            self.loaded_keys.update(cache_keys)
+
+    @staticmethod
+    def search_key(query: str, year: int | None = None) -> str:
+        """Return the cache key of a movie search, by title and optional primary release year."""
+        return f"search:{' '.join(query.lower().split())}:{year or ''}"
+
+    @staticmethod
+    def details_key(tmdb_id: int, append: tuple[str, ...] = ()) -> str:
+        """Return the cache key of a movie's details, and of the sub-resources appended to them, so details cached without a sub-resource are not reused when it is requested."""
+        return f"movie:{tmdb_id}:{'+'.join(append)}" if append else f"movie:{tmdb_id}"
+
+    def get(self, cache_key: str) -> tuple[bool, dict | None]:
+        """
+        Look up a response, loading it from the database the first time the key is looked up. Counts towards the hit ratio.
+
+        Args:
+            cache_key (str): Key from search_key() or details_key().
+
+        Returns:
+            tuple[bool, dict | None]: Whether the key is cached, and the cached response, None if the lookup found nothing.
+        """
+        with self._lock:
+            loaded = cache_key in self.entries or cache_key in self.loaded_keys
+        if not loaded:
+            self.load([cache_key])
+        with self._lock:
+            if cache_key in self.entries:
+                self.hits += 1
+                return True, self.entries[cache_key]
+            self.misses += 1
+            return False, None
+
+    def put(self, cache_key: str, response: dict | None, found: bool) -> None:
+        """
+        Store a response fetched from TMDB. Only responses that TMDB answered should be stored, not network or server errors.
+
+        Args:
+            cache_key (str): Key from search_key() or details_key().
+            response (dict | None): The response, or None if TMDB has no such movie.
+            found (bool): Whether the response found a movie, which decides the TTL applied.
+        """
+        with self._lock:
+            self.entries[cache_key] = response
+            self.new_entries[cache_key] = (response, found)
+
+    @connect_to_database
+    def save(self, db, cursor) -> None:
+        """Write the responses fetched since the last save to the database, and remove expired entries."""
+        with self._lock:
+            new_entries = dict(self.new_entries)
+        if new_entries:
+            upsert_query = f"INSERT INTO {TABLE_NAME} (cache_key, response, found, fetched_at) VALUES (%s, %s, %s, NOW()) ON DUPLICATE KEY UPDATE response = VALUES(response), found = VALUES(found), fetched_at = NOW();"
+            cursor.executemany(
+                upsert_query,
+                [
+                    (
+                        cache_key,
+                        json.dumps(response) if response is not None else None,
+                        found,
+                    )
+                    for cache_key, (response, found) in new_entries.items()
+                ],
+            )
+            max_ttl_hours = int(
+                max(self.hit_ttl, self.negative_ttl).total_seconds() // 3600
+            )
+            cursor.execute(
+                f"DELETE FROM {TABLE_NAME} WHERE fetched_at < NOW() - INTERVAL %s HOUR;",
+                (max_ttl_hours,),
+            )
+            db.commit()
+            with self._lock:
+                for cache_key in new_entries:
+                    self.new_entries.pop(cache_key, None)
+
+    def get_stats(self) -> dict:
+        """
+        Return the cache's statistics.
+
+        Returns:
+            dict: Lookups served from the cache (hits) and from TMDB (misses), the hit ratio, and the number of responses loaded or fetched this run.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self.entries),
+            }
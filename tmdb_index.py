@@ -0,0 +1,139 @@
+import re
+import unicodedata
+from logging import Logger
+from threading import Lock
+
+from db_utilities import connect_to_database
+
+
+TABLE_NAME = "tmdb_ids"
+MOVIES_TABLE_NAME = "movies"
+
+
+# Resolves movies to their tmdb_id locally, by movie_id or normalized (title, year), to skip TMDB searches.
+class TMDBIdIndex:
+    def __init__(self, logger: Logger) -> None:
+        """
+        Initialize a TMDBIdIndex object and load the known tmdb_ids.
+
+        Args:
+            logger (Logger): Logger object.
+        """
+        self.logger: Logger = logger
+        self.ids: dict[str, int] = {}
+        # Resolutions made during this run, written by save()
+        self.new_ids: dict[str, int] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock: Lock = Lock()
+        try:
+            for row in self.retrieve_movies():
+                movie_id, original_title, french_title, year, tmdb_id = row
+                self.ids[self.movie_key(movie_id)] = tmdb_id
+                for title in (original_title, french_title):
+                    if title:
+                        self.ids[self.title_key(title, year)] = tmdb_id
+            self.ids.update(self.retrieve_ids())
+        except Exception as e:
+            self.logger.warning(
+                f"Unable to retrieve TMDB id index, movies are searched on TMDB: {e}"
+            )
+
+    @connect_to_database
+    def retrieve_movies(self, db, cursor) -> list[tuple[str, str, str, int | None, int]]:
+        """Retrieve the movie_id, titles, release year and tmdb_id of movies in the database that have a tmdb_id."""
+        query = f"SELECT movie_id, original_title, french_title, YEAR(release_date), tmdb_id FROM {MOVIES_TABLE_NAME} WHERE tmdb_id IS NOT NULL;"
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    @connect_to_database
+    def retrieve_ids(self, db, cursor) -> list[tuple[str, int]]:
+        """Retrieve the stored resolutions."""
+        query = f"SELECT lookup_key, tmdb_id FROM {TABLE_NAME};"
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    @staticmethod
+    def normalize_title(title: str) -> str:
+        """Return a title lower cased, without accents or punctuation, and with single spaces, e.g. "L'Été dernier" becomes "l ete dernier"."""
+        title = unicodedata.normalize("NFKD", title)
+        title = "".join(char for char in title if not unicodedata.combining(char))
+        return " ".join(re.sub(r"[^\w]+", " ", title.lower()).split())
+
+    @staticmethod
+    def movie_key(movie_id: str) -> str:
+        return f"movie:{movie_id}"
+
+    @classmethod
+    def title_key(cls, title: str, year: int | None = None) -> str:
+        return f"title:{cls.normalize_title(title)}:{year or ''}"
+
+    def lookup(
+        self, movie_id: str, titles: list[str], years: list[int | None]
+    ) -> int | None:
+        """
+        Return the tmdb_id of a movie if it has been resolved before.
+
+        Args:
+            movie_id (str): The scraped movie ID.
+            titles (list[str]): Titles the movie is listed under, e.g. original and French.
+            years (list[int | None]): Years to match the titles with, in order of preference. None matches titles recorded without a year.
+
+        Returns:
+            int | None: The tmdb_id, None if the movie is unknown.
+        """
+        keys = [self.movie_key(movie_id)] + [
+            self.title_key(title, year) for year in years for title in titles if title
+        ]
+        with self._lock:
+            for key in keys:
+                if key in self.ids:
+                    self.hits += 1
+                    return self.ids[key]
+            self.misses += 1
+            return None
+
+    def record(
+        self,
+        tmdb_id: int,
+        movie_id: str | None = None,
+        titles: list[tuple[str, int | None]] | None = None,
+    ) -> None:
+        """
+        Record the tmdb_id a movie resolved to.
+
+        Args:
+            tmdb_id (int): The TMDB ID.
+            movie_id (str, optional): The scraped movie ID.
+            titles (list[tuple[str, int | None]], optional): (title, year) pairs the movie is known by.
+        """
+        keys = [self.movie_key(movie_id)] if movie_id else []
+        keys += [self.title_key(title, year) for title, year in titles or [] if title]
+        with self._lock:
+            for key in keys:
+                if self.ids.get(key) != tmdb_id:
+                    self.ids[key] = tmdb_id
+                    self.new_ids[key] = tmdb_id
+
+    @connect_to_database
+    def save(self, db, cursor) -> None:
+        """Write the resolutions made since the last save to the database."""
+        with self._lock:
+            new_ids = dict(self.new_ids)
+        if new_ids:
+            upsert_query = f"INSERT INTO {TABLE_NAME} (lookup_key, tmdb_id, updated_at) VALUES (%s, %s, NOW()) ON DUPLICATE KEY UPDATE tmdb_id = VALUES(tmdb_id), updated_at = NOW();"
+            cursor.executemany(upsert_query, list(new_ids.items()))
+            db.commit()
+            with self._lock:
+                for key in new_ids:
+                    self.new_ids.pop(key, None)
+
+    def get_stats(self) -> dict:
+        """
+        Return the index's statistics.
+
+        Returns:
+            dict: Movies resolved locally (hits) and searched on TMDB (misses), and the number of known keys.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.ids)}